@@ -0,0 +1,121 @@
+-- =====================================================
+-- AGGREGATION FUNCTIONS UPDATE
+-- =====================================================
+-- Per-user totals computed in the database, so the balance, dashboard,
+-- advice and contact list routes receive a few grouped rows instead of the
+-- user's whole history. Sums are returned as integer cents.
+--
+-- The functions run with the caller's rights (no SECURITY DEFINER), so the
+-- same row level security applies as for the plain table reads they replace.
+
+-- =====================================================
+-- INDEXES
+-- =====================================================
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON public.transactions(user_id, date DESC);
+CREATE INDEX IF NOT EXISTS idx_loan_activities_user_contact_created ON public.loan_activities(user_id, contact_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_loan_activities_user_created ON public.loan_activities(user_id, created_at);
+-- Contact statements seek along this order (routes/loan_contacts_routes.py)
+CREATE INDEX IF NOT EXISTS idx_loan_activities_contact_statement ON public.loan_activities(contact_id, activity_date, created_at, id);
+
+-- =====================================================
+-- FUNCTION: TRANSACTION TOTALS BY TYPE AND CATEGORY
+-- =====================================================
+CREATE OR REPLACE FUNCTION public.get_transaction_totals(p_user_id UUID)
+RETURNS TABLE (
+    type TEXT,
+    category TEXT,
+    total_cents BIGINT,
+    count BIGINT
+) AS $$
+    SELECT
+        t.type,
+        t.category,
+        SUM(t.amount * 100)::BIGINT AS total_cents,
+        COUNT(*) AS count
+    FROM public.transactions t
+    WHERE t.user_id = p_user_id
+    GROUP BY t.type, t.category;
+$$ LANGUAGE sql STABLE;
+
+-- =====================================================
+-- FUNCTION: LOAN ACTIVITY TOTALS BY TYPE
+-- =====================================================
+CREATE OR REPLACE FUNCTION public.get_loan_activity_totals(p_user_id UUID)
+RETURNS TABLE (
+    activity_type TEXT,
+    total_cents BIGINT,
+    count BIGINT
+) AS $$
+    SELECT
+        la.activity_type,
+        SUM(la.amount * 100)::BIGINT AS total_cents,
+        COUNT(*) AS count
+    FROM public.loan_activities la
+    WHERE la.user_id = p_user_id
+    GROUP BY la.activity_type;
+$$ LANGUAGE sql STABLE;
+
+-- =====================================================
+-- FUNCTION: LATEST BALANCE PER CONTACT
+-- =====================================================
+-- One row per contact that has activities: the balance_after of its most
+-- recently created activity, and how many activities it has.
+CREATE OR REPLACE FUNCTION public.get_contact_balances(p_user_id UUID)
+RETURNS TABLE (
+    contact_id UUID,
+    balance_after DECIMAL(15, 2),
+    activity_count BIGINT
+) AS $$
+    SELECT DISTINCT ON (la.contact_id)
+        la.contact_id,
+        la.balance_after,
+        COUNT(*) OVER (PARTITION BY la.contact_id) AS activity_count
+    FROM public.loan_activities la
+    WHERE la.user_id = p_user_id
+    ORDER BY la.contact_id, la.created_at DESC;
+$$ LANGUAGE sql STABLE;
+
+-- =====================================================
+-- FUNCTION: MONTHLY TOTALS
+-- =====================================================
+-- Months from p_since on that have any transaction or loan activity, oldest
+-- first. Transactions count in the month of their date, loan activities in
+-- the month they were recorded.
+DROP FUNCTION IF EXISTS public.get_monthly_totals(UUID, INT);
+
+CREATE OR REPLACE FUNCTION public.get_monthly_totals(p_user_id UUID, p_since DATE)
+RETURNS TABLE (
+    month TEXT,
+    income_cents BIGINT,
+    expense_cents BIGINT,
+    loan_given_cents BIGINT,
+    loan_borrowed_cents BIGINT
+) AS $$
+    SELECT
+        m.month,
+        SUM(m.income)::BIGINT,
+        SUM(m.expense)::BIGINT,
+        SUM(m.loan_given)::BIGINT,
+        SUM(m.loan_borrowed)::BIGINT
+    FROM (
+        SELECT
+            to_char(t.date, 'YYYY-MM') AS month,
+            CASE WHEN t.type = 'income' THEN t.amount * 100 ELSE 0 END AS income,
+            CASE WHEN t.type = 'income' THEN 0 ELSE t.amount * 100 END AS expense,
+            0 AS loan_given,
+            0 AS loan_borrowed
+        FROM public.transactions t
+        WHERE t.user_id = p_user_id AND t.date >= p_since
+        UNION ALL
+        SELECT
+            to_char(la.created_at, 'YYYY-MM'),
+            0,
+            0,
+            CASE WHEN la.activity_type = 'given' THEN la.amount * 100 ELSE 0 END,
+            CASE WHEN la.activity_type = 'borrowed' THEN la.amount * 100 ELSE 0 END
+        FROM public.loan_activities la
+        WHERE la.user_id = p_user_id AND la.created_at >= p_since
+    ) m
+    GROUP BY m.month
+    ORDER BY m.month;
+$$ LANGUAGE sql STABLE;
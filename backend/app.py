@@ -1,4 +1,5 @@
-from flask import Flask
+import time
+from flask import Flask, g
 from flask_cors import CORS
 from config import Config
 from routes.auth_routes import auth_bp
@@ -7,6 +8,15 @@ from routes.loan_routes import loan_bp
 from routes.loan_contacts_routes import loan_contacts_bp
 from routes.dashboard_routes import dashboard_bp
 from routes.ai_routes import ai_bp
+from routes.analytics_routes import analytics_bp
+from routes.budget_routes import budget_bp
+from routes.recurring_routes import recurring_bp
+from routes.event_routes import events_bp
+from services import single_flight
+from services.cache_service import cache_stats
+from services.resilience import breaker_states, init_resilience
+from services.supabase_service import get_client
+from utils.profiler import init_profiling
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -24,15 +34,57 @@ app.register_blueprint(loan_bp, url_prefix='/api/loans')
 app.register_blueprint(loan_contacts_bp, url_prefix='/api/loan-contacts')
 app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
 app.register_blueprint(ai_bp, url_prefix='/api/ai')
+app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+app.register_blueprint(budget_bp, url_prefix='/api/budgets')
+app.register_blueprint(recurring_bp, url_prefix='/api/recurring')
+app.register_blueprint(events_bp, url_prefix='/api/events')
+
+init_resilience(app)
+init_profiling(app)
 
 @app.route('/')
 def index():
     return {'message': 'Finance Tracker API', 'status': 'running'}
 
 @app.route('/health')
+@app.route('/health/live')
 def health():
+    # Liveness only: no dependency is touched, so it answers while the database is slow
     return {'status': 'healthy'}
 
+@app.route('/health/ready')
+def ready():
+    g.deadline = min(g.deadline, time.monotonic() + Config.READINESS_TIMEOUT)
+    dependencies = {}
+    
+    started = time.perf_counter()
+    try:
+        get_client().table('profiles').select('id').limit(1).execute()
+        dependencies['database'] = {'ok': True}
+    except Exception as e:
+        dependencies['database'] = {'ok': False, 'error': str(e)}
+    dependencies['database']['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    
+    started = time.perf_counter()
+    cache_ok = bool(cache_stats())
+    dependencies['cache'] = {'ok': cache_ok, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+    
+    is_ready = dependencies['database']['ok'] and cache_ok
+    return {
+        'status': 'ready' if is_ready else 'unavailable',
+        'dependencies': dependencies,
+        'breakers': breaker_states(),
+    }, 200 if is_ready else 503
+
+@app.route('/metrics')
+def metrics():
+    """Read coalescing, cache and circuit breaker counters"""
+    return {
+        'single_flight': single_flight.stats(),
+        'cache': cache_stats(),
+        'breakers': breaker_states(),
+    }
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=False)
 
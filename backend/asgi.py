@@ -0,0 +1,62 @@
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from quart import Quart
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from config import Config
+from app import app as wsgi_app
+from routes.async_routes import async_dashboard_bp, async_loan_contacts_bp, async_transaction_bp
+from services.resilience import init_async_resilience
+
+# ASGI entry point: uvicorn asgi:app --workers 4
+#
+# Read-heavy routes are served by async handlers that await the database
+# concurrently, so one worker keeps many requests in flight while they wait on
+# Supabase. Every other route (and CORS preflight) is passed to the regular
+# Flask app, which runs in a thread pool, so the two modes serve the same API.
+
+async_app = Quart(__name__)
+async_app.config.from_object(Config)
+
+async_app.register_blueprint(async_dashboard_bp, url_prefix='/api/dashboard')
+async_app.register_blueprint(async_loan_contacts_bp, url_prefix='/api/loan-contacts')
+async_app.register_blueprint(async_transaction_bp, url_prefix='/api/transactions')
+init_async_resilience(async_app)
+
+
+@async_app.after_request
+async def allow_any_origin(response):
+    # Matches the flask-cors settings in app.py for simple requests
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+class _ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs the WSGI app with thread_sensitive=True, which puts every
+    # fallback request on one thread per process, so a single /api/events
+    # stream would block all writes. Each request gets a pool thread instead.
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+
+class _ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await _ThreadPoolWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+fallback = _ThreadPoolWsgiToAsgi(wsgi_app)
+_routes = async_app.url_map.bind('')
+
+
+def _has_async_route(scope):
+    if scope['method'] == 'OPTIONS':
+        return False
+    try:
+        _routes.match(scope['path'], method=scope['method'])
+        return True
+    except (NotFound, MethodNotAllowed):
+        return False
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'http' and not _has_async_route(scope):
+        return await fallback(scope, receive, send)
+    return await async_app(scope, receive, send)
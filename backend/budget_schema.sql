@@ -0,0 +1,76 @@
+-- =====================================================
+-- BUDGETS UPDATE
+-- =====================================================
+
+-- =====================================================
+-- BUDGETS TABLE
+-- =====================================================
+CREATE TABLE IF NOT EXISTS public.budgets (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    category TEXT, -- NULL = all expenses
+    period TEXT NOT NULL CHECK (period IN ('weekly', 'monthly', 'yearly')),
+    amount DECIMAL(15, 2) NOT NULL CHECK (amount > 0),
+    thresholds INTEGER[] NOT NULL DEFAULT '{80,100}', -- percent of amount that raise an alert
+    spent DECIMAL(15, 2) NOT NULL DEFAULT 0, -- maintained by the transaction write routes
+    period_start DATE NOT NULL, -- period that spent belongs to
+    alerted_threshold INTEGER NOT NULL DEFAULT 0, -- highest threshold already alerted in this period
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =====================================================
+-- BUDGET ALERTS TABLE
+-- =====================================================
+CREATE TABLE IF NOT EXISTS public.budget_alerts (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    budget_id UUID NOT NULL REFERENCES public.budgets(id) ON DELETE CASCADE,
+    threshold INTEGER NOT NULL,
+    spent DECIMAL(15, 2) NOT NULL,
+    amount DECIMAL(15, 2) NOT NULL,
+    period_start DATE NOT NULL,
+    is_read BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =====================================================
+-- INDEXES
+-- =====================================================
+CREATE INDEX IF NOT EXISTS idx_budgets_user_id ON public.budgets(user_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_budgets_user_category_period ON public.budgets(user_id, COALESCE(category, ''), period);
+CREATE INDEX IF NOT EXISTS idx_budget_alerts_user_id ON public.budget_alerts(user_id, created_at DESC);
+
+-- =====================================================
+-- RLS POLICIES FOR BUDGETS
+-- =====================================================
+ALTER TABLE public.budgets ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own budgets" ON public.budgets
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own budgets" ON public.budgets
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own budgets" ON public.budgets
+    FOR UPDATE USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete own budgets" ON public.budgets
+    FOR DELETE USING (auth.uid() = user_id);
+
+-- =====================================================
+-- RLS POLICIES FOR BUDGET ALERTS
+-- =====================================================
+ALTER TABLE public.budget_alerts ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own budget alerts" ON public.budget_alerts
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own budget alerts" ON public.budget_alerts
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own budget alerts" ON public.budget_alerts
+    FOR UPDATE USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete own budget alerts" ON public.budget_alerts
+    FOR DELETE USING (auth.uid() = user_id);
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,4 +11,47 @@ class Config:
     JWT_SECRET = os.getenv('JWT_SECRET')
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     FLASK_DEBUG = int(os.getenv('FLASK_DEBUG', 1))
-
+    # 'supabase', or 'local' for the in-memory stand-in used by load tests
+    DATA_BACKEND = os.getenv('DATA_BACKEND', 'supabase')
+    LOCAL_BACKEND_LATENCY_MS = float(os.getenv('LOCAL_BACKEND_LATENCY_MS', 0))
+    CACHE_PATH = os.getenv('CACHE_PATH', os.path.join(tempfile.gettempdir(), 'finance_tracker_cache.sqlite3'))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+    DURABLE_MAX_ENTRIES = int(os.getenv('DURABLE_MAX_ENTRIES', 100000))
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', 60))
+    BALANCE_CACHE_TTL = int(os.getenv('BALANCE_CACHE_TTL', 300))
+    PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 3600))
+    # Responses kept for Idempotency-Key replays, and how long a retry waits for the first request
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))
+    IDEMPOTENCY_WAIT = float(os.getenv('IDEMPOTENCY_WAIT', 10))
+    # Seconds between flushes of buffered updated_at touches
+    TOUCH_FLUSH_INTERVAL = float(os.getenv('TOUCH_FLUSH_INTERVAL', 5))
+    # /api/events: log retention, poll and heartbeat intervals, and stream lifetime (seconds)
+    EVENT_RETENTION = int(os.getenv('EVENT_RETENTION', 3600))
+    EVENT_POLL_INTERVAL = float(os.getenv('EVENT_POLL_INTERVAL', 0.5))
+    EVENT_HEARTBEAT = float(os.getenv('EVENT_HEARTBEAT', 15))
+    EVENT_STREAM_MAX = float(os.getenv('EVENT_STREAM_MAX', 300))
+    EVENT_RETRY_MS = int(os.getenv('EVENT_RETRY_MS', 3000))
+    # Resilience layer around data calls (services/resilience.py)
+    RESILIENCE_ENABLED = int(os.getenv('RESILIENCE_ENABLED', 1))
+    REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 10))
+    DEPENDENCY_TIMEOUT = float(os.getenv('DEPENDENCY_TIMEOUT', 15))
+    BREAKER_WINDOW = float(os.getenv('BREAKER_WINDOW', 30))
+    BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 20))
+    BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', 0.5))
+    BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', 15))
+    HEDGE_DELAY_MS = float(os.getenv('HEDGE_DELAY_MS', 0))
+    READINESS_TIMEOUT = float(os.getenv('READINESS_TIMEOUT', 2))
+    SINGLE_FLIGHT_ENABLED = int(os.getenv('SINGLE_FLIGHT_ENABLED', 1))
+    # Spending anomalies: z-score and sample count for unusual expenses, monthly spike ratio
+    ANOMALY_Z_SCORE = float(os.getenv('ANOMALY_Z_SCORE', 3))
+    ANOMALY_MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', 5))
+    SPIKE_RATIO = float(os.getenv('SPIKE_RATIO', 1.5))
+    ANOMALY_STATS_TTL = int(os.getenv('ANOMALY_STATS_TTL', 86400))
+    # Set to 0 once scripts.migrate_loans has moved every legacy loan; /api/loans then only allows reads
+    LEGACY_LOANS_ENABLED = int(os.getenv('LEGACY_LOANS_ENABLED', 1))
+    # Per-request profiling; nothing is installed unless enabled
+    PROFILING_ENABLED = int(os.getenv('PROFILING_ENABLED', 0))
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_SECRET = os.getenv('PROFILE_SECRET')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'finance_tracker_profiles'))
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 200))
@@ -37,6 +37,13 @@ CREATE TABLE IF NOT EXISTS public.loan_activities (
 -- ADD CONTACT_ID TO EXISTING LOANS (for migration)
 -- =====================================================
 ALTER TABLE public.loans ADD COLUMN IF NOT EXISTS contact_id UUID REFERENCES public.loan_contacts(id) ON DELETE SET NULL;
+-- Set by scripts.migrate_loans once a loan's activities exist. contact_id
+-- can't mark this: deleting the contact sets it back to NULL, and loans could
+-- be linked to a contact by hand without getting any activities. Loans that
+-- were migrated before this column existed are picked up again by the
+-- migrator, which skips activities that already exist.
+ALTER TABLE public.loans ADD COLUMN IF NOT EXISTS migrated_at TIMESTAMP WITH TIME ZONE;
+CREATE INDEX IF NOT EXISTS idx_loans_user_unmigrated ON public.loans(user_id) WHERE migrated_at IS NULL;
 
 -- =====================================================
 -- INDEXES
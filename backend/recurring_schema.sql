@@ -0,0 +1,54 @@
+-- =====================================================
+-- RECURRING TRANSACTIONS UPDATE
+-- =====================================================
+
+-- =====================================================
+-- RECURRING RULES TABLE
+-- =====================================================
+CREATE TABLE IF NOT EXISTS public.recurring_rules (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+    amount DECIMAL(15, 2) NOT NULL CHECK (amount > 0),
+    category TEXT NOT NULL,
+    description TEXT,
+    frequency TEXT NOT NULL CHECK (frequency IN ('daily', 'weekly', 'monthly', 'yearly')),
+    interval INTEGER NOT NULL DEFAULT 1 CHECK (interval > 0), -- every N days/weeks/months/years
+    day_of_month INTEGER CHECK (day_of_month BETWEEN 1 AND 31), -- monthly/yearly; clamped to short months
+    weekday INTEGER CHECK (weekday BETWEEN 0 AND 6), -- weekly; 0 = Monday
+    start_date DATE NOT NULL,
+    end_date DATE,
+    next_run DATE NOT NULL, -- next occurrence not yet materialized
+    last_run DATE,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =====================================================
+-- LINK MATERIALIZED TRANSACTIONS TO THEIR RULE
+-- =====================================================
+ALTER TABLE public.transactions ADD COLUMN IF NOT EXISTS recurring_rule_id UUID REFERENCES public.recurring_rules(id) ON DELETE SET NULL;
+
+-- =====================================================
+-- INDEXES
+-- =====================================================
+CREATE INDEX IF NOT EXISTS idx_recurring_rules_user_id ON public.recurring_rules(user_id);
+CREATE INDEX IF NOT EXISTS idx_recurring_rules_due ON public.recurring_rules(next_run, id) WHERE is_active;
+
+-- =====================================================
+-- RLS POLICIES FOR RECURRING RULES
+-- =====================================================
+ALTER TABLE public.recurring_rules ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own recurring rules" ON public.recurring_rules
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own recurring rules" ON public.recurring_rules
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own recurring rules" ON public.recurring_rules
+    FOR UPDATE USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete own recurring rules" ON public.recurring_rules
+    FOR DELETE USING (auth.uid() = user_id);
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
 from services.ai_service import generate_advice
+from services.anomaly_service import detect_anomalies
 from utils.jwt_handler import decode_token
 
 ai_bp = Blueprint('ai', __name__)
@@ -26,3 +27,12 @@ def get_advice():
     
     return jsonify({'advice': advice}), 200
 
+
+@ai_bp.route('/anomalies', methods=['GET'])
+def get_anomalies():
+    """Unusual expenses, spending spikes this month and per-category statistics"""
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    return jsonify(detect_anomalies(user_id)), 200
@@ -0,0 +1,51 @@
+from datetime import date
+from flask import Blueprint, jsonify, request
+from services.analytics_service import range_report
+from utils.jwt_handler import decode_token
+
+analytics_bp = Blueprint('analytics', __name__)
+
+MAX_RANGE_DAYS = 3660
+MAX_WINDOW = 365
+
+def get_user_from_token():
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None
+    
+    try:
+        token = auth_header.split(' ')[1]
+        payload = decode_token(token)
+        return payload.get('user_id') if payload else None
+    except:
+        return None
+
+
+@analytics_bp.route('/range', methods=['GET'])
+def get_range():
+    """Income/expense sums over a date range, grouped by type, category or day"""
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    try:
+        start = date.fromisoformat(request.args.get('start', ''))
+        end = date.fromisoformat(request.args.get('end', ''))
+    except ValueError:
+        return jsonify({'message': 'start and end must be dates in YYYY-MM-DD format'}), 400
+    
+    if end < start:
+        return jsonify({'message': 'end must not be before start'}), 400
+    
+    group = request.args.get('group', 'type')
+    if group not in ['category', 'type', 'day']:
+        return jsonify({'message': 'group must be one of category, type, day'}), 400
+    
+    window = request.args.get('window', type=int)
+    if window is not None and not 1 <= window <= MAX_WINDOW:
+        return jsonify({'message': f'window must be between 1 and {MAX_WINDOW}'}), 400
+    
+    if (group == 'day' or window) and (end - start).days >= MAX_RANGE_DAYS:
+        return jsonify({'message': f'Daily output is limited to {MAX_RANGE_DAYS} days'}), 400
+    
+    return jsonify(range_report(user_id, start, end, group, window)), 200
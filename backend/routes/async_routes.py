@@ -0,0 +1,175 @@
+import asyncio
+from quart import Blueprint, request, jsonify
+from services.supabase_service import get_async_client
+from services.cache_service import cache_get, cache_set_for_user, user_generation, user_key
+from services.balance_service import calculate_balance_async
+from services.dashboard_service import build_dashboard, month_window_start, needs, parse_options
+from services.aggregate_service import activity_totals_async, contact_balances_async, monthly_totals_async, transaction_totals_async
+from services.contact_service import contact_detail, contact_summary, with_pending_touches
+from services.write_behind import pending
+from utils.jwt_handler import decode_token
+
+# Async variants of the read-heavy routes, served by asgi.py. They share their
+# response building with the sync blueprints and only differ in how rows are
+# fetched: queries that do not depend on each other are awaited together.
+# The shared cache is SQLite, whose calls block, so they run in a thread
+# rather than on the event loop.
+
+async_dashboard_bp = Blueprint('async_dashboard', __name__)
+async_loan_contacts_bp = Blueprint('async_loan_contacts', __name__)
+async_transaction_bp = Blueprint('async_transactions', __name__)
+
+def get_user_from_token():
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None
+
+    try:
+        token = auth_header.split(' ')[1]
+        payload = decode_token(token)
+        return payload.get('user_id') if payload else None
+    except:
+        return None
+
+
+async def fetch(query):
+    return (await query.execute()).data
+
+
+@async_dashboard_bp.route('', methods=['GET'])
+async def get_dashboard():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+
+    try:
+        options = parse_options(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    supabase = await get_async_client()
+
+    async def contacts_count():
+        return (await supabase.table('loan_contacts').select('id', count='exact').eq('user_id', user_id).limit(1).execute()).count or 0
+
+    async def recent_transactions():
+        if not options['recent']:
+            return []
+        return await fetch(supabase.table('transactions').select('*').eq('user_id', user_id).order('date', desc=True).limit(options['recent']))
+
+    # Only what the included sections render is fetched, all at once
+    loaders = {
+        'balance_data': lambda: calculate_balance_async(user_id),
+        'tx_totals': lambda: transaction_totals_async(user_id),
+        'monthly': lambda: monthly_totals_async(user_id, month_window_start(options['months'])),
+        'loan_totals': lambda: activity_totals_async(user_id),
+        'recent_transactions': recent_transactions,
+        'loan_contacts_count': contacts_count,
+        'budgets': lambda: fetch(supabase.table('budgets').select('*').eq('user_id', user_id)),
+    }
+    names = [name for name, needed in needs(options['include']).items() if needed]
+    results = await asyncio.gather(*(loaders[name]() for name in names))
+
+    return jsonify(build_dashboard(options['include'], **dict(zip(names, results)))), 200
+
+
+@async_dashboard_bp.route('/balance', methods=['GET'])
+async def get_balance():
+    """Get current balance for validation purposes"""
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+
+    balance_data = await calculate_balance_async(user_id)
+
+    return jsonify({
+        'balance': balance_data['total_balance'],
+        'total_income': balance_data['total_income'],
+        'total_expenses': balance_data['total_expenses'],
+        'loan_given': balance_data['outstanding_given'],
+        'loan_borrowed': balance_data['outstanding_borrowed']
+    }), 200
+
+
+@async_loan_contacts_bp.route('', methods=['GET'])
+async def get_contacts():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+
+    supabase = await get_async_client()
+    contacts, balances, touches = await asyncio.gather(
+        fetch(supabase.table('loan_contacts').select('*').eq('user_id', user_id).order('updated_at', desc=True)),
+        contact_balances_async(user_id),
+        asyncio.to_thread(pending, 'loan_contacts', user_id),
+    )
+    contacts = with_pending_touches(contacts, touches)
+
+    return jsonify({'contacts': [contact_summary(c, balances.get(c['id'])) for c in contacts]}), 200
+
+
+@async_loan_contacts_bp.route('/<contact_id>', methods=['GET'])
+async def get_contact(contact_id):
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+
+    # Same cache entry as the sync route, so writes from either app invalidate it
+    cache_key = user_key(user_id, 'contact', contact_id)
+    cached = await asyncio.to_thread(cache_get, cache_key)
+    if cached is not None:
+        return jsonify(cached), 200
+
+    generation = await asyncio.to_thread(user_generation, user_id)
+    supabase = await get_async_client()
+    contacts = await fetch(supabase.table('loan_contacts').select('*, loan_activities(*)').eq('id', contact_id).eq('user_id', user_id))
+    if not contacts:
+        return jsonify({'message': 'Contact not found'}), 404
+
+    result = contact_detail(contacts[0])
+    await asyncio.to_thread(cache_set_for_user, user_id, generation, cache_key, result)
+
+    return jsonify(result), 200
+
+
+@async_loan_contacts_bp.route('/<contact_id>/activities', methods=['GET'])
+async def get_activities(contact_id):
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+
+    supabase = await get_async_client()
+
+    # Ownership check and the activity read do not depend on each other
+    contact, activities = await asyncio.gather(
+        fetch(supabase.table('loan_contacts').select('id').eq('id', contact_id).eq('user_id', user_id)),
+        fetch(supabase.table('loan_activities').select('*').eq('contact_id', contact_id).order('activity_date', desc=True).order('created_at', desc=True)),
+    )
+    if not contact:
+        return jsonify({'message': 'Contact not found'}), 404
+
+    return jsonify({'activities': activities}), 200
+
+
+@async_transaction_bp.route('', methods=['GET'])
+async def get_transactions():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+
+    supabase = await get_async_client()
+
+    category = request.args.get('category')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    query = supabase.table('transactions').select('*').eq('user_id', user_id)
+
+    if category:
+        query = query.eq('category', category)
+    if start_date:
+        query = query.gte('date', start_date)
+    if end_date:
+        query = query.lte('date', end_date)
+
+    return jsonify({'transactions': await fetch(query.order('date', desc=True))}), 200
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from services.supabase_service import get_client
+from services.profile_service import get_profile_name, invalidate_profile
 from utils.jwt_handler import create_token, decode_token
 
 auth_bp = Blueprint('auth', __name__)
@@ -21,13 +22,9 @@ def validate_token():
     if not user_id:
         return jsonify({'valid': False, 'message': 'Invalid token payload'}), 401
     
-    # Get user info from database
-    supabase = get_client()
+    # The name comes from the profile cache; the database is only read on a miss
     try:
-        profile_response = supabase.table('profiles').select('name').eq('id', user_id).execute()
-        user_name = None
-        if profile_response.data and len(profile_response.data) > 0:
-            user_name = profile_response.data[0].get('name')
+        user_name = get_profile_name(user_id)
         
         return jsonify({
             'valid': True,
@@ -63,6 +60,7 @@ def signup():
             
             # Update the profile with the user's name
             supabase.table('profiles').update({'name': name}).eq('id', user_id).execute()
+            invalidate_profile(user_id)
             
             token = create_token(user_id, email)
             return jsonify({
@@ -103,11 +101,8 @@ def login():
             
             user_id = response.user.id
             
-            # Get user's name from profiles table
-            profile_response = supabase.table('profiles').select('name').eq('id', user_id).execute()
-            user_name = None
-            if profile_response.data and len(profile_response.data) > 0:
-                user_name = profile_response.data[0].get('name')
+            # Get user's name from the profile cache (warms it for /validate)
+            user_name = get_profile_name(user_id)
             
             token = create_token(user_id, email)
             return jsonify({
@@ -0,0 +1,172 @@
+from datetime import date
+from flask import Blueprint, request, jsonify
+from services.supabase_service import get_client
+from services.budget_service import PERIODS, period_bounds, reached_threshold, spent_in_period, status, get_budget_status
+from utils.jwt_handler import decode_token
+from utils.money import parse_amount
+from utils.idempotency import idempotent
+import uuid
+
+budget_bp = Blueprint('budgets', __name__)
+
+def get_user_from_token():
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None
+    
+    try:
+        token = auth_header.split(' ')[1]
+        payload = decode_token(token)
+        return payload.get('user_id') if payload else None
+    except:
+        return None
+
+
+def parse_thresholds(value):
+    thresholds = sorted({int(t) for t in value})
+    if not thresholds or any(t <= 0 for t in thresholds):
+        raise ValueError('thresholds must be positive percentages')
+    return thresholds
+
+
+@budget_bp.route('', methods=['GET'])
+def get_budgets():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    return jsonify({'budgets': get_budget_status(user_id)}), 200
+
+
+@budget_bp.route('', methods=['POST'])
+@idempotent
+def create_budget():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    data = request.get_json()
+    category = data.get('category') or None
+    period = data.get('period', 'monthly')
+    
+    if period not in PERIODS:
+        return jsonify({'message': 'Invalid period'}), 400
+    
+    try:
+        amount = parse_amount(data.get('amount'))
+        thresholds = parse_thresholds(data.get('thresholds', [80, 100]))
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Invalid amount or thresholds'}), 400
+    
+    if amount <= 0:
+        return jsonify({'message': 'Amount must be greater than 0'}), 400
+    
+    supabase = get_client()
+    
+    # One budget per category and period
+    existing = supabase.table('budgets').select('*').eq('user_id', user_id).eq('period', period)
+    existing = existing.eq('category', category) if category else existing.is_('category', 'null')
+    existing = existing.execute()
+    if existing.data:
+        return jsonify({'message': 'Budget for this category and period already exists', 'budget': existing.data[0]}), 409
+    
+    # Seed the counter once; from here on transaction writes keep it current
+    start, end = period_bounds(period, date.today())
+    spent = spent_in_period(user_id, category, start, end)
+    
+    budget_data = {
+        'id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'category': category,
+        'period': period,
+        'amount': amount,
+        'thresholds': thresholds,
+        'spent': spent,
+        'period_start': start.isoformat(),
+        # Already-crossed thresholds are not alerted retroactively
+        'alerted_threshold': reached_threshold(thresholds, spent, amount),
+    }
+    
+    response = supabase.table('budgets').insert(budget_data).execute()
+    
+    if response.data:
+        return jsonify({'message': 'Budget created', 'budget': status(response.data[0])}), 201
+    return jsonify({'message': 'Failed to create budget'}), 400
+
+
+@budget_bp.route('/<budget_id>', methods=['PUT'])
+def update_budget(budget_id):
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    data = request.get_json()
+    
+    supabase = get_client()
+    
+    existing = supabase.table('budgets').select('*').eq('id', budget_id).eq('user_id', user_id).execute()
+    if not existing.data:
+        return jsonify({'message': 'Budget not found'}), 404
+    
+    budget = status(existing.data[0])
+    
+    try:
+        amount = parse_amount(data.get('amount'), budget['amount'])
+        thresholds = parse_thresholds(data.get('thresholds', budget['thresholds']))
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Invalid amount or thresholds'}), 400
+    
+    if amount <= 0:
+        return jsonify({'message': 'Amount must be greater than 0'}), 400
+    
+    update_data = {
+        'amount': amount,
+        'thresholds': thresholds,
+        'alerted_threshold': reached_threshold(thresholds, budget['spent'], amount),
+        'updated_at': 'now()',
+    }
+    
+    response = supabase.table('budgets').update(update_data).eq('id', budget_id).execute()
+    
+    if response.data:
+        return jsonify({'message': 'Budget updated', 'budget': status(response.data[0])}), 200
+    return jsonify({'message': 'Failed to update budget'}), 400
+
+
+@budget_bp.route('/<budget_id>', methods=['DELETE'])
+def delete_budget(budget_id):
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    supabase = get_client()
+    supabase.table('budgets').delete().eq('id', budget_id).eq('user_id', user_id).execute()
+    
+    return jsonify({'message': 'Budget deleted'}), 200
+
+
+@budget_bp.route('/alerts', methods=['GET'])
+def get_alerts():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    supabase = get_client()
+    query = supabase.table('budget_alerts').select('*').eq('user_id', user_id)
+    if request.args.get('unread'):
+        query = query.eq('is_read', False)
+    response = query.order('created_at', desc=True).limit(50).execute()
+    
+    return jsonify({'alerts': response.data}), 200
+
+
+@budget_bp.route('/alerts/<alert_id>/read', methods=['PUT'])
+def mark_alert_read(alert_id):
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    supabase = get_client()
+    supabase.table('budget_alerts').update({'is_read': True}).eq('id', alert_id).eq('user_id', user_id).execute()
+    
+    return jsonify({'message': 'Alert marked as read'}), 200
@@ -1,5 +1,8 @@
 from flask import Blueprint, jsonify, request
 from services.supabase_service import get_client
+from services.balance_service import calculate_balance
+from services.dashboard_service import build_dashboard, month_window_start, needs, parse_options
+from services.aggregate_service import activity_totals, monthly_totals, transaction_totals
 from utils.jwt_handler import decode_token
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -17,188 +20,49 @@ def get_user_from_token():
         return None
 
 
-def calculate_balance(user_id):
-    """Calculate current balance including all loan activities"""
-    supabase = get_client()
-    
-    # Get all transactions
-    tx_response = supabase.table('transactions').select('*').eq('user_id', user_id).execute()
-    transactions = tx_response.data
-    
-    # Get all loan activities from new loan system
-    activities_response = supabase.table('loan_activities').select('*').eq('user_id', user_id).execute()
-    activities = activities_response.data
-    
-    # Also get old loans for backward compatibility
-    old_loans_response = supabase.table('loans').select('*').eq('user_id', user_id).execute()
-    old_loans = old_loans_response.data
-    
-    # Calculate totals from transactions
-    total_income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-    total_expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
-    
-    # Calculate from new loan activities
-    # Given: money going OUT (decreases balance)
-    # Borrowed: money coming IN (increases balance)
-    # Payment received: money coming IN (increases balance)
-    # Payment made: money going OUT (decreases balance)
-    
-    total_loan_given = sum(a['amount'] for a in activities if a['activity_type'] == 'given')
-    total_loan_borrowed = sum(a['amount'] for a in activities if a['activity_type'] == 'borrowed')
-    total_payment_received = sum(a['amount'] for a in activities if a['activity_type'] == 'payment_received')
-    total_payment_made = sum(a['amount'] for a in activities if a['activity_type'] == 'payment_made')
-    
-    # Also include old loans for backward compatibility
-    old_loan_given = sum(
-        l['amount'] - (l.get('paid_amount') or 0) 
-        for l in old_loans 
-        if l['type'] == 'given' and not l.get('is_paid', False)
-    )
-    old_loan_borrowed = sum(
-        l['amount'] - (l.get('paid_amount') or 0) 
-        for l in old_loans 
-        if l['type'] == 'borrowed' and not l.get('is_paid', False)
-    )
-    
-    # Combine old and new loan data
-    total_given = total_loan_given + old_loan_given
-    total_borrowed = total_loan_borrowed + old_loan_borrowed
-    
-    # Calculate current outstanding from loan contacts
-    # Get latest balance for each contact
-    contacts_response = supabase.table('loan_contacts').select('id').eq('user_id', user_id).execute()
-    contact_ids = [c['id'] for c in contacts_response.data]
-    
-    outstanding_given = 0
-    outstanding_borrowed = 0
-    
-    for contact_id in contact_ids:
-        latest = supabase.table('loan_activities').select('balance_after').eq('contact_id', contact_id).order('created_at', desc=True).limit(1).execute()
-        if latest.data:
-            balance = latest.data[0]['balance_after']
-            if balance > 0:
-                outstanding_given += balance
-            else:
-                outstanding_borrowed += abs(balance)
-    
-    # Add old loans outstanding
-    outstanding_given += old_loan_given
-    outstanding_borrowed += old_loan_borrowed
-    
-    # Total Balance = Income - Expenses - Given + Borrowed + PaymentReceived - PaymentMade
-    total_balance = total_income - total_expenses - total_loan_given + total_loan_borrowed + total_payment_received - total_payment_made - old_loan_given + old_loan_borrowed
-    
-    return {
-        'total_balance': total_balance,
-        'total_income': total_income,
-        'total_expenses': total_expenses,
-        'loan_given': total_given,
-        'loan_borrowed': total_borrowed,
-        'payment_received': total_payment_received,
-        'payment_made': total_payment_made,
-        'outstanding_given': outstanding_given,
-        'outstanding_borrowed': outstanding_borrowed,
-    }
-
-
 @dashboard_bp.route('', methods=['GET'])
 def get_dashboard():
     user_id = get_user_from_token()
     if not user_id:
         return jsonify({'message': 'Unauthorized'}), 401
     
-    balance_data = calculate_balance(user_id)
+    try:
+        options = parse_options(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
+    # Only what the included sections render is fetched
+    need = needs(options['include'])
+    data = {}
     supabase = get_client()
     
-    # Get transactions for monthly data
-    tx_response = supabase.table('transactions').select('*').eq('user_id', user_id).execute()
-    transactions = tx_response.data
-    
-    # Get loan activities for monthly loan data
-    activities_response = supabase.table('loan_activities').select('*').eq('user_id', user_id).execute()
-    loan_activities = activities_response.data
-    
-    # Get loan contacts count
-    contacts_response = supabase.table('loan_contacts').select('id').eq('user_id', user_id).execute()
-    loan_contacts_count = len(contacts_response.data)
-    
-    # Monthly data for transactions
-    monthly_data = {}
-    for t in transactions:
-        month = t['date'][:7]  # YYYY-MM
-        if month not in monthly_data:
-            monthly_data[month] = {'income': 0, 'expense': 0, 'loan_given': 0, 'loan_borrowed': 0}
-        if t['type'] == 'income':
-            monthly_data[month]['income'] += t['amount']
-        else:
-            monthly_data[month]['expense'] += t['amount']
-    
-    # Monthly data for loan activities
-    for activity in loan_activities:
-        if activity.get('created_at'):
-            month = activity['created_at'][:7]  # YYYY-MM
-            if month not in monthly_data:
-                monthly_data[month] = {'income': 0, 'expense': 0, 'loan_given': 0, 'loan_borrowed': 0}
-            if activity['activity_type'] == 'given':
-                monthly_data[month]['loan_given'] += activity['amount']
-            elif activity['activity_type'] == 'borrowed':
-                monthly_data[month]['loan_borrowed'] += activity['amount']
+    if need['balance_data']:
+        data['balance_data'] = calculate_balance(user_id)
     
-    # Sort by month and take last 6 months
-    sorted_months = sorted(monthly_data.keys())[-6:]
-    monthly_list = [{'month': m, **monthly_data[m]} for m in sorted_months]
+    # Totals for the breakdowns and monthly data are aggregated by the database
+    if need['tx_totals']:
+        data['tx_totals'] = transaction_totals(user_id)
+    if need['monthly']:
+        data['monthly'] = monthly_totals(user_id, month_window_start(options['months']))
+    if need['loan_totals']:
+        data['loan_totals'] = activity_totals(user_id)
     
-    # Recent transactions (last 10)
-    recent_transactions = sorted(transactions, key=lambda x: x['date'], reverse=True)[:10]
+    # Only the transactions shown are fetched as rows
+    if need['recent_transactions']:
+        data['recent_transactions'] = []
+        if options['recent']:
+            recent_response = supabase.table('transactions').select('*').eq('user_id', user_id).order('date', desc=True).limit(options['recent']).execute()
+            data['recent_transactions'] = recent_response.data
     
-    # Category-wise expense breakdown
-    expense_by_category = {}
-    income_by_category = {}
-    for t in transactions:
-        category = t.get('category', 'Other')
-        if t['type'] == 'expense':
-            expense_by_category[category] = expense_by_category.get(category, 0) + t['amount']
-        else:
-            income_by_category[category] = income_by_category.get(category, 0) + t['amount']
-    
-    # Transaction counts
-    total_transactions = len(transactions)
-    total_income_count = len([t for t in transactions if t['type'] == 'income'])
-    total_expense_count = len([t for t in transactions if t['type'] == 'expense'])
-    
-    # Average transaction values
-    avg_income = balance_data['total_income'] / total_income_count if total_income_count > 0 else 0
-    avg_expense = balance_data['total_expenses'] / total_expense_count if total_expense_count > 0 else 0
+    # Get loan contacts count
+    if need['loan_contacts_count']:
+        data['loan_contacts_count'] = supabase.table('loan_contacts').select('id', count='exact').eq('user_id', user_id).limit(1).execute().count or 0
     
-    # Loan activity counts
-    total_loan_activities = len(loan_activities)
-    total_given_count = len([a for a in loan_activities if a['activity_type'] == 'given'])
-    total_borrowed_count = len([a for a in loan_activities if a['activity_type'] == 'borrowed'])
+    # Budget counters are maintained on write, so this is a single small read
+    if need['budgets']:
+        data['budgets'] = supabase.table('budgets').select('*').eq('user_id', user_id).execute().data
     
-    return jsonify({
-        'total_balance': balance_data['total_balance'],
-        'total_income': balance_data['total_income'],
-        'total_expenses': balance_data['total_expenses'],
-        'loan_given': balance_data['outstanding_given'],
-        'loan_borrowed': balance_data['outstanding_borrowed'],
-        'total_loan_given': balance_data['loan_given'],
-        'total_loan_borrowed': balance_data['loan_borrowed'],
-        'monthly_data': monthly_list,
-        'recent_transactions': recent_transactions,
-        # Additional analytics data
-        'expense_by_category': expense_by_category,
-        'income_by_category': income_by_category,
-        'loan_contacts_count': loan_contacts_count,
-        'total_transactions': total_transactions,
-        'total_income_count': total_income_count,
-        'total_expense_count': total_expense_count,
-        'avg_income': avg_income,
-        'avg_expense': avg_expense,
-        'total_loan_activities': total_loan_activities,
-        'total_given_count': total_given_count,
-        'total_borrowed_count': total_borrowed_count,
-    }), 200
+    return jsonify(build_dashboard(options['include'], **data)), 200
 
 
 @dashboard_bp.route('/balance', methods=['GET'])
@@ -0,0 +1,101 @@
+import json
+import time
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from config import Config
+from services.analytics_service import ledger_version
+from services.balance_service import calculate_balance
+from services.event_service import events_after, latest_event_id, oldest_event_id
+from services.resilience import extend_deadline
+from services.single_flight import forget_request_reads
+from utils.jwt_handler import decode_token
+
+events_bp = Blueprint('events', __name__)
+
+def get_user_from_token():
+    auth_header = request.headers.get('Authorization')
+    # EventSource in browsers cannot set headers, so the token may come in the query string
+    token = auth_header.split(' ')[1] if auth_header and ' ' in auth_header else request.args.get('access_token')
+    if not token:
+        return None
+
+    try:
+        payload = decode_token(token)
+        return payload.get('user_id') if payload else None
+    except:
+        return None
+
+
+def _message(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def _snapshot(user_id):
+    """Current balance and ledger version; the balance comes from the shared cache"""
+    balance = calculate_balance(user_id)
+    return {
+        'balance': balance['total_balance'],
+        'outstanding_given': balance['outstanding_given'],
+        'outstanding_borrowed': balance['outstanding_borrowed'],
+        'ledger_version': ledger_version(user_id),
+    }
+
+
+def _stream(user_id, last_event_id):
+    yield f'retry: {Config.EVENT_RETRY_MS}\n\n'
+
+    if last_event_id is None:
+        # New subscriber: start from the current state
+        last_event_id = latest_event_id()
+        previous = _snapshot(user_id)
+        yield _message(last_event_id, 'snapshot', previous)
+    elif last_event_id + 1 < oldest_event_id():
+        # Events since last_event_id were pruned; the client must refetch
+        last_event_id = latest_event_id()
+        previous = _snapshot(user_id)
+        yield _message(last_event_id, 'resync', previous)
+    else:
+        previous = None
+
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < Config.EVENT_STREAM_MAX:
+        # The request deadline and read memo cover one poll, not the whole
+        # stream, so every snapshot reads the current balance
+        extend_deadline()
+        forget_request_reads()
+        events = events_after(user_id, last_event_id)
+        if events:
+            # One balance read per batch of changes, shared with every other subscriber
+            current = _snapshot(user_id)
+            for event_id, kind, data in events:
+                delta = {'kind': kind, **data, 'ledger_version': current['ledger_version'], 'balance': current['balance']}
+                if previous is not None:
+                    delta['balance_change'] = round(current['balance'] - previous['balance'], 2)
+                yield _message(event_id, 'change', delta)
+                last_event_id = event_id
+                previous = current
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= Config.EVENT_HEARTBEAT:
+            yield ': heartbeat\n\n'
+            last_sent = time.monotonic()
+        time.sleep(Config.EVENT_POLL_INTERVAL)
+    # Streams end after EVENT_STREAM_MAX so workers are not held forever;
+    # the client reconnects with Last-Event-ID and misses nothing.
+
+
+@events_bp.route('', methods=['GET'])
+def stream_events():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    return Response(
+        stream_with_context(_stream(user_id, last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
@@ -1,6 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from services.supabase_service import get_client
+from services.contact_service import contact_detail, contact_summary, with_pending_touches
+from services.aggregate_service import contact_balances
+from services.statement_service import decode_cursor, encode_cursor, iter_statement, parse_limit, statement_page
+from services.write_behind import touch, pending
+from services.event_service import publish
+from services.cache_service import cache_get, cache_set_for_user, invalidate_user, user_generation, user_key
 from utils.jwt_handler import decode_token
+from utils.money import add_amounts, from_cents, parse_amount
+from utils.idempotency import idempotent
+import csv
+import io
+import json
 import uuid
 
 loan_contacts_bp = Blueprint('loan_contacts', __name__)
@@ -27,29 +38,19 @@ def get_contacts():
     supabase = get_client()
     response = supabase.table('loan_contacts').select('*').eq('user_id', user_id).order('updated_at', desc=True).execute()
     
-    contacts = []
-    for contact in response.data:
-        # Get latest balance
-        activities_response = supabase.table('loan_activities').select('balance_after').eq('contact_id', contact['id']).order('created_at', desc=True).limit(1).execute()
-        
-        current_balance = 0
-        if activities_response.data:
-            current_balance = activities_response.data[0].get('balance_after', 0)
-        
-        # Get activity count
-        count_response = supabase.table('loan_activities').select('id', count='exact').eq('contact_id', contact['id']).execute()
-        activity_count = count_response.count or 0
-        
-        contacts.append({
-            **contact,
-            'current_balance': current_balance,
-            'activity_count': activity_count
-        })
+    # Latest balance and activity count of every contact in one aggregated read
+    balances = contact_balances(user_id)
+    
+    contacts = [
+        contact_summary(contact, balances.get(contact['id']))
+        for contact in with_pending_touches(response.data, pending('loan_contacts', user_id))
+    ]
     
     return jsonify({'contacts': contacts}), 200
 
 
 @loan_contacts_bp.route('', methods=['POST'])
+@idempotent
 def create_contact():
     user_id = get_user_from_token()
     if not user_id:
@@ -77,6 +78,7 @@ def create_contact():
     response = supabase.table('loan_contacts').insert(contact_data).execute()
     
     if response.data:
+        publish(user_id, 'loan_contact', op='created', id=contact_data['id'])
         return jsonify({'message': 'Contact created', 'contact': response.data[0]}), 201
     return jsonify({'message': 'Failed to create contact'}), 400
 
@@ -87,42 +89,24 @@ def get_contact(contact_id):
     if not user_id:
         return jsonify({'message': 'Unauthorized'}), 401
     
+    # Detail view is cached per contact; activity and contact writes invalidate it
+    cache_key = user_key(user_id, 'contact', contact_id)
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return jsonify(cached), 200
+    
+    generation = user_generation(user_id)
     supabase = get_client()
     
-    # Get contact
-    contact_response = supabase.table('loan_contacts').select('*').eq('id', contact_id).eq('user_id', user_id).execute()
+    # Get contact and all of its activities in one round-trip
+    contact_response = supabase.table('loan_contacts').select('*, loan_activities(*)').eq('id', contact_id).eq('user_id', user_id).execute()
     if not contact_response.data:
         return jsonify({'message': 'Contact not found'}), 404
     
-    contact = contact_response.data[0]
-    
-    # Get summary stats
-    activities_response = supabase.table('loan_activities').select('activity_type', 'amount').eq('contact_id', contact_id).execute()
-    
-    total_given = sum(a['amount'] for a in activities_response.data if a['activity_type'] == 'given')
-    total_borrowed = sum(a['amount'] for a in activities_response.data if a['activity_type'] == 'borrowed')
-    total_paid_to_you = sum(a['amount'] for a in activities_response.data if a['activity_type'] == 'payment_received')
-    total_you_paid = sum(a['amount'] for a in activities_response.data if a['activity_type'] == 'payment_made')
-    
-    # Get latest balance
-    latest_activity = supabase.table('loan_activities').select('balance_after').eq('contact_id', contact_id).order('created_at', desc=True).limit(1).execute()
-    current_balance = latest_activity.data[0]['balance_after'] if latest_activity.data else 0
-    
-    # Get all activities
-    all_activities = supabase.table('loan_activities').select('*').eq('contact_id', contact_id).order('activity_date', desc=True).order('created_at', desc=True).execute()
-    
-    return jsonify({
-        'contact': {
-            **contact,
-            'current_balance': current_balance,
-            'total_given': total_given,
-            'total_borrowed': total_borrowed,
-            'total_paid_to_you': total_paid_to_you,
-            'total_you_paid': total_you_paid,
-            'activity_count': len(activities_response.data)
-        },
-        'activities': all_activities.data
-    }), 200
+    result = contact_detail(contact_response.data[0])
+    cache_set_for_user(user_id, generation, cache_key, result)
+    
+    return jsonify(result), 200
 
 
 @loan_contacts_bp.route('/<contact_id>', methods=['PUT'])
@@ -152,6 +136,8 @@ def update_contact(contact_id):
     update_data = {k: v for k, v in update_data.items() if v is not None}
     
     response = supabase.table('loan_contacts').update(update_data).eq('id', contact_id).execute()
+    invalidate_user(user_id)
+    publish(user_id, 'loan_contact', op='updated', id=contact_id)
     
     if response.data:
         return jsonify({'message': 'Contact updated', 'contact': response.data[0]}), 200
@@ -176,6 +162,8 @@ def delete_contact(contact_id):
     
     # Delete contact
     supabase.table('loan_contacts').delete().eq('id', contact_id).execute()
+    invalidate_user(user_id)
+    publish(user_id, 'loan_contact', op='deleted', id=contact_id)
     
     return jsonify({'message': 'Contact deleted'}), 200
 
@@ -198,7 +186,79 @@ def get_activities(contact_id):
     return jsonify({'activities': response.data}), 200
 
 
+STATEMENT_CSV_COLUMNS = ['activity_date', 'created_at', 'id', 'activity_type', 'amount', 'description', 'balance']
+
+
+def _statement_csv(activities):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=STATEMENT_CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue()
+    for activity in activities:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(activity)
+        yield buffer.getvalue()
+
+
+def _statement_ndjson(contact_id, opening, activities):
+    yield json.dumps({'type': 'opening', 'contact_id': contact_id, 'balance': opening}) + '\n'
+    closing, count = opening, 0
+    for activity in activities:
+        closing, count = activity['balance'], count + 1
+        yield json.dumps({'type': 'activity', **activity}) + '\n'
+    yield json.dumps({'type': 'closing', 'contact_id': contact_id, 'balance': closing, 'activity_count': count}) + '\n'
+
+
+@loan_contacts_bp.route('/<contact_id>/statement', methods=['GET'])
+def get_statement(contact_id):
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    output = request.args.get('format', 'json')
+    if output not in ('json', 'csv', 'ndjson'):
+        return jsonify({'message': 'format must be json, csv or ndjson'}), 400
+    try:
+        limit = parse_limit(request.args)
+        cursor = request.args.get('cursor')
+        position, opening = decode_cursor(contact_id, cursor) if cursor else (None, 0)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    supabase = get_client()
+    
+    # Verify ownership
+    contact = supabase.table('loan_contacts').select('id').eq('id', contact_id).eq('user_id', user_id).execute()
+    if not contact.data:
+        return jsonify({'message': 'Contact not found'}), 404
+    
+    if output == 'json':
+        activities, closing, last, has_more = statement_page(user_id, contact_id, position, opening, limit)
+        return jsonify({
+            'contact_id': contact_id,
+            'opening_balance': from_cents(opening),
+            'closing_balance': from_cents(closing),
+            'activities': activities,
+            'has_more': has_more,
+            'next_cursor': encode_cursor(contact_id, last, closing) if has_more else None,
+        }), 200
+    
+    # Streamed from the cursor to the end, limit rows at a time
+    activities = iter_statement(user_id, contact_id, position, opening, limit)
+    if output == 'csv':
+        body, mimetype = _statement_csv(activities), 'text/csv'
+    else:
+        body, mimetype = _statement_ndjson(contact_id, from_cents(opening), activities), 'application/x-ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=statement-{contact_id}.{output}', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @loan_contacts_bp.route('/<contact_id>/activities', methods=['POST'])
+@idempotent
 def add_activity(contact_id):
     user_id = get_user_from_token()
     if not user_id:
@@ -206,7 +266,10 @@ def add_activity(contact_id):
     
     data = request.get_json()
     activity_type = data.get('activity_type')
-    amount = float(data.get('amount', 0))
+    try:
+        amount = parse_amount(data.get('amount'))
+    except ValueError:
+        return jsonify({'message': 'Invalid amount'}), 400
     
     if amount <= 0:
         return jsonify({'message': 'Amount must be greater than 0'}), 400
@@ -227,13 +290,13 @@ def add_activity(contact_id):
     
     # Calculate new balance
     if activity_type == 'given':
-        new_balance = previous_balance + amount
+        new_balance = add_amounts(previous_balance, amount)
     elif activity_type == 'borrowed':
-        new_balance = previous_balance - amount
+        new_balance = add_amounts(previous_balance, -amount)
     elif activity_type == 'payment_received':
-        new_balance = previous_balance - amount
+        new_balance = add_amounts(previous_balance, -amount)
     elif activity_type == 'payment_made':
-        new_balance = previous_balance + amount
+        new_balance = add_amounts(previous_balance, amount)
     
     activity_data = {
         'id': str(uuid.uuid4()),
@@ -247,9 +310,11 @@ def add_activity(contact_id):
     }
     
     response = supabase.table('loan_activities').insert(activity_data).execute()
+    invalidate_user(user_id)
+    publish(user_id, 'loan_activity', op='created', id=activity_data['id'], contact_id=contact_id)
     
-    # Update contact timestamp
-    supabase.table('loan_contacts').update({'updated_at': 'now()'}).eq('id', contact_id).execute()
+    # Update contact timestamp (written behind, off the request path)
+    touch('loan_contacts', contact_id, user_id)
     
     if response.data:
         return jsonify({
@@ -291,7 +356,7 @@ def delete_activity(contact_id, activity_id):
     supabase.table('loan_activities').delete().eq('id', activity_id).execute()
     
     # Get all remaining activities after the deleted one (in chronological order)
-    remaining_activities = supabase.table('loan_activities').select('*').eq('contact_id', contact_id).order('activity_date', ascending=True).order('created_at', ascending=True).execute()
+    remaining_activities = supabase.table('loan_activities').select('*').eq('contact_id', contact_id).order('activity_date').order('created_at').execute()
     
     # Recalculate balances for remaining activities
     # First, find the balance before the deleted activity
@@ -306,13 +371,13 @@ def delete_activity(contact_id, activity_id):
         remaining_amount = remaining['amount']
         
         if remaining_type == 'given':
-            new_balance = previous_balance + remaining_amount
+            new_balance = add_amounts(previous_balance, remaining_amount)
         elif remaining_type == 'borrowed':
-            new_balance = previous_balance - remaining_amount
+            new_balance = add_amounts(previous_balance, -remaining_amount)
         elif remaining_type == 'payment_received':
-            new_balance = previous_balance - remaining_amount
+            new_balance = add_amounts(previous_balance, -remaining_amount)
         elif remaining_type == 'payment_made':
-            new_balance = previous_balance + remaining_amount
+            new_balance = add_amounts(previous_balance, remaining_amount)
         else:
             new_balance = previous_balance
         
@@ -322,8 +387,10 @@ def delete_activity(contact_id, activity_id):
         # Set this as the new previous balance for the next iteration
         previous_balance = new_balance
     
-    # Update contact's updated_at timestamp
-    supabase.table('loan_contacts').update({'updated_at': 'now()'}).eq('id', contact_id).execute()
+    # Update contact's updated_at timestamp (written behind, off the request path)
+    touch('loan_contacts', contact_id, user_id)
+    invalidate_user(user_id)
+    publish(user_id, 'loan_activity', op='deleted', id=activity_id, contact_id=contact_id)
     
     return jsonify({'message': 'Activity deleted', 'new_balance': previous_balance}), 200
 
@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
+from config import Config
 from services.supabase_service import get_client
+from services.event_service import publish
+from services.cache_service import invalidate_user
+from services.balance_service import calculate_balance
 from utils.jwt_handler import decode_token
+from utils.money import parse_amount
+from utils.idempotency import idempotent
 import uuid
 
 loan_bp = Blueprint('loans', __name__)
@@ -18,35 +24,20 @@ def get_user_from_token():
         return None
 
 
-def calculate_balance(user_id):
-    """Calculate current balance including loans"""
-    supabase = get_client()
-    
-    # Get all transactions
-    tx_response = supabase.table('transactions').select('*').eq('user_id', user_id).execute()
-    transactions = tx_response.data
-    
-    # Get all unpaid loans
-    loan_response = supabase.table('loans').select('*').eq('user_id', user_id).eq('is_paid', False).execute()
-    loans = loan_response.data
-    
-    # Calculate totals
-    total_income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-    total_expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
-    
-    total_loan_given = sum(
-        l['amount'] - (l.get('paid_amount') or 0) 
-        for l in loans 
-        if l['type'] == 'given'
-    )
-    total_loan_borrowed = sum(
-        l['amount'] - (l.get('paid_amount') or 0) 
-        for l in loans 
-        if l['type'] == 'borrowed'
-    )
-    
-    # Total Money = Income - Expenses + Borrowed - Given
-    return total_income - total_expenses + total_loan_borrowed - total_loan_given
+def legacy_loans_retired():
+    # After cutover (LEGACY_LOANS_ENABLED=0) the loans table is no longer part
+    # of the balance, so a loan written here would silently not count
+    if not Config.LEGACY_LOANS_ENABLED:
+        return jsonify({'message': 'Loans are now tracked per contact; use /api/loan-contacts'}), 410
+    return None
+
+
+def migrated_loan(supabase, loan_id, user_id):
+    # A migrated loan lives on as loan activities; editing the legacy row would not change the balance
+    existing = supabase.table('loans').select('migrated_at').eq('id', loan_id).eq('user_id', user_id).execute()
+    if existing.data and existing.data[0].get('migrated_at'):
+        return jsonify({'message': 'This loan was moved to loan contacts; change it there'}), 409
+    return None
 
 
 @loan_bp.route('', methods=['GET'])
@@ -61,19 +52,27 @@ def get_loans():
     return jsonify({'loans': response.data}), 200
 
 @loan_bp.route('', methods=['POST'])
+@idempotent
 def add_loan():
     user_id = get_user_from_token()
     if not user_id:
         return jsonify({'message': 'Unauthorized'}), 401
     
+    retired = legacy_loans_retired()
+    if retired:
+        return retired
+    
     data = request.get_json()
     
     loan_type = data.get('type')
-    amount = float(data.get('amount', 0))
+    try:
+        amount = parse_amount(data.get('amount'))
+    except ValueError:
+        return jsonify({'message': 'Invalid amount'}), 400
     
     # Check balance for "loan given" - cannot give more than current balance
     if loan_type == 'given':
-        current_balance = calculate_balance(user_id)
+        current_balance = calculate_balance(user_id)['total_balance']
         if amount > current_balance:
             return jsonify({
                 'message': 'Insufficient balance to give this loan',
@@ -97,6 +96,8 @@ def add_loan():
     
     supabase = get_client()
     response = supabase.table('loans').insert(loan_data).execute()
+    invalidate_user(user_id)
+    publish(user_id, 'loan', op='created', id=loan_data['id'])
     
     if response.data:
         return jsonify({'message': 'Loan added', 'loan': response.data[0]}), 201
@@ -108,12 +109,22 @@ def update_loan(loan_id):
     if not user_id:
         return jsonify({'message': 'Unauthorized'}), 401
     
-    data = request.get_json()
+    retired = legacy_loans_retired()
+    if retired:
+        return retired
+    
+    # The migration marker and contact link are only set by scripts.migrate_loans
+    data = {k: v for k, v in request.get_json().items() if k not in ('contact_id', 'migrated_at')}
     
     supabase = get_client()
-    response = supabase.table('loans').update(data).eq('id', loan_id).eq('user_id', user_id).execute()
+    moved = migrated_loan(supabase, loan_id, user_id)
+    if moved:
+        return moved
     
+    response = supabase.table('loans').update(data).eq('id', loan_id).eq('user_id', user_id).execute()
+    invalidate_user(user_id)
     if response.data:
+        publish(user_id, 'loan', op='updated', id=loan_id)
         return jsonify({'message': 'Loan updated', 'loan': response.data[0]}), 200
     return jsonify({'message': 'Failed to update loan'}), 400
 
@@ -123,8 +134,19 @@ def delete_loan(loan_id):
     if not user_id:
         return jsonify({'message': 'Unauthorized'}), 401
     
+    retired = legacy_loans_retired()
+    if retired:
+        return retired
+    
     supabase = get_client()
+    moved = migrated_loan(supabase, loan_id, user_id)
+    if moved:
+        return moved
+    
     response = supabase.table('loans').delete().eq('id', loan_id).eq('user_id', user_id).execute()
+    invalidate_user(user_id)
+    if response.data:
+        publish(user_id, 'loan', op='deleted', id=loan_id)
     
     return jsonify({'message': 'Loan deleted'}), 200
 
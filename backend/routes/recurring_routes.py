@@ -0,0 +1,153 @@
+from datetime import date
+from flask import Blueprint, request, jsonify
+from services.supabase_service import get_client
+from services.recurring_service import FREQUENCIES, first_occurrence, next_occurrence
+from utils.jwt_handler import decode_token
+from utils.money import parse_amount
+from utils.idempotency import idempotent
+import uuid
+
+recurring_bp = Blueprint('recurring', __name__)
+
+def get_user_from_token():
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None
+    
+    try:
+        token = auth_header.split(' ')[1]
+        payload = decode_token(token)
+        return payload.get('user_id') if payload else None
+    except:
+        return None
+
+
+def build_rule(data, existing=None):
+    """Validate rule fields from a request body, falling back to an existing rule"""
+    existing = existing or {}
+    rule = {
+        'type': data.get('type', existing.get('type')),
+        'amount': parse_amount(data.get('amount'), existing.get('amount', 0)),
+        'category': data.get('category', existing.get('category')),
+        'description': data.get('description', existing.get('description')),
+        'frequency': data.get('frequency', existing.get('frequency', 'monthly')),
+        'interval': int(data.get('interval', existing.get('interval', 1))),
+        'day_of_month': data.get('day_of_month', existing.get('day_of_month')),
+        'weekday': data.get('weekday', existing.get('weekday')),
+        'start_date': data.get('start_date', existing.get('start_date')) or date.today().isoformat(),
+        'end_date': data.get('end_date', existing.get('end_date')),
+    }
+    if rule['type'] not in ['income', 'expense']:
+        raise ValueError('Invalid transaction type')
+    if rule['amount'] <= 0:
+        raise ValueError('Amount must be greater than 0')
+    if not rule['category']:
+        raise ValueError('Category is required')
+    if rule['frequency'] not in FREQUENCIES:
+        raise ValueError('Invalid frequency')
+    if rule['interval'] <= 0:
+        raise ValueError('Interval must be greater than 0')
+    if rule['day_of_month'] is not None and not 1 <= int(rule['day_of_month']) <= 31:
+        raise ValueError('day_of_month must be between 1 and 31')
+    if rule['weekday'] is not None and not 0 <= int(rule['weekday']) <= 6:
+        raise ValueError('weekday must be between 0 (Monday) and 6 (Sunday)')
+    start = date.fromisoformat(rule['start_date'])
+    if rule['end_date']:
+        date.fromisoformat(rule['end_date'])
+    
+    # Pin the anchor so later edits to start_date don't shift the schedule
+    if rule['frequency'] in ['monthly', 'yearly'] and rule['day_of_month'] is None:
+        rule['day_of_month'] = start.day
+    if rule['frequency'] == 'weekly' and rule['weekday'] is None:
+        rule['weekday'] = start.weekday()
+    return rule
+
+
+@recurring_bp.route('', methods=['GET'])
+def get_rules():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    supabase = get_client()
+    response = supabase.table('recurring_rules').select('*').eq('user_id', user_id).order('next_run').execute()
+    
+    return jsonify({'rules': response.data}), 200
+
+
+@recurring_bp.route('', methods=['POST'])
+@idempotent
+def create_rule():
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    try:
+        rule = build_rule(request.get_json())
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    
+    rule_data = {
+        'id': str(uuid.uuid4()),
+        'user_id': user_id,
+        **rule,
+        'next_run': first_occurrence(rule).isoformat(),
+    }
+    
+    supabase = get_client()
+    response = supabase.table('recurring_rules').insert(rule_data).execute()
+    
+    if response.data:
+        return jsonify({'message': 'Recurring rule created', 'rule': response.data[0]}), 201
+    return jsonify({'message': 'Failed to create recurring rule'}), 400
+
+
+@recurring_bp.route('/<rule_id>', methods=['PUT'])
+def update_rule(rule_id):
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    data = request.get_json()
+    
+    supabase = get_client()
+    existing = supabase.table('recurring_rules').select('*').eq('id', rule_id).eq('user_id', user_id).execute()
+    if not existing.data:
+        return jsonify({'message': 'Recurring rule not found'}), 404
+    
+    try:
+        rule = build_rule(data, existing.data[0])
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # Re-anchor the schedule, without repeating occurrences already created
+    next_run = first_occurrence(rule)
+    last_run = existing.data[0].get('last_run')
+    if last_run:
+        while next_run <= date.fromisoformat(last_run):
+            next_run = next_occurrence(rule, next_run)
+    
+    update_data = {
+        **rule,
+        'next_run': next_run.isoformat(),
+        'is_active': data.get('is_active', existing.data[0].get('is_active', True)),
+        'updated_at': 'now()',
+    }
+    
+    response = supabase.table('recurring_rules').update(update_data).eq('id', rule_id).execute()
+    
+    if response.data:
+        return jsonify({'message': 'Recurring rule updated', 'rule': response.data[0]}), 200
+    return jsonify({'message': 'Failed to update recurring rule'}), 400
+
+
+@recurring_bp.route('/<rule_id>', methods=['DELETE'])
+def delete_rule(rule_id):
+    user_id = get_user_from_token()
+    if not user_id:
+        return jsonify({'message': 'Unauthorized'}), 401
+    
+    supabase = get_client()
+    supabase.table('recurring_rules').delete().eq('id', rule_id).eq('user_id', user_id).execute()
+    
+    return jsonify({'message': 'Recurring rule deleted'}), 200
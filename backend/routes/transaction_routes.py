@@ -1,6 +1,14 @@
 from flask import Blueprint, request, jsonify
 from services.supabase_service import get_client
+from services.event_service import publish
+from services.cache_service import invalidate_user
+from services.balance_service import calculate_balance
+from services.analytics_service import begin_transaction_change, record_transaction_change
+from services.anomaly_service import begin_spending_change, record_spending_change
+from services.budget_service import apply_transaction_change
 from utils.jwt_handler import decode_token
+from utils.money import parse_amount
+from utils.idempotency import idempotent
 import uuid
 
 transaction_bp = Blueprint('transactions', __name__)
@@ -18,35 +26,20 @@ def get_user_from_token():
         return None
 
 
-def calculate_balance(user_id):
-    """Calculate current balance including loans"""
-    supabase = get_client()
-    
-    # Get all transactions
-    tx_response = supabase.table('transactions').select('*').eq('user_id', user_id).execute()
-    transactions = tx_response.data
-    
-    # Get all unpaid loans
-    loan_response = supabase.table('loans').select('*').eq('user_id', user_id).eq('is_paid', False).execute()
-    loans = loan_response.data
-    
-    # Calculate totals
-    total_income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-    total_expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
-    
-    total_loan_given = sum(
-        l['amount'] - (l.get('paid_amount') or 0) 
-        for l in loans 
-        if l['type'] == 'given'
-    )
-    total_loan_borrowed = sum(
-        l['amount'] - (l.get('paid_amount') or 0) 
-        for l in loans 
-        if l['type'] == 'borrowed'
-    )
-    
-    # Total Money = Income - Expenses + Borrowed - Given
-    return total_income - total_expenses + total_loan_borrowed - total_loan_given
+def before_transaction_change(user_id):
+    """Call before a transaction write; pass the result to on_transaction_change"""
+    return begin_transaction_change(user_id), begin_spending_change(user_id)
+
+
+def on_transaction_change(user_id, old=None, new=None, started=None):
+    """Bring everything derived from transactions up to date after a write"""
+    index_started, stats_started = started or (None, None)
+    record_transaction_change(user_id, old=old, new=new, started=index_started)
+    record_spending_change(user_id, old=old, new=new, started=stats_started)
+    alerts = apply_transaction_change(user_id, old=old, new=new)
+    op = 'created' if not old else 'deleted' if not new else 'updated'
+    publish(user_id, 'transaction', op=op, id=(new or old)['id'])
+    return alerts
 
 
 @transaction_bp.route('', methods=['GET'])
@@ -75,6 +68,7 @@ def get_transactions():
     return jsonify({'transactions': response.data}), 200
 
 @transaction_bp.route('', methods=['POST'])
+@idempotent
 def add_transaction():
     user_id = get_user_from_token()
     if not user_id:
@@ -83,11 +77,14 @@ def add_transaction():
     data = request.get_json()
     
     transaction_type = data.get('type')
-    amount = float(data.get('amount', 0))
+    try:
+        amount = parse_amount(data.get('amount'))
+    except ValueError:
+        return jsonify({'message': 'Invalid amount'}), 400
     
     # Check balance for expenses
     if transaction_type == 'expense':
-        current_balance = calculate_balance(user_id)
+        current_balance = calculate_balance(user_id)['total_balance']
         if amount > current_balance:
             return jsonify({
                 'message': 'Insufficient balance',
@@ -107,10 +104,13 @@ def add_transaction():
     }
     
     supabase = get_client()
+    started = before_transaction_change(user_id)
     response = supabase.table('transactions').insert(transaction_data).execute()
+    invalidate_user(user_id)
     
     if response.data:
-        return jsonify({'message': 'Transaction added', 'transaction': response.data[0]}), 201
+        alerts = on_transaction_change(user_id, new=response.data[0], started=started)
+        return jsonify({'message': 'Transaction added', 'transaction': response.data[0], 'budget_alerts': alerts}), 201
     return jsonify({'message': 'Failed to add transaction'}), 400
 
 @transaction_bp.route('/<transaction_id>', methods=['PUT'])
@@ -122,10 +122,25 @@ def update_transaction(transaction_id):
     data = request.get_json()
     
     supabase = get_client()
+    
+    # Keep the old row so derived totals can be patched instead of rebuilt
+    existing = supabase.table('transactions').select('*').eq('id', transaction_id).eq('user_id', user_id).execute()
+    if not existing.data:
+        return jsonify({'message': 'Transaction not found'}), 404
+    
+    if 'amount' in data:
+        try:
+            data['amount'] = parse_amount(data['amount'])
+        except ValueError:
+            return jsonify({'message': 'Invalid amount'}), 400
+    
+    started = before_transaction_change(user_id)
     response = supabase.table('transactions').update(data).eq('id', transaction_id).eq('user_id', user_id).execute()
+    invalidate_user(user_id)
     
     if response.data:
-        return jsonify({'message': 'Transaction updated', 'transaction': response.data[0]}), 200
+        alerts = on_transaction_change(user_id, old=existing.data[0], new=response.data[0], started=started)
+        return jsonify({'message': 'Transaction updated', 'transaction': response.data[0], 'budget_alerts': alerts}), 200
     return jsonify({'message': 'Failed to update transaction'}), 400
 
 @transaction_bp.route('/<transaction_id>', methods=['DELETE'])
@@ -135,7 +150,13 @@ def delete_transaction(transaction_id):
         return jsonify({'message': 'Unauthorized'}), 401
     
     supabase = get_client()
+    started = before_transaction_change(user_id)
     response = supabase.table('transactions').delete().eq('id', transaction_id).eq('user_id', user_id).execute()
+    invalidate_user(user_id)
+    
+    # Deletes return the removed rows
+    for deleted in response.data or []:
+        on_transaction_change(user_id, old=deleted, started=started)
     
     return jsonify({'message': 'Transaction deleted'}), 200
 
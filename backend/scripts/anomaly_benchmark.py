@@ -0,0 +1,149 @@
+"""Cost of keeping spending statistics current, streaming vs rescanning history.
+
+Run from the backend directory:
+
+    python -m scripts.anomaly_benchmark --transactions 100000
+
+One user is seeded on the in-memory data backend with the given number of
+expenses. The report compares, per write, folding the new expense into the
+streaming statistics (services.anomaly_service) with rebuilding them from a
+scan of the whole history, and shows /api/ai/anomalies latency with the
+statistics warm and cold. It also checks the streaming estimates against
+exact values computed from all amounts: the P-square p95 and the Welford
+mean and standard deviation per category.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from scripts.loadtest import CATEGORIES, percentile
+
+
+def configure(args):
+    os.environ['DATA_BACKEND'] = 'local'
+    os.environ['LOCAL_BACKEND_LATENCY_MS'] = str(args.backend_latency_ms)
+    os.environ.setdefault('JWT_SECRET', 'benchmark-secret')
+    # Keep the shared cache of this run away from any real one
+    os.environ['CACHE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='anomaly-benchmark-'), 'cache.sqlite3')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+
+def seed_expenses(user_id, count):
+    """Insert count expenses spread over two years; returns the rows"""
+    from services.supabase_service import get_client
+
+    today = date.today()
+    rows = [
+        {
+            'user_id': user_id,
+            'type': 'expense',
+            'amount': round(random.lognormvariate(3, 0.6), 2),
+            'category': random.choice(CATEGORIES[:-1]),
+            'description': '',
+            'date': (today - timedelta(days=730 * (count - i) // count)).isoformat(),
+        }
+        for i in range(count)
+    ]
+    get_client().table('transactions').insert(rows).execute()
+    return rows
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {'p50_ms': percentile(samples, 50) * 1000, 'p95_ms': percentile(samples, 95) * 1000}
+
+
+def exact_p95(values):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(0.95 * (len(values) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--writes', type=int, default=200, help='streaming updates to time')
+    parser.add_argument('--rebuilds', type=int, default=5, help='full rescans to time')
+    parser.add_argument('--backend-latency-ms', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='write the results as JSON')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    configure(args)
+    from app import app
+    from services import anomaly_service
+    from utils.jwt_handler import create_token
+
+    user_id = '00000000-0000-4000-8000-000000000001'
+    rows = seed_expenses(user_id, args.transactions)
+    headers = {'Authorization': f"Bearer {create_token(user_id, 'bench@example.com')}"}
+    client = app.test_client()
+
+    # Cold: the first read builds the statistics from the whole history
+    cold = timed(lambda: (anomaly_service.invalidate_spending_stats(user_id), client.get('/api/ai/anomalies', headers=headers)), args.rebuilds)
+    rescan = timed(lambda: anomaly_service._build(user_id, None), args.rebuilds)
+    warm = timed(lambda: client.get('/api/ai/anomalies', headers=headers), args.writes)
+
+    # Streaming: one new expense folded in, including the shared cache round-trip
+    today = date.today().isoformat()
+
+    def write():
+        row = {'id': None, 'type': 'expense', 'amount': round(random.lognormvariate(3, 0.6), 2), 'category': random.choice(CATEGORIES[:-1]), 'date': today}
+        rows.append(row)
+        started = anomaly_service.begin_spending_change(user_id)
+        anomaly_service.record_spending_change(user_id, new=row, started=started)
+    streaming = timed(write, args.writes)
+
+    # In-memory update alone, without the cache round-trip (on a copy that is not saved)
+    stats = anomaly_service.get_spending_stats(user_id)
+    update = timed(lambda: stats.apply({'type': 'expense', 'amount': 20.0, 'category': 'Food', 'date': today}), args.writes)
+
+    # Accuracy against exact values over everything folded in so far
+    stats = anomaly_service.get_spending_stats(user_id)
+    accuracy = {}
+    for category, s in sorted(stats.categories.items()):
+        amounts = [r['amount'] for r in rows if r['category'] == category]
+        p95 = exact_p95(amounts)
+        accuracy[category] = {
+            'count': s.count,
+            'p95_exact': round(p95, 2),
+            'p95_sketch': round(s.quantile.value(), 2),
+            'p95_error_pct': round(abs(s.quantile.value() - p95) / p95 * 100, 2),
+            'mean_error': abs(s.mean - statistics.fmean(amounts)),
+            'std_error': abs(s.std - statistics.stdev(amounts)),
+        }
+
+    results = {
+        'transactions': args.transactions,
+        'backend_latency_ms': args.backend_latency_ms,
+        'per_write': {'streaming_update': streaming, 'in_memory_update': update, 'full_rescan': rescan},
+        'anomalies_endpoint': {'warm': warm, 'cold': cold},
+        'accuracy': accuracy,
+    }
+
+    print(f'{args.transactions} expenses, {args.backend_latency_ms:g} ms per query')
+    print(f"{'':<26} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, r in [*results['per_write'].items(), *(('anomalies ' + k, v) for k, v in results['anomalies_endpoint'].items())]:
+        print(f"{name:<26} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f}")
+    print(f"{'category':<14} {'count':>7} {'p95 exact':>10} {'p95 sketch':>11} {'err %':>6} {'mean err':>9} {'std err':>9}")
+    for category, a in accuracy.items():
+        print(f"{category:<14} {a['count']:>7} {a['p95_exact']:>10.2f} {a['p95_sketch']:>11.2f} {a['p95_error_pct']:>6.2f} "
+              f"{a['mean_error']:>9.2e} {a['std_error']:>9.2e}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Concurrent request capacity of one worker, sync (WSGI) vs async (ASGI).
+
+Run from the backend directory:
+
+    python -m scripts.async_benchmark --backend-latency-ms 50 --concurrency 1,10,50,100
+
+Both apps are driven in this process on the in-memory data backend with a
+fixed delay per query standing in for the Supabase round-trip, so the run is
+I/O-bound like production. The sync app is called one request at a time, as
+a sync gunicorn worker does; the async app gets every client's request at
+once on one event loop. Each client sends its next request as soon as the
+previous one finishes (closed loop), and the report shows throughput and
+latency per concurrency level for both modes.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.loadtest import percentile, seed
+
+PATHS = {
+    'dashboard': '/api/dashboard',
+    'balance': '/api/dashboard/balance',
+    'contacts': '/api/loan-contacts',
+}
+
+
+def configure(args):
+    os.environ['DATA_BACKEND'] = 'local'
+    os.environ['LOCAL_BACKEND_LATENCY_MS'] = str(args.backend_latency_ms)
+    os.environ.setdefault('JWT_SECRET', 'benchmark-secret')
+    # Keep the shared cache of this run away from any real one
+    os.environ['CACHE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='async-benchmark-'), 'cache.sqlite3')
+    # Measure the queries, not the balance cache
+    os.environ['BALANCE_CACHE_TTL'] = '0'
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+
+def report(mode, concurrency, latencies, errors, elapsed):
+    latencies.sort()
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0,
+        'p50_ms': (percentile(latencies, 50) or 0) * 1000,
+        'p95_ms': (percentile(latencies, 95) or 0) * 1000,
+    }
+
+
+def run_sync(app, path, users, concurrency, duration):
+    """Closed loop against the WSGI app with one request in flight, like a sync worker"""
+    worker = threading.Lock()
+    latencies = []
+    errors = [0]
+    deadline = time.perf_counter() + duration
+
+    def client(n):
+        test_client = app.test_client()
+        headers = {'Authorization': f"Bearer {users[n % len(users)]['token']}"}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            with worker:
+                status = test_client.get(path, headers=headers).status_code
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    return report('sync', concurrency, latencies, errors[0], time.perf_counter() - started)
+
+
+async def asgi_get(app, path, token):
+    """Call an ASGI app in process; returns the status code"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'root_path': '', 'query_string': b'',
+        'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0] if status else 0
+
+
+async def start_lifespan(app):
+    """Run the ASGI startup handshake the way a server would"""
+    events = asyncio.Queue()
+    started = asyncio.Event()
+    await events.put({'type': 'lifespan.startup'})
+
+    async def send(message):
+        if message['type'] == 'lifespan.startup.complete':
+            started.set()
+
+    task = asyncio.create_task(app({'type': 'lifespan', 'asgi': {'version': '3.0'}}, events.get, send))
+    await started.wait()
+    return task
+
+
+async def run_async(app, path, users, concurrency, duration):
+    """Closed loop against the ASGI app, all clients on one event loop"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(n):
+        nonlocal errors
+        token = users[n % len(users)]['token']
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status = await asgi_get(app, path, token)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    return report('async', concurrency, latencies, errors, time.perf_counter() - started)
+
+
+def print_table(results):
+    print(f"{'mode':<6} {'conc':>5} {'req':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for r in results:
+        print(f"{r['mode']:<6} {r['concurrency']:>5} {r['requests']:>7} {r['errors']:>5} "
+              f"{r['throughput_rps']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoint', choices=sorted(PATHS), default='dashboard')
+    parser.add_argument('--concurrency', default='1,10,50,100', help='comma separated client counts')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per level and mode')
+    parser.add_argument('--backend-latency-ms', type=float, default=50)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=200)
+    parser.add_argument('--contacts', type=int, default=5)
+    parser.add_argument('--activities', type=int, default=20)
+    parser.add_argument('--out', help='write the results as JSON')
+    args = parser.parse_args()
+
+    configure(args)
+    from app import app as wsgi_app
+    from asgi import app as asgi_app
+
+    users = seed(args.users, args.transactions, args.contacts, args.activities)
+    path = PATHS[args.endpoint]
+    levels = [int(c) for c in args.concurrency.split(',')]
+
+    async def run_all_async():
+        lifespan = await start_lifespan(asgi_app)
+        results = [await run_async(asgi_app, path, users, c, args.duration) for c in levels]
+        lifespan.cancel()
+        return results
+
+    results = [run_sync(wsgi_app, path, users, c, args.duration) for c in levels]
+    results += asyncio.run(run_all_async())
+
+    print(f'{args.endpoint}: {args.backend_latency_ms:g} ms per query, one worker')
+    print_table(results)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'endpoint': args.endpoint, 'backend_latency_ms': args.backend_latency_ms, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
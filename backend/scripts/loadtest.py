@@ -0,0 +1,330 @@
+"""Open-loop load test with a mobile-like traffic mix.
+
+Run from the backend directory:
+
+    python -m scripts.loadtest --rate 50 --duration 60 --out before.json
+    python -m scripts.loadtest --rate 50 --duration 60 --out after.json
+    python -m scripts.loadtest --compare before.json after.json
+
+By default the app is started in this process on the in-memory data backend
+(DATA_BACKEND=local), seeded with synthetic users, and served over HTTP by a
+threaded server. Use --url/--token to point it at an already running app.
+
+Requests are started on a fixed schedule regardless of how fast earlier ones
+finish (open loop), and latency is measured from the scheduled start, so a
+slow server shows up as queueing delay instead of a lower offered load.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+DEFAULT_MIX = 'dashboard=30,balance=30,contacts=20,add_transaction=15,add_activity=5'
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Bills', 'Entertainment', 'Salary']
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, weight = part.split('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+        mix[name] = float(weight)
+    return mix
+
+
+# Each scenario returns (method, path, body) for one simulated user
+
+def _dashboard(user):
+    return 'GET', '/api/dashboard', None
+
+
+def _balance(user):
+    return 'GET', '/api/dashboard/balance', None
+
+
+def _contacts(user):
+    return 'GET', '/api/loan-contacts', None
+
+
+def _contact_detail(user):
+    return 'GET', f"/api/loan-contacts/{random.choice(user['contact_ids'])}", None
+
+
+def _validate(user):
+    return 'POST', '/api/auth/validate', None
+
+
+def _add_transaction(user):
+    # Income keeps the insufficient-balance check from rejecting writes
+    return 'POST', '/api/transactions', {
+        'type': 'income',
+        'amount': round(random.uniform(1, 50), 2),
+        'category': random.choice(CATEGORIES),
+        'description': 'load test',
+        'date': date.today().isoformat(),
+    }
+
+
+def _add_activity(user):
+    return 'POST', f"/api/loan-contacts/{random.choice(user['contact_ids'])}/activities", {
+        'activity_type': random.choice(['given', 'payment_received']),
+        'amount': round(random.uniform(1, 20), 2),
+        'activity_date': date.today().isoformat(),
+    }
+
+
+SCENARIOS = {
+    'dashboard': _dashboard,
+    'balance': _balance,
+    'contacts': _contacts,
+    'contact_detail': _contact_detail,
+    'validate': _validate,
+    'add_transaction': _add_transaction,
+    'add_activity': _add_activity,
+}
+
+
+def seed(users, transactions, contacts, activities):
+    """Fill the local backend with synthetic users; returns [{'token', 'contact_ids'}]"""
+    from services.supabase_service import get_client
+    from utils.jwt_handler import create_token
+
+    supabase = get_client()
+    today = date.today()
+    result = []
+    for u in range(users):
+        user_id = f'00000000-0000-4000-8000-{u:012d}'
+        supabase.table('profiles').insert({'id': user_id, 'email': f'user{u}@example.com', 'name': f'User {u}'}).execute()
+
+        rows = []
+        for i in range(transactions):
+            tx_type = 'income' if i % 4 == 0 else 'expense'
+            rows.append({
+                'user_id': user_id,
+                'type': tx_type,
+                'amount': round(random.uniform(100, 500) if tx_type == 'income' else random.uniform(5, 100), 2),
+                'category': 'Salary' if tx_type == 'income' else random.choice(CATEGORIES[:-1]),
+                'description': '',
+                'date': (today - timedelta(days=random.randint(0, 365))).isoformat(),
+            })
+        supabase.table('transactions').insert(rows).execute()
+
+        contact_ids = []
+        for c in range(contacts):
+            contact = supabase.table('loan_contacts').insert({'user_id': user_id, 'name': f'Contact {c}', 'initial_balance': 0}).execute().data[0]
+            contact_ids.append(contact['id'])
+            balance = 0
+            rows = []
+            for _ in range(activities):
+                amount = round(random.uniform(5, 50), 2)
+                balance += amount
+                rows.append({
+                    'user_id': user_id,
+                    'contact_id': contact['id'],
+                    'activity_type': 'given',
+                    'amount': amount,
+                    'balance_after': balance,
+                    'activity_date': (today - timedelta(days=random.randint(0, 365))).isoformat(),
+                })
+            if rows:
+                supabase.table('loan_activities').insert(rows).execute()
+
+        result.append({'token': create_token(user_id, f'user{u}@example.com'), 'contact_ids': contact_ids})
+    return result
+
+
+def start_local_app(args):
+    """Start the app on the in-memory backend; returns (base_url, users)"""
+    os.environ['DATA_BACKEND'] = 'local'
+    os.environ['LOCAL_BACKEND_LATENCY_MS'] = str(args.backend_latency_ms)
+    os.environ.setdefault('JWT_SECRET', 'load-test-secret')
+    # Keep the shared cache of this run away from any real one
+    os.environ['CACHE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'cache.sqlite3')
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    users = seed(args.users, args.transactions, args.contacts, args.activities)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', users
+
+
+def discover_user(base_url, token):
+    request = urllib.request.Request(f'{base_url}/api/loan-contacts', headers={'Authorization': f'Bearer {token}'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        contacts = json.load(response)['contacts']
+    return {'token': token, 'contact_ids': [c['id'] for c in contacts]}
+
+
+def send(base_url, user, scenario, timeout):
+    method, path, body = SCENARIOS[scenario](user)
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method, headers={
+        'Authorization': f"Bearer {user['token']}",
+        'Content-Type': 'application/json',
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return 0
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """samples: [(scenario, latency_seconds, status)]"""
+    groups = {}
+    for scenario, latency, status in samples:
+        groups.setdefault(scenario, []).append((latency, status))
+    groups['ALL'] = [(latency, status) for _, latency, status in samples]
+
+    report = {}
+    for scenario, rows in groups.items():
+        latencies = sorted(latency * 1000 for latency, _ in rows)
+        errors = sum(1 for _, status in rows if not 200 <= status < 300)
+        report[scenario] = {
+            'requests': len(rows),
+            'throughput_rps': len(rows) / elapsed if elapsed else 0,
+            'error_rate': errors / len(rows) if rows else 0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': latencies[-1] if latencies else None,
+        }
+    return report
+
+
+def run(base_url, users, mix, rate, duration, concurrency, timeout, poisson):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = []
+    lock = threading.Lock()
+
+    def fire(scheduled, scenario, user):
+        status = send(base_url, user, scenario, timeout)
+        latency = time.perf_counter() - scheduled
+        with lock:
+            samples.append((scenario, latency, status))
+
+    total = int(rate * duration)
+    start = time.perf_counter()
+    scheduled = start
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(total):
+            scheduled += random.expovariate(rate) if poisson else 1 / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            scenario = random.choices(names, weights)[0]
+            pool.submit(fire, scheduled, scenario, random.choice(users))
+    elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed)
+
+
+def print_report(report):
+    print(f"{'endpoint':<16}{'requests':>10}{'rps':>9}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for scenario, r in sorted(report.items(), key=lambda item: item[0] == 'ALL'):
+        print(f"{scenario:<16}{r['requests']:>10}{r['throughput_rps']:>9.1f}{r['error_rate']:>9.1%}"
+              f"{r['p50_ms'] or 0:>10.1f}{r['p95_ms'] or 0:>10.1f}{r['p99_ms'] or 0:>10.1f}")
+
+
+def compare(base_path, new_path, threshold):
+    """Print per-endpoint changes; returns True if anything regressed beyond threshold percent"""
+    with open(base_path) as f:
+        base = json.load(f)['report']
+    with open(new_path) as f:
+        new = json.load(f)['report']
+
+    regressed = False
+    print(f"{'endpoint':<16}{'metric':<16}{'base':>10}{'new':>10}{'change':>10}")
+    for scenario in sorted(set(base) & set(new), key=lambda s: s == 'ALL'):
+        for metric in ['p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'error_rate']:
+            old_value, new_value = base[scenario][metric] or 0, new[scenario][metric] or 0
+            change = (new_value - old_value) / old_value * 100 if old_value else 0
+            # Higher is worse for everything except throughput
+            worse = -change if metric == 'throughput_rps' else change
+            if metric == 'error_rate':
+                flag = new_value > old_value
+            elif metric == 'throughput_rps' and scenario != 'ALL':
+                # Per-endpoint throughput just follows the random mix
+                flag = False
+            else:
+                flag = worse > threshold
+            regressed = regressed or flag
+            print(f"{scenario:<16}{metric:<16}{old_value:>10.2f}{new_value:>10.2f}{change:>9.1f}%{'  REGRESSION' if flag else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-loop load test for the Finance Tracker API')
+    parser.add_argument('--rate', type=float, default=20, help='requests per second')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'scenario weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--concurrency', type=int, default=64, help='max in-flight requests')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--poisson', action='store_true', help='exponential inter-arrival times instead of fixed')
+    parser.add_argument('--seed', type=int, help='random seed')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--transactions', type=int, default=200, help='per user')
+    parser.add_argument('--contacts', type=int, default=5, help='per user')
+    parser.add_argument('--activities', type=int, default=10, help='per contact')
+    parser.add_argument('--backend-latency-ms', type=float, default=5, help='simulated database round-trip')
+    parser.add_argument('--url', help='test a running app instead of starting one')
+    parser.add_argument('--token', action='append', help='bearer token(s) to use with --url')
+    parser.add_argument('--out', help='write the report to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two report files')
+    parser.add_argument('--threshold', type=float, default=10, help='regression threshold in percent for --compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold) else 0)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    mix = parse_mix(args.mix)
+
+    if args.url:
+        if not args.token:
+            parser.error('--url needs at least one --token')
+        base_url = args.url.rstrip('/')
+        users = [discover_user(base_url, token) for token in args.token]
+    else:
+        base_url, users = start_local_app(args)
+
+    if any(not u['contact_ids'] for u in users) and {'contact_detail', 'add_activity'} & set(mix):
+        parser.error('contact scenarios need users with at least one loan contact')
+
+    report = run(base_url, users, mix, args.rate, args.duration, args.concurrency, args.timeout, args.poisson)
+    print_report(report)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'args': vars(args), 'report': report}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
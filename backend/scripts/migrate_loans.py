@@ -0,0 +1,277 @@
+"""Move legacy `loans` rows into `loan_contacts` / `loan_activities`.
+
+Run from the backend directory:
+
+    python -m scripts.migrate_loans              # migrate, then verify
+    python -m scripts.migrate_loans --verify     # only compare balances
+
+Loans are streamed in batches ordered by (created_at, id). Each loan becomes
+a principal activity (`given` / `borrowed`) plus a settlement activity
+(`payment_received` / `payment_made`) for whatever was paid back, and is then
+stamped with its contact_id and migrated_at. A loan already linked to one of
+the user's contacts keeps that contact. Only loans without migrated_at are
+read, so the command can be stopped and restarted at any point. Contact and
+activity ids are derived from the loan ids, so a batch that was inserted but
+not stamped is simply upserted again on the next run.
+
+Once verification passes for every user, set LEGACY_LOANS_ENABLED=0 so the
+balance paths stop reading the loans table and /api/loans becomes read-only.
+
+Running balances are summed in integer cents (see utils.money).
+"""
+import argparse
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from services.supabase_service import get_service_client
+from utils.money import from_cents, to_cents
+
+NAMESPACE = uuid.UUID('5b0f7c1e-4f3a-4b8e-9a59-2f1f6c8d0e11')
+DEFAULT_CHECKPOINT = 'migrate_loans.checkpoint.json'
+
+# Effect of each activity type on the contact's running balance
+# (positive = they owe you, negative = you owe them)
+BALANCE_SIGN = {'given': 1, 'borrowed': -1, 'payment_received': -1, 'payment_made': 1}
+# Effect of each activity type on the user's cash balance
+CASH_SIGN = {'given': -1, 'borrowed': 1, 'payment_received': 1, 'payment_made': -1}
+
+
+def normalize_name(name):
+    return re.sub(r'\s+', ' ', (name or '').strip()).casefold()
+
+
+def normalize_phone(phone):
+    return re.sub(r'\D', '', phone or '')
+
+
+def activity_ids(loan_id):
+    return (
+        str(uuid.uuid5(NAMESPACE, f'{loan_id}:principal')),
+        str(uuid.uuid5(NAMESPACE, f'{loan_id}:settlement')),
+    )
+
+
+def legacy_cash_effect(loan):
+    """What a loan contributes to the balance under the legacy formula, in cents"""
+    if loan.get('is_paid'):
+        return 0
+    outstanding = to_cents(loan['amount']) - to_cents(loan.get('paid_amount'))
+    return -outstanding if loan['type'] == 'given' else outstanding
+
+
+def loan_to_activities(loan):
+    """Return [(activity_id, activity_type, amount, created_at_offset)] for one loan"""
+    principal_id, settlement_id = activity_ids(loan['id'])
+    amount = loan['amount']
+    settled = amount if loan.get('is_paid') else (loan.get('paid_amount') or 0)
+    if loan['type'] == 'given':
+        rows = [(principal_id, 'given', amount, 0)]
+        if settled:
+            rows.append((settlement_id, 'payment_received', settled, 1))
+    else:
+        rows = [(principal_id, 'borrowed', amount, 0)]
+        if settled:
+            rows.append((settlement_id, 'payment_made', settled, 1))
+    return rows
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.migrated = 0
+        # Running balance per contact, in cents
+        self.balances = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.migrated = data.get('migrated', 0)
+            if 'balance_cents' in data:
+                self.balances = data['balance_cents']
+            else:
+                # Checkpoints from before balances were kept in cents
+                self.balances = {c: to_cents(b) for c, b in data.get('balances', {}).items()}
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'migrated': self.migrated, 'balance_cents': self.balances}, f)
+        os.replace(tmp, self.path)
+
+
+class ContactResolver:
+    """Maps (user, normalized name, phone) to a contact id, creating contacts as needed"""
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+        self.by_user = {}
+        self.existing_ids = set()
+        self.owners = {}
+
+    def _load_user(self, user_id):
+        if user_id not in self.by_user:
+            response = self.supabase.table('loan_contacts').select('id', 'name', 'phone_number').eq('user_id', user_id).execute()
+            contacts = {}
+            for c in response.data:
+                contacts[(normalize_name(c['name']), normalize_phone(c.get('phone_number')))] = c['id']
+                self.existing_ids.add(c['id'])
+                self.owners[c['id']] = user_id
+            self.by_user[user_id] = contacts
+        return self.by_user[user_id]
+
+    def resolve(self, loan, new_contacts):
+        contacts = self._load_user(loan['user_id'])
+        # A loan already linked to one of the user's contacts stays with it
+        if loan.get('contact_id') and self.owners.get(loan['contact_id']) == loan['user_id']:
+            return loan['contact_id']
+        name = normalize_name(loan['person_name'])
+        phone = normalize_phone(loan.get('phone_number'))
+
+        if (name, phone) in contacts:
+            return contacts[(name, phone)]
+        same_name = [key for key in contacts if key[0] == name]
+        # A loan without a phone joins the person of the same name
+        if not phone and same_name:
+            return contacts[same_name[0]]
+        # A contact with no phone yet adopts the first phone seen for that name
+        if ((name, '') in contacts and phone) and not any(k[1] for k in same_name):
+            contact_id = contacts.pop((name, ''))
+            contacts[(name, phone)] = contact_id
+            return contact_id
+
+        display_name = loan['person_name'].strip()
+        if same_name:
+            # Names are unique per user, so tell namesakes apart by phone
+            display_name = f'{display_name} ({phone[-4:]})'
+        contact_id = str(uuid.uuid5(NAMESPACE, f"{loan['user_id']}:{name}:{phone}"))
+        contacts[(name, phone)] = contact_id
+        new_contacts.append({
+            'id': contact_id,
+            'user_id': loan['user_id'],
+            'name': display_name,
+            'phone_number': loan.get('phone_number'),
+            'notes': 'Migrated from legacy loans',
+            'initial_balance': 0,
+        })
+        return contact_id
+
+
+def fetch_batch(supabase, batch_size):
+    return supabase.table('loans').select('*').is_('migrated_at', 'null').order('created_at').order('id').limit(batch_size).execute().data
+
+
+def rebalance_contact(supabase, contact_id, batch_size):
+    """Recompute running balances of a contact that already had activities; returns the balance in cents"""
+    activities = supabase.table('loan_activities').select('*').eq('contact_id', contact_id).order('created_at').order('id').execute().data
+    balance = 0
+    changed = []
+    for a in activities:
+        balance += BALANCE_SIGN[a['activity_type']] * to_cents(a['amount'])
+        if to_cents(a['balance_after']) != balance:
+            changed.append({**a, 'balance_after': from_cents(balance)})
+    # Whole rows, so the upsert only ever takes its update path
+    for i in range(0, len(changed), batch_size):
+        supabase.table('loan_activities').upsert(changed[i:i + batch_size]).execute()
+    return balance
+
+
+def migrate(supabase, checkpoint, batch_size):
+    resolver = ContactResolver(supabase)
+    while True:
+        loans = fetch_batch(supabase, batch_size)
+        if not loans:
+            break
+
+        new_contacts = []
+        activities = []
+        loans_by_contact = {}
+        touched_existing = set()
+
+        for loan in loans:
+            contact_id = resolver.resolve(loan, new_contacts)
+            loans_by_contact.setdefault(contact_id, []).append(loan['id'])
+            if contact_id in resolver.existing_ids:
+                touched_existing.add(contact_id)
+
+            created = datetime.fromisoformat(loan.get('created_at') or loan['date'])
+            balance = checkpoint.balances.get(contact_id, 0)
+            for activity_id, activity_type, amount, offset in loan_to_activities(loan):
+                balance += BALANCE_SIGN[activity_type] * to_cents(amount)
+                activities.append({
+                    'id': activity_id,
+                    'user_id': loan['user_id'],
+                    'contact_id': contact_id,
+                    'activity_type': activity_type,
+                    'amount': amount,
+                    'balance_after': from_cents(balance),
+                    'description': loan.get('description'),
+                    'activity_date': loan['date'],
+                    # Keep the legacy ordering; the settlement sorts right after its loan
+                    'created_at': (created + timedelta(microseconds=offset)).isoformat(),
+                })
+            checkpoint.balances[contact_id] = balance
+
+        if new_contacts:
+            supabase.table('loan_contacts').upsert(new_contacts, ignore_duplicates=True).execute()
+        supabase.table('loan_activities').upsert(activities, ignore_duplicates=True).execute()
+
+        for contact_id in touched_existing:
+            checkpoint.balances[contact_id] = rebalance_contact(supabase, contact_id, batch_size)
+        migrated_at = datetime.now(timezone.utc).isoformat()
+        for contact_id, loan_ids in loans_by_contact.items():
+            supabase.table('loans').update({'contact_id': contact_id, 'migrated_at': migrated_at}).in_('id', loan_ids).execute()
+
+        checkpoint.migrated += len(loans)
+        checkpoint.save()
+        print(f'Migrated {checkpoint.migrated} loans ({len(new_contacts)} new contacts in this batch)')
+
+
+def verify(supabase, batch_size):
+    """Compare each user's legacy loan balance with the balance of the migrated activities"""
+    expected = {}
+    actual = {}
+    last_id = None
+    while True:
+        query = supabase.table('loans').select('*').not_.is_('migrated_at', 'null').order('id').limit(batch_size)
+        if last_id:
+            query = query.gt('id', last_id)
+        loans = query.execute().data
+        if not loans:
+            break
+        last_id = loans[-1]['id']
+
+        ids = []
+        for loan in loans:
+            expected[loan['user_id']] = expected.get(loan['user_id'], 0) + legacy_cash_effect(loan)
+            actual.setdefault(loan['user_id'], 0)
+            ids.extend(activity_ids(loan['id']))
+        # Keep the id list short enough for the query string
+        for i in range(0, len(ids), 200):
+            rows = supabase.table('loan_activities').select('user_id', 'activity_type', 'amount').in_('id', ids[i:i + 200]).execute().data
+            for a in rows:
+                actual[a['user_id']] += CASH_SIGN[a['activity_type']] * to_cents(a['amount'])
+
+    mismatches = {u: (expected[u], actual[u]) for u in expected if expected[u] != actual[u]}
+    for user_id, (want, got) in mismatches.items():
+        print(f'MISMATCH user {user_id}: legacy {from_cents(want)} != migrated {from_cents(got)}')
+    print(f'Verified {len(expected)} users, {len(mismatches)} mismatches')
+    return not mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate legacy loans to loan contacts and activities')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--verify', action='store_true', help='only verify already migrated loans')
+    args = parser.parse_args()
+
+    supabase = get_service_client()
+    if not args.verify:
+        migrate(supabase, Checkpoint(args.checkpoint), args.batch_size)
+    ok = verify(supabase, args.batch_size)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
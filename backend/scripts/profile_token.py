@@ -0,0 +1,19 @@
+"""Print an X-Profile-Token header value for profiling a single request.
+
+    curl -H "X-Profile-Token: $(python -m scripts.profile_token)" ...
+
+The token is valid for five minutes. The profile id comes back in the
+X-Profile-Id response header; files are written to PROFILE_DIR.
+"""
+from config import Config
+from utils.profiler import sign_token
+
+
+def main():
+    if not Config.PROFILE_SECRET:
+        raise SystemExit('PROFILE_SECRET is not set')
+    print(sign_token(Config.PROFILE_SECRET))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""Materialize due recurring transactions.
+
+Run from the backend directory, e.g. once an hour from cron or a scheduler:
+
+    python -m scripts.run_recurring
+    python -m scripts.run_recurring --loop 3600    # keep running
+
+Runs are idempotent, so overlapping or repeated runs are harmless, and a run
+after downtime catches up on every missed occurrence.
+"""
+import argparse
+import time
+from services.recurring_service import run_due
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize due recurring transactions')
+    parser.add_argument('--loop', type=int, metavar='SECONDS', help='repeat every SECONDS instead of running once')
+    args = parser.parse_args()
+
+    while True:
+        result = run_due()
+        print(f"Processed {result['rules']} rules, created {result['transactions']} transactions for {result['users']} users")
+        if not args.loop:
+            break
+        time.sleep(args.loop)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+from collections import Counter
+from services.local_backend import LocalBackendError
+from services.supabase_service import get_client, get_async_client
+from utils.money import AmountColumn
+
+# Per-user totals computed by the database.
+#
+# The SQL functions in aggregates_schema.sql return a few grouped rows, so the
+# response size and the Python work per request no longer grow with the
+# user's history. Sums come back as integer cents (see utils.money).
+#
+# Where a function is not installed (the local backend, or a database the
+# migration has not reached yet) the same rows are computed in Python from
+# the table data. A missing function is remembered until the worker restarts,
+# so the fallback does not cost an extra round-trip every time.
+
+_missing = set()
+
+
+def _is_missing_function(e):
+    # PGRST202: PostgREST could not find the function in its schema cache
+    return isinstance(e, LocalBackendError) or getattr(e, 'code', None) == 'PGRST202'
+
+
+def _transaction_totals(transactions):
+    amounts = AmountColumn(transactions, 'type')
+    categories = [t.get('category') for t in transactions]
+    counts = Counter(zip(amounts.labels, categories))
+    return [
+        {'type': tx_type, 'category': category, 'total_cents': cents, 'count': counts[(tx_type, category)]}
+        for (tx_type, category), cents in amounts.by_label(categories).items()
+    ]
+
+
+def _activity_totals(activities):
+    amounts = AmountColumn(activities, 'activity_type')
+    counts = Counter(amounts.labels)
+    return [
+        {'activity_type': activity_type, 'total_cents': cents, 'count': counts[activity_type]}
+        for activity_type, cents in amounts.by_label().items()
+    ]
+
+
+def _contact_balances(activities):
+    latest = {}
+    counts = Counter()
+    for a in activities:
+        counts[a['contact_id']] += 1
+        current = latest.get(a['contact_id'])
+        if current is None or (a['created_at'] or '') > (current['created_at'] or ''):
+            latest[a['contact_id']] = a
+    return [
+        {'contact_id': contact_id, 'balance_after': a['balance_after'], 'activity_count': counts[contact_id]}
+        for contact_id, a in latest.items()
+    ]
+
+
+def _monthly_totals(transactions, activities, since=None):
+    # Rows were already limited to since by the query
+    monthly = {}
+    empty = {'income_cents': 0, 'expense_cents': 0, 'loan_given_cents': 0, 'loan_borrowed_cents': 0}
+    tx_amounts = AmountColumn(transactions, 'type')
+    for (tx_type, month), cents in tx_amounts.by_label([t['date'][:7] for t in transactions]).items():  # YYYY-MM
+        totals = monthly.setdefault(month, dict(empty))
+        totals['income_cents' if tx_type == 'income' else 'expense_cents'] += cents
+    activities = [a for a in activities if a.get('created_at')]
+    activity_amounts = AmountColumn(activities, 'activity_type')
+    for (activity_type, month), cents in activity_amounts.by_label([a['created_at'][:7] for a in activities]).items():
+        totals = monthly.setdefault(month, dict(empty))
+        if activity_type == 'given':
+            totals['loan_given_cents'] += cents
+        elif activity_type == 'borrowed':
+            totals['loan_borrowed_cents'] += cents
+    return [{'month': m, **monthly[m]} for m in sorted(monthly)]
+
+
+# function: (table, columns and the column a `since` parameter filters on, for
+# each table the Python fallback reads; reducer over their rows)
+_FALLBACKS = {
+    'get_transaction_totals': ([('transactions', 'type, category, amount', None)], _transaction_totals),
+    'get_loan_activity_totals': ([('loan_activities', 'activity_type, amount', None)], _activity_totals),
+    'get_contact_balances': ([('loan_activities', 'contact_id, balance_after, created_at', None)], _contact_balances),
+    'get_monthly_totals': (
+        [('transactions', 'type, amount, date', 'date'), ('loan_activities', 'activity_type, amount, created_at', 'created_at')],
+        _monthly_totals,
+    ),
+}
+
+
+def _fallback_query(supabase, user_id, source, params):
+    table, columns, since_column = source
+    query = supabase.table(table).select(columns).eq('user_id', user_id)
+    if since_column and params.get('since'):
+        query = query.gte(since_column, params['since'])
+    return query
+
+
+def _aggregate(function, user_id, **params):
+    supabase = get_client()
+    if function not in _missing:
+        try:
+            return supabase.rpc(function, {'p_user_id': user_id, **{f'p_{k}': v for k, v in params.items()}}).execute().data
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            _missing.add(function)
+    sources, reduce = _FALLBACKS[function]
+    rows = [_fallback_query(supabase, user_id, source, params).execute().data for source in sources]
+    return reduce(*rows, **params)
+
+
+async def _aggregate_async(function, user_id, **params):
+    supabase = await get_async_client()
+    if function not in _missing:
+        try:
+            return (await supabase.rpc(function, {'p_user_id': user_id, **{f'p_{k}': v for k, v in params.items()}}).execute()).data
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            _missing.add(function)
+    sources, reduce = _FALLBACKS[function]
+    responses = await asyncio.gather(*(
+        _fallback_query(supabase, user_id, source, params).execute() for source in sources
+    ))
+    return reduce(*(r.data for r in responses), **params)
+
+
+def transaction_totals(user_id):
+    """[{type, category, total_cents, count}] over all of the user's transactions"""
+    return _aggregate('get_transaction_totals', user_id)
+
+
+def activity_totals(user_id):
+    """[{activity_type, total_cents, count}] over all of the user's loan activities"""
+    return _aggregate('get_loan_activity_totals', user_id)
+
+
+def contact_balances(user_id):
+    """{contact_id: {contact_id, balance_after, activity_count}} for contacts with activities"""
+    return {row['contact_id']: row for row in _aggregate('get_contact_balances', user_id)}
+
+
+def monthly_totals(user_id, since):
+    """[{month, income_cents, expense_cents, loan_given_cents, loan_borrowed_cents}] for months with data from since (a date) on, oldest first"""
+    return _aggregate('get_monthly_totals', user_id, since=since.isoformat())
+
+
+async def transaction_totals_async(user_id):
+    return await _aggregate_async('get_transaction_totals', user_id)
+
+
+async def activity_totals_async(user_id):
+    return await _aggregate_async('get_loan_activity_totals', user_id)
+
+
+async def contact_balances_async(user_id):
+    return {row['contact_id']: row for row in await _aggregate_async('get_contact_balances', user_id)}
+
+
+async def monthly_totals_async(user_id, since):
+    return await _aggregate_async('get_monthly_totals', user_id, since=since.isoformat())
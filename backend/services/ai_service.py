@@ -1,13 +1,14 @@
 import random
-from services.supabase_service import get_client
+from datetime import date, timedelta
+from services.aggregate_service import transaction_totals
+from services.anomaly_service import detect_anomalies
+from utils.money import from_cents
 
 def analyze_spending_patterns(user_id):
-    supabase = get_client()
+    # Totals per type and category are aggregated by the database
+    totals = transaction_totals(user_id)
     
-    response = supabase.table('transactions').select('*').eq('user_id', user_id).execute()
-    transactions = response.data
-    
-    if not transactions:
+    if not totals:
         return {
             'total_income': 0,
             'total_expenses': 0,
@@ -15,14 +16,14 @@ def analyze_spending_patterns(user_id):
             'advice': "Start tracking your transactions to get personalized financial advice!"
         }
     
-    total_income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-    total_expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
+    total_income = from_cents(sum(t['total_cents'] for t in totals if t['type'] == 'income'))
+    total_expenses = from_cents(sum(t['total_cents'] for t in totals if t['type'] == 'expense'))
     
-    category_spending = {}
-    for t in transactions:
-        if t['type'] == 'expense':
-            cat = t.get('category', 'Other')
-            category_spending[cat] = category_spending.get(cat, 0) + t['amount']
+    category_spending = {
+        t['category']: from_cents(t['total_cents'])
+        for t in totals
+        if t['type'] == 'expense'
+    }
     
     top_category = max(category_spending, key=category_spending.get) if category_spending else None
     
@@ -53,6 +54,15 @@ def generate_advice(user_id):
         elif savings_rate > 30:
             advices.append("Great job on saving! Consider investing some of your savings for better returns.")
     
+    # Streaming per-category statistics, kept up to date on every write
+    anomalies = detect_anomalies(user_id)
+    for spike in anomalies['spending_spikes'][:2]:
+        advices.append(f"Your {spike['category']} spending this month is {spike['ratio']:.1f}x your usual monthly amount.")
+    recent = [a for a in anomalies['unusual_expenses'] if a['date'] >= (date.today() - timedelta(days=30)).isoformat()]
+    if recent:
+        latest = recent[0]
+        advices.append(f"An expense of {latest['amount']:.2f} in {latest['category']} on {latest['date']} is well above your usual {latest['typical']:.2f}.")
+    
     if not advices:
         advices.append("Keep up the good work! Continue tracking your finances regularly.")
     
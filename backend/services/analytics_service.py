@@ -0,0 +1,249 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from services.supabase_service import get_client
+from services.cache_service import get_counter, incr_counter
+from utils.money import from_cents, to_cents
+
+# Per-user, day-bucketed indexes over transactions.
+#
+# Each series (income, expense, and income/expense per category) is a Fenwick
+# tree keyed by day, so any date-range sum costs O(log n) without touching raw
+# rows. Indexes are built lazily from one transactions read, kept in this
+# worker's memory, and patched in place by the transaction write routes. A
+# shared version counter tells a worker when another worker has written, in
+# which case its copy is rebuilt on the next read. Amounts are kept in integer
+# cents (see utils.money).
+#
+# A write bumps the counter before it runs (begin_transaction_change) and
+# again after (record_transaction_change). Only an index built before the
+# first bump is patched: one built while the write was running may already
+# contain the row, and patching it would count the row twice. A build that
+# overlaps any bump is not kept.
+
+MAX_INDEXES = 500
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f'ledger:{user_id}:transactions'
+
+
+def _day(value):
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class DaySeries:
+    """Fenwick tree of daily amounts"""
+
+    def __init__(self):
+        self.base = None
+        self.tree = [0]
+        self.days = {}
+
+    def add(self, day, amount):
+        self.days[day] = self.days.get(day, 0) + amount
+        if self.base is None or day < self.base or day - self.base + 1 >= len(self.tree):
+            self._rebuild()
+            return
+        i = day - self.base + 1
+        while i < len(self.tree):
+            self.tree[i] += amount
+            i += i & -i
+
+    def _rebuild(self):
+        lo, hi = min(self.days), max(self.days)
+        # Leave room for a year of new days so appends stay O(log n)
+        size = hi - lo + 1 + 366
+        self.base = lo
+        self.tree = [0] * (size + 1)
+        for d, amount in self.days.items():
+            self.tree[d - lo + 1] += amount
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def prefix(self, day):
+        """Sum of all days up to and including day"""
+        if self.base is None or day < self.base:
+            return 0
+        i = min(day - self.base + 1, len(self.tree) - 1)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def range_sum(self, start, end):
+        return self.prefix(end) - self.prefix(start - 1)
+
+
+class LedgerIndex:
+    def __init__(self, version):
+        self.version = version
+        self.series = {'income': DaySeries(), 'expense': DaySeries()}
+        self.categories = {}
+
+    def apply(self, transaction, sign=1):
+        tx_type = transaction.get('type')
+        if tx_type not in ('income', 'expense') or not transaction.get('date'):
+            return
+        day = _day(transaction['date'])
+        amount = sign * to_cents(transaction.get('amount'))
+        category = transaction.get('category') or 'Other'
+        self.series[tx_type].add(day, amount)
+        key = (tx_type, category)
+        if key not in self.categories:
+            self.categories[key] = DaySeries()
+        self.categories[key].add(day, amount)
+
+    def totals(self, start, end):
+        income = self.series['income'].range_sum(start, end)
+        expense = self.series['expense'].range_sum(start, end)
+        return {'income': from_cents(income), 'expense': from_cents(expense), 'net': from_cents(income - expense)}
+
+    def by_category(self, start, end):
+        groups = {'income': {}, 'expense': {}}
+        for (tx_type, category), series in self.categories.items():
+            amount = series.range_sum(start, end)
+            if amount:
+                groups[tx_type][category] = from_cents(amount)
+        return groups
+
+    def by_day(self, start, end):
+        return [
+            {
+                'date': date.fromordinal(d).isoformat(),
+                'income': from_cents(self.series['income'].range_sum(d, d)),
+                'expense': from_cents(self.series['expense'].range_sum(d, d)),
+            }
+            for d in range(start, end + 1)
+        ]
+
+    def moving_average(self, start, end, window, series='expense'):
+        s = self.series[series]
+        return [
+            {
+                'date': date.fromordinal(d).isoformat(),
+                'value': from_cents(s.range_sum(d - window + 1, d)) / window,
+            }
+            for d in range(start, end + 1)
+        ]
+
+
+def _build(user_id, version):
+    supabase = get_client()
+    response = supabase.table('transactions').select('type', 'amount', 'category', 'date').eq('user_id', user_id).execute()
+    index = LedgerIndex(version)
+    for t in response.data:
+        index.apply(t)
+    return index
+
+
+def get_index(user_id):
+    """Return this worker's index for the user, rebuilding it if another worker wrote since"""
+    version = get_counter(_version_key(user_id))
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is not None and version is not None and index.version == version:
+            _indexes.move_to_end(user_id)
+            return index
+    index = _build(user_id, version)
+    # A write that ran during the build may or may not be in it; don't keep it then
+    if version is None or get_counter(_version_key(user_id)) != version:
+        return index
+    with _lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def ledger_version(user_id):
+    """Changes whenever the user's transactions change, in any worker"""
+    return get_counter(_version_key(user_id))
+
+
+def begin_transaction_change(user_id):
+    """Call before a transaction write; pass the result to record_transaction_change"""
+    return incr_counter(_version_key(user_id))
+
+
+def record_transaction_change(user_id, old=None, new=None, started=None):
+    """Patch the index after a transaction write: old is removed, new is added.
+
+    started is what begin_transaction_change returned before the write;
+    without it the index is only dropped.
+    """
+    version = incr_counter(_version_key(user_id))
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is None:
+            return
+        # Only patch an index built before the write started, and only if
+        # nobody else wrote since; otherwise rebuild on next read
+        if started is None or version is None or index.version != started - 1 or version != started + 1:
+            del _indexes[user_id]
+            return
+        if old:
+            index.apply(old, -1)
+        if new:
+            index.apply(new)
+        index.version = version
+
+
+def invalidate_index(user_id):
+    """Mark every worker's index for the user as stale, e.g. after a bulk write"""
+    incr_counter(_version_key(user_id))
+    with _lock:
+        _indexes.pop(user_id, None)
+
+
+def _change(current, previous):
+    if not previous:
+        return None
+    return (current - previous) / abs(previous) * 100
+
+
+def range_report(user_id, start, end, group='type', window=None):
+    """Totals for [start, end] grouped by type, category or day, with the previous period for comparison"""
+    index = get_index(user_id)
+    start_day, end_day = start.toordinal(), end.toordinal()
+    length = end_day - start_day + 1
+
+    totals = index.totals(start_day, end_day)
+    previous_start, previous_end = start_day - length, start_day - 1
+    previous = index.totals(previous_start, previous_end)
+
+    report = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group': group,
+        'totals': totals,
+        'previous': {
+            'start': date.fromordinal(previous_start).isoformat(),
+            'end': date.fromordinal(previous_end).isoformat(),
+            'totals': previous,
+        },
+        'change': {key: _change(totals[key], previous[key]) for key in totals},
+    }
+
+    if group == 'category':
+        report['groups'] = index.by_category(start_day, end_day)
+        report['previous']['groups'] = index.by_category(previous_start, previous_end)
+    elif group == 'day':
+        report['groups'] = index.by_day(start_day, end_day)
+    else:
+        report['groups'] = {'income': totals['income'], 'expense': totals['expense']}
+
+    if window:
+        report['moving_average'] = {
+            'window': window,
+            'expense': index.moving_average(start_day, end_day, window, 'expense'),
+            'income': index.moving_average(start_day, end_day, window, 'income'),
+        }
+    return report
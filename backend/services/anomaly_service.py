@@ -0,0 +1,302 @@
+import math
+from datetime import date
+from config import Config
+from services.supabase_service import get_client
+from services.cache_service import cache_get, cache_set, get_counter, incr_counter
+
+# Streaming spending statistics per user and expense category.
+#
+# Each category keeps:
+#   - Welford's running mean and variance of expense amounts
+#   - an EWMA of amounts, which follows recent behaviour
+#   - a P-square sketch of the QUANTILE-th amount (five markers, no samples kept)
+#   - the current month's total and an EWMA of earlier monthly totals
+# A new expense is checked against the statistics as they were before it and
+# then folded in, all in O(1), so flagging unusual expenses and monthly
+# spending spikes never rescans history.
+#
+# The state lives in the shared cache, so every worker sees the same numbers.
+# Inserts patch it in place. Updates and deletes can't be undone in an EWMA or
+# a sketch, so they only bump a shared version counter, and the next read
+# rebuilds the state from one scan of the user's expenses. The same happens
+# when two workers write at once or the entry was evicted.
+#
+# As with the ledger index (services.analytics_service), a write bumps the
+# counter before it runs (begin_spending_change) and again after
+# (record_spending_change), and only state built before the first bump is
+# patched; a build that overlaps any bump is not stored.
+
+QUANTILE = 0.95
+EWMA_ALPHA = 0.2
+MONTH_EWMA_ALPHA = 0.3
+SPIKE_MIN_MONTHS = 2
+MAX_FLAGS = 50
+
+
+def _version_key(user_id):
+    return f'ledger:{user_id}:spending_stats'
+
+
+def _state_key(user_id):
+    # Outside the user:<id>: namespace, so invalidate_user on every write does not drop it
+    return f'spending_stats:{user_id}'
+
+
+def _month_index(month):
+    year, m = month.split('-')
+    return int(year) * 12 + int(m) - 1
+
+
+class P2Quantile:
+    """P-square estimate of one quantile (Jain and Chlamtac), O(1) memory and time per value"""
+
+    def __init__(self, p, state=None):
+        self.p = p
+        state = state or {}
+        self.q = state.get('q', [])
+        self.n = state.get('n')
+        self.np = state.get('np')
+
+    def add(self, x):
+        q, p = self.q, self.p
+        if self.n is None:
+            # The first five values are kept, sorted, to seed the markers
+            q.append(x)
+            q.sort()
+            if len(q) == 5:
+                self.n = [0, 1, 2, 3, 4]
+                self.np = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+        n = self.n
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i, dn in enumerate((0, p / 2, p, (1 + p) / 2, 1)):
+            self.np[i] += dn
+
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def value(self):
+        if not self.q:
+            return None
+        if self.n is None:
+            return self.q[min(len(self.q) - 1, round(self.p * (len(self.q) - 1)))]
+        return self.q[2]
+
+    def to_dict(self):
+        return {'q': self.q, 'n': self.n, 'np': self.np}
+
+
+class CategoryStats:
+    def __init__(self, data=None):
+        data = data or {}
+        self.count = data.get('count', 0)
+        self.mean = data.get('mean', 0.0)
+        self.m2 = data.get('m2', 0.0)
+        self.ewma = data.get('ewma')
+        self.quantile = P2Quantile(QUANTILE, data.get('quantile'))
+        self.month = data.get('month')
+        self.month_total = data.get('month_total', 0.0)
+        self.month_ewma = data.get('month_ewma')
+        self.months = data.get('months', 0)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def check(self, amount):
+        """Why amount would be unusual for this category, or None"""
+        if self.count < Config.ANOMALY_MIN_SAMPLES:
+            return None
+        z = (amount - self.mean) / self.std if self.std > 0 else 0.0
+        if z >= Config.ANOMALY_Z_SCORE:
+            return {'reason': 'z_score', 'z_score': round(z, 2), 'typical': round(self.mean, 2)}
+        p = self.quantile.value()
+        if p is not None and amount > p and self.ewma and amount > 2 * self.ewma:
+            return {'reason': 'above_recent', 'z_score': round(z, 2), 'typical': round(self.ewma, 2)}
+        return None
+
+    def add(self, amount, month):
+        # Welford
+        self.count += 1
+        delta = amount - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (amount - self.mean)
+        self.ewma = amount if self.ewma is None else EWMA_ALPHA * amount + (1 - EWMA_ALPHA) * self.ewma
+        self.quantile.add(amount)
+
+        if self.month is None or month > self.month:
+            if self.month is not None:
+                # Close the finished month, then decay once per empty month in between
+                gap = _month_index(month) - _month_index(self.month) - 1
+                if self.month_ewma is None:
+                    self.month_ewma = self.month_total
+                else:
+                    self.month_ewma = MONTH_EWMA_ALPHA * self.month_total + (1 - MONTH_EWMA_ALPHA) * self.month_ewma
+                self.month_ewma *= (1 - MONTH_EWMA_ALPHA) ** gap
+                self.months += 1 + gap
+            self.month = month
+            self.month_total = amount
+        elif month == self.month:
+            self.month_total += amount
+        # Backdated expenses in earlier months count above but leave the monthly baseline alone
+
+    def spike(self):
+        """How many times the usual monthly amount the current month is, if that is a spike"""
+        if self.months < SPIKE_MIN_MONTHS or not self.month_ewma:
+            return None
+        ratio = self.month_total / self.month_ewma
+        return ratio if ratio >= Config.SPIKE_RATIO else None
+
+    def summary(self):
+        p = self.quantile.value()
+        return {
+            'count': self.count,
+            'mean': round(self.mean, 2),
+            'std': round(self.std, 2),
+            'recent_average': round(self.ewma, 2) if self.ewma is not None else None,
+            f'p{round(QUANTILE * 100)}': round(p, 2) if p is not None else None,
+            'month': self.month,
+            'month_total': round(self.month_total, 2),
+            'usual_month_total': round(self.month_ewma, 2) if self.month_ewma is not None else None,
+        }
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'mean': self.mean, 'm2': self.m2, 'ewma': self.ewma,
+            'quantile': self.quantile.to_dict(), 'month': self.month, 'month_total': self.month_total,
+            'month_ewma': self.month_ewma, 'months': self.months,
+        }
+
+
+class SpendingStats:
+    def __init__(self, version, data=None):
+        data = data or {}
+        self.version = version
+        self.categories = {c: CategoryStats(s) for c, s in data.get('categories', {}).items()}
+        self.flags = data.get('flags', [])
+
+    def apply(self, transaction):
+        """Check an expense against its category and fold it in; returns the flag raised, if any"""
+        if transaction.get('type') != 'expense' or not transaction.get('date'):
+            return None
+        amount = float(transaction.get('amount') or 0)
+        category = transaction.get('category') or 'Other'
+        stats = self.categories.setdefault(category, CategoryStats())
+        flag = stats.check(amount)
+        stats.add(amount, str(transaction['date'])[:7])
+        if flag:
+            flag = {
+                'transaction_id': transaction.get('id'),
+                'category': category,
+                'amount': amount,
+                'date': str(transaction['date'])[:10],
+                **flag,
+            }
+            self.flags = (self.flags + [flag])[-MAX_FLAGS:]
+        return flag
+
+    def spikes(self, month):
+        result = []
+        for category, stats in self.categories.items():
+            ratio = stats.spike() if stats.month == month else None
+            if ratio:
+                result.append({
+                    'category': category,
+                    'month': month,
+                    'month_total': round(stats.month_total, 2),
+                    'usual_month_total': round(stats.month_ewma, 2),
+                    'ratio': round(ratio, 2),
+                })
+        return sorted(result, key=lambda s: s['ratio'], reverse=True)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'categories': {c: s.to_dict() for c, s in self.categories.items()},
+            'flags': self.flags,
+        }
+
+
+def _build(user_id, version):
+    supabase = get_client()
+    response = supabase.table('transactions').select('id, type, amount, category, date, created_at').eq('user_id', user_id).eq('type', 'expense').order('created_at').execute()
+    stats = SpendingStats(version)
+    for t in response.data:
+        stats.apply(t)
+    return stats
+
+
+def get_spending_stats(user_id):
+    """The user's spending statistics, rebuilt from history only if they are stale"""
+    version = get_counter(_version_key(user_id))
+    data = cache_get(_state_key(user_id))
+    if data is not None and version is not None and data.get('version') == version:
+        return SpendingStats(version, data)
+    stats = _build(user_id, version)
+    # A write that ran during the build may or may not be in it; don't store it then
+    if version is not None and get_counter(_version_key(user_id)) == version:
+        cache_set(_state_key(user_id), stats.to_dict(), Config.ANOMALY_STATS_TTL)
+    return stats
+
+
+def begin_spending_change(user_id):
+    """Call before a transaction write; pass the result to record_spending_change"""
+    return incr_counter(_version_key(user_id))
+
+
+def record_spending_change(user_id, old=None, new=None, started=None):
+    """Fold a new expense into the statistics; any other expense change marks them stale.
+
+    started is what begin_spending_change returned before the write;
+    without it the statistics are only marked stale.
+    """
+    version = incr_counter(_version_key(user_id))
+    if (old and old.get('type') == 'expense') or started is None or version is None or version != started + 1:
+        return None
+    data = cache_get(_state_key(user_id))
+    # Only patch state built before the write started
+    if data is None or data.get('version') != started - 1:
+        return None
+    stats = SpendingStats(version, data)
+    # A write that touched no expense only moves the state to the new version
+    flag = stats.apply(new) if new and new.get('type') == 'expense' else None
+    cache_set(_state_key(user_id), stats.to_dict(), Config.ANOMALY_STATS_TTL)
+    return flag
+
+
+def invalidate_spending_stats(user_id):
+    """Mark the statistics stale in every worker, e.g. after a bulk write"""
+    incr_counter(_version_key(user_id))
+
+
+def detect_anomalies(user_id, today=None):
+    """Unusual expenses (newest first), this month's spending spikes and per-category statistics"""
+    stats = get_spending_stats(user_id)
+    month = (today or date.today()).isoformat()[:7]
+    return {
+        'unusual_expenses': list(reversed(stats.flags)),
+        'spending_spikes': stats.spikes(month),
+        'categories': {c: s.summary() for c, s in sorted(stats.categories.items())},
+    }
@@ -0,0 +1,131 @@
+import asyncio
+from config import Config
+from services.supabase_service import get_client, get_async_client
+from services.cache_service import cache_get, cache_set_for_user, cached, user_generation, user_key
+from services.aggregate_service import (
+    activity_totals, activity_totals_async, contact_balances, contact_balances_async,
+    transaction_totals, transaction_totals_async,
+)
+from utils.money import from_cents, to_cents
+
+
+def calculate_balance(user_id):
+    """Current balance, served from the shared cache when possible"""
+    return cached(user_key(user_id, 'balance'), lambda: _compute_balance(user_id), Config.BALANCE_CACHE_TTL, user_id=user_id)
+
+
+def _compute_balance(user_id):
+    """Calculate current balance including all loan activities"""
+    supabase = get_client()
+    
+    # Transaction and loan activity sums are aggregated by the database
+    tx_totals = transaction_totals(user_id)
+    loan_totals = activity_totals(user_id)
+    
+    # Also get old loans for backward compatibility. Loans already moved to
+    # loan_activities by scripts.migrate_loans carry migrated_at and are skipped,
+    # and after cutover the legacy table is not read at all.
+    old_loans = []
+    if Config.LEGACY_LOANS_ENABLED:
+        old_loans_response = supabase.table('loans').select('*').eq('user_id', user_id).is_('migrated_at', 'null').execute()
+        old_loans = old_loans_response.data
+    
+    # Latest balance of each contact, one row per contact
+    latest_balances = [c['balance_after'] for c in contact_balances(user_id).values()]
+    
+    return summarize_balance(tx_totals, loan_totals, old_loans, latest_balances)
+
+
+async def calculate_balance_async(user_id):
+    """Async calculate_balance: same cache and totals, independent queries awaited together"""
+    # The SQLite cache blocks, so it is used from a thread rather than the event loop
+    key = user_key(user_id, 'balance')
+    balance_data = await asyncio.to_thread(cache_get, key)
+    if balance_data is None:
+        generation = await asyncio.to_thread(user_generation, user_id)
+        balance_data = await _compute_balance_async(user_id)
+        await asyncio.to_thread(cache_set_for_user, user_id, generation, key, balance_data, Config.BALANCE_CACHE_TTL)
+    return balance_data
+
+
+async def _compute_balance_async(user_id):
+    supabase = await get_async_client()
+    
+    async def old_loans():
+        if not Config.LEGACY_LOANS_ENABLED:
+            return []
+        return (await supabase.table('loans').select('*').eq('user_id', user_id).is_('migrated_at', 'null').execute()).data
+    
+    tx_totals, loan_totals, legacy, balances = await asyncio.gather(
+        transaction_totals_async(user_id),
+        activity_totals_async(user_id),
+        old_loans(),
+        contact_balances_async(user_id),
+    )
+    latest_balances = [c['balance_after'] for c in balances.values()]
+    
+    return summarize_balance(tx_totals, loan_totals, legacy, latest_balances)
+
+
+def summarize_balance(tx_totals, loan_totals, old_loans, latest_balances):
+    """Balance from aggregated totals (see aggregate_service); shared by the sync and async paths"""
+    # Totals from transactions (integer cents, see utils.money)
+    total_income = sum(t['total_cents'] for t in tx_totals if t['type'] == 'income')
+    total_expenses = sum(t['total_cents'] for t in tx_totals if t['type'] == 'expense')
+    
+    # Calculate from new loan activities
+    # Given: money going OUT (decreases balance)
+    # Borrowed: money coming IN (increases balance)
+    # Payment received: money coming IN (increases balance)
+    # Payment made: money going OUT (decreases balance)
+    
+    by_type = {t['activity_type']: t['total_cents'] for t in loan_totals}
+    total_loan_given = by_type.get('given', 0)
+    total_loan_borrowed = by_type.get('borrowed', 0)
+    total_payment_received = by_type.get('payment_received', 0)
+    total_payment_made = by_type.get('payment_made', 0)
+    
+    # Also include old loans for backward compatibility
+    old_loan_given = sum(
+        to_cents(l['amount']) - to_cents(l.get('paid_amount'))
+        for l in old_loans 
+        if l['type'] == 'given' and not l.get('is_paid', False)
+    )
+    old_loan_borrowed = sum(
+        to_cents(l['amount']) - to_cents(l.get('paid_amount'))
+        for l in old_loans 
+        if l['type'] == 'borrowed' and not l.get('is_paid', False)
+    )
+    
+    # Combine old and new loan data
+    total_given = total_loan_given + old_loan_given
+    total_borrowed = total_loan_borrowed + old_loan_borrowed
+    
+    # Calculate current outstanding from each contact's latest balance
+    outstanding_given = 0
+    outstanding_borrowed = 0
+    
+    for balance in map(to_cents, latest_balances):
+        if balance > 0:
+            outstanding_given += balance
+        else:
+            outstanding_borrowed += abs(balance)
+    
+    # Add old loans outstanding
+    outstanding_given += old_loan_given
+    outstanding_borrowed += old_loan_borrowed
+    
+    # Total Balance = Income - Expenses - Given + Borrowed + PaymentReceived - PaymentMade
+    total_balance = total_income - total_expenses - total_loan_given + total_loan_borrowed + total_payment_received - total_payment_made - old_loan_given + old_loan_borrowed
+    
+    return {
+        'total_balance': from_cents(total_balance),
+        'total_income': from_cents(total_income),
+        'total_expenses': from_cents(total_expenses),
+        'loan_given': from_cents(total_given),
+        'loan_borrowed': from_cents(total_borrowed),
+        'payment_received': from_cents(total_payment_received),
+        'payment_made': from_cents(total_payment_made),
+        'outstanding_given': from_cents(outstanding_given),
+        'outstanding_borrowed': from_cents(outstanding_borrowed),
+    }
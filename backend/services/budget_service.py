@@ -0,0 +1,182 @@
+import uuid
+from datetime import date, timedelta
+from services.supabase_service import get_client
+from utils.money import AmountColumn, from_cents, to_cents
+
+# Budgets keep a running `spent` counter for their current period. Transaction
+# writes adjust it by the amount that changed, so checking a budget never
+# rescans the period's transactions. The counter is written with a compare-and-
+# set on the previous value and retried if another request got there first.
+# Arithmetic on amounts is done in integer cents (see utils.money).
+
+PERIODS = ['weekly', 'monthly', 'yearly']
+MAX_RETRIES = 3
+
+
+def period_bounds(period, day):
+    """Return (start, end) dates of the period containing day"""
+    if period == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == 'yearly':
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    start = day.replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def _matches(budget, transaction):
+    if not transaction or transaction.get('type') != 'expense':
+        return False
+    return budget.get('category') is None or budget['category'] == transaction.get('category')
+
+
+def _amount_in_period(budget, transaction, start, end):
+    """Cents the transaction counts towards the budget's period"""
+    if not _matches(budget, transaction) or not transaction.get('date'):
+        return 0
+    day = date.fromisoformat(str(transaction['date'])[:10])
+    if start <= day <= end:
+        return to_cents(transaction.get('amount'))
+    return 0
+
+
+def percent_used(spent, amount):
+    """spent as a percentage of amount (both amounts, not cents)"""
+    amount = to_cents(amount)
+    return to_cents(spent) * 100 / amount if amount else 0
+
+
+def reached_threshold(thresholds, spent, amount):
+    """Highest threshold that spent has reached, or 0"""
+    percent = percent_used(spent, amount)
+    return max([t for t in thresholds if t <= percent], default=0)
+
+
+def status(budget, today=None):
+    """Budget with derived fields; a budget from an earlier period reads as empty"""
+    today = today or date.today()
+    start, end = period_bounds(budget['period'], today)
+    spent = to_cents(budget['spent']) if str(budget['period_start']) == start.isoformat() else 0
+    amount = to_cents(budget['amount'])
+    return {
+        **budget,
+        'spent': from_cents(spent),
+        'period_start': start.isoformat(),
+        'period_end': end.isoformat(),
+        'remaining': from_cents(amount - spent),
+        'percent_used': spent * 100 / amount if amount else 0,
+        'exceeded': spent > amount,
+    }
+
+
+def get_budget_status(user_id):
+    supabase = get_client()
+    response = supabase.table('budgets').select('*').eq('user_id', user_id).execute()
+    return [status(b) for b in response.data]
+
+
+def spent_in_period(user_id, category, start, end, supabase=None):
+    """Sum a period's expenses once, when a budget is created or changed"""
+    supabase = supabase or get_client()
+    query = supabase.table('transactions').select('amount').eq('user_id', user_id).eq('type', 'expense').gte('date', start.isoformat()).lte('date', end.isoformat())
+    if category:
+        query = query.eq('category', category)
+    return from_cents(AmountColumn(query.execute().data).total())
+
+
+def _update_spent(supabase, budget, today, compute):
+    """Compare-and-set a budget's counter to compute(budget, start, end, previous_spent) cents; returns the alert rows to raise"""
+    for _ in range(MAX_RETRIES):
+        start, end = period_bounds(budget['period'], today)
+        same_period = str(budget['period_start']) == start.isoformat()
+        previous_spent = to_cents(budget['spent']) if same_period else 0
+        previous_alerted = budget['alerted_threshold'] if same_period else 0
+        spent = compute(budget, start, end, previous_spent)
+        if spent is None:
+            return []
+        spent = from_cents(spent)
+        alerted = reached_threshold(budget['thresholds'], spent, budget['amount'])
+
+        response = supabase.table('budgets').update({
+            'spent': spent,
+            'period_start': start.isoformat(),
+            'alerted_threshold': alerted,
+            'updated_at': 'now()',
+        }).eq('id', budget['id']).eq('spent', budget['spent']).eq('period_start', budget['period_start']).execute()
+
+        if response.data:
+            return [
+                {
+                    'id': str(uuid.uuid4()),
+                    'user_id': budget['user_id'],
+                    'budget_id': budget['id'],
+                    'threshold': t,
+                    'spent': spent,
+                    'amount': budget['amount'],
+                    'period_start': start.isoformat(),
+                }
+                for t in sorted(budget['thresholds'])
+                if previous_alerted < t <= alerted
+            ]
+
+        # Someone else changed the counter; reload and try again
+        reloaded = supabase.table('budgets').select('*').eq('id', budget['id']).execute()
+        if not reloaded.data:
+            return []
+        budget = reloaded.data[0]
+    return []
+
+
+def _apply_to_budget(supabase, budget, changes, today):
+    """Apply (old, new) transaction pairs to one budget; returns the alert rows to raise"""
+    def compute(budget, start, end, previous_spent):
+        delta = sum(
+            _amount_in_period(budget, new, start, end) - _amount_in_period(budget, old, start, end)
+            for old, new in changes
+        )
+        return previous_spent + delta if delta else None
+    return _update_spent(supabase, budget, today, compute)
+
+
+def apply_transaction_change(user_id, old=None, new=None):
+    """Adjust spent counters after a transaction write and record crossed thresholds"""
+    return apply_transaction_changes(user_id, [(old, new)])
+
+
+def apply_transaction_changes(user_id, changes, supabase=None):
+    """Apply many (old, new) pairs for one user with a single update per budget"""
+    changes = [(old, new) for old, new in changes if _matches({'category': None}, old) or _matches({'category': None}, new)]
+    if not changes:
+        return []
+
+    supabase = supabase or get_client()
+    budgets = supabase.table('budgets').select('*').eq('user_id', user_id).execute().data
+    today = date.today()
+
+    alerts = []
+    for budget in budgets:
+        alerts.extend(_apply_to_budget(supabase, budget, changes, today))
+
+    if alerts:
+        supabase.table('budget_alerts').insert(alerts).execute()
+    return alerts
+
+
+def recompute_budgets(user_id, supabase=None):
+    """Recount every budget's spent from its period's transactions, for writes whose deltas may not have been applied"""
+    supabase = supabase or get_client()
+    budgets = supabase.table('budgets').select('*').eq('user_id', user_id).execute().data
+    today = date.today()
+
+    def compute(budget, start, end, previous_spent):
+        spent = to_cents(spent_in_period(user_id, budget.get('category'), start, end, supabase))
+        return spent if spent != previous_spent else None
+
+    alerts = []
+    for budget in budgets:
+        alerts.extend(_update_spent(supabase, budget, today, compute))
+
+    if alerts:
+        supabase.table('budget_alerts').insert(alerts).execute()
+    return alerts
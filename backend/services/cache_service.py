@@ -0,0 +1,389 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+# Shared cache for all gunicorn workers on the same host.
+# Entries live in a local SQLite database in WAL mode, so every worker sees
+# the same data and a value computed by one worker is a hit for the others.
+#
+# Cache entries are bounded by CACHE_MAX_ENTRIES and the least recently used
+# ones are evicted. Records that must last until they expire (idempotency
+# keys) go in a separate durable table through the durable_* functions. LRU
+# eviction never touches them; expired rows are dropped, and above
+# DURABLE_MAX_ENTRIES the least recently written ones, so a client sending a
+# new key every time can't grow the file without bound.
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_pending_stats = {'hits': 0, 'misses': 0}
+_sets_since_trim = 0
+
+# Only refresh accessed_at on a hit if it is older than this (seconds),
+# so reads do not turn into a write every time.
+ACCESS_RESOLUTION = 5
+TRIM_EVERY = 64
+STATS_FLUSH_EVERY = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON cache(accessed_at);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS cache_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS durable (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_durable_expires_at ON durable(expires_at);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(Config.CACHE_PATH, timeout=5, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _conn():
+    """Return a connection for this thread, reopening after a fork"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid():
+        conn = _connect()
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _prefix_upper_bound(prefix):
+    # Smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _pending_stats[name] += amount
+        pending = _pending_stats['hits'] + _pending_stats['misses']
+    if pending >= STATS_FLUSH_EVERY:
+        _flush_stats()
+
+
+def _flush_stats():
+    with _stats_lock:
+        pending = dict(_pending_stats)
+        _pending_stats['hits'] = 0
+        _pending_stats['misses'] = 0
+    try:
+        conn = _conn()
+        for name, amount in pending.items():
+            if amount:
+                _add_stat(conn, name, amount)
+    except sqlite3.Error:
+        pass
+
+
+def _add_stat(conn, name, amount):
+    conn.execute(
+        'INSERT INTO cache_stats (name, value) VALUES (?, ?) '
+        'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+        (name, amount)
+    )
+
+
+def _evict(conn, table, order, max_entries, stat):
+    overflow = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] - max_entries
+    if overflow > 0:
+        conn.execute(
+            f'DELETE FROM {table} WHERE key IN (SELECT key FROM {table} ORDER BY {order} LIMIT ?)',
+            (overflow,)
+        )
+        _add_stat(conn, stat, overflow)
+
+
+def _trim(conn, now):
+    """Drop expired entries, then the oldest ones above the size bounds"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+        conn.execute('DELETE FROM durable WHERE expires_at <= ?', (now,))
+        _evict(conn, 'cache', 'accessed_at', Config.CACHE_MAX_ENTRIES, 'evictions')
+        # Every write gets a new rowid, so this drops the least recently
+        # written records and in-progress claims go last
+        _evict(conn, 'durable', 'rowid', Config.DURABLE_MAX_ENTRIES, 'durable_evictions')
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def user_key(user_id, *parts):
+    """Build a cache key scoped to one user, e.g. user:<id>:balance"""
+    return ':'.join(['user', str(user_id)] + [str(p) for p in parts])
+
+
+def cache_get(key):
+    """Return the cached value for key, or None on a miss"""
+    now = time.time()
+    try:
+        conn = _conn()
+        row = conn.execute('SELECT value, expires_at, accessed_at FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= now:
+            _count('misses')
+            return None
+        if now - row[2] > ACCESS_RESOLUTION:
+            conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+        _count('hits')
+        return json.loads(row[0])
+    except sqlite3.Error:
+        return None
+
+
+def _note_set(conn, now):
+    global _sets_since_trim
+    _sets_since_trim += 1
+    if _sets_since_trim >= TRIM_EVERY:
+        _sets_since_trim = 0
+        _trim(conn, now)
+
+
+def cache_set(key, value, ttl=None):
+    """Store a JSON-serializable value for ttl seconds"""
+    now = time.time()
+    ttl = Config.CACHE_DEFAULT_TTL if ttl is None else ttl
+    try:
+        conn = _conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(value), now + ttl, now)
+        )
+        _note_set(conn, now)
+    except sqlite3.Error:
+        pass
+
+
+def cache_set_for_user(user_id, generation, key, value, ttl=None):
+    """cache_set, skipped if invalidate_user(user_id) ran since generation was read.
+
+    Read generation with user_generation() before loading the value. The
+    check and the write are one statement, so a value loaded before a write
+    can't be stored after the write invalidated the user.
+    """
+    if generation is None:
+        return
+    now = time.time()
+    ttl = Config.CACHE_DEFAULT_TTL if ttl is None else ttl
+    try:
+        conn = _conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) SELECT ?, ?, ?, ? '
+            'WHERE COALESCE((SELECT value FROM cache_counters WHERE name = ?), 0) = ?',
+            (key, json.dumps(value), now + ttl, now, _generation_key(user_id), generation)
+        )
+        _note_set(conn, now)
+    except sqlite3.Error:
+        pass
+
+
+def cache_add(key, value, ttl=None):
+    """Store value only if key is absent or expired; returns True if this call stored it.
+
+    The check and the write are one statement, so when several workers race
+    for the same key exactly one of them wins. Returns None if the cache is
+    unavailable.
+    """
+    now = time.time()
+    ttl = Config.CACHE_DEFAULT_TTL if ttl is None else ttl
+    try:
+        cursor = _conn().execute(
+            'INSERT INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, '
+            'accessed_at = excluded.accessed_at WHERE cache.expires_at <= ?',
+            (key, json.dumps(value), now + ttl, now, now)
+        )
+        return cursor.rowcount == 1
+    except sqlite3.Error:
+        return None
+
+
+def cache_delete(key):
+    try:
+        _conn().execute('DELETE FROM cache WHERE key = ?', (key,))
+    except sqlite3.Error:
+        pass
+
+
+def durable_get(key):
+    """Return the durable record for key, or None if it is missing or expired"""
+    try:
+        row = _conn().execute('SELECT value FROM durable WHERE key = ? AND expires_at > ?', (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+    except sqlite3.Error:
+        return None
+
+
+def durable_set(key, value, ttl):
+    """Store a record that is kept for ttl seconds regardless of the cache size bound"""
+    now = time.time()
+    try:
+        conn = _conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO durable (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), now + ttl)
+        )
+        _note_set(conn, now)
+    except sqlite3.Error:
+        pass
+
+
+def durable_add(key, value, ttl):
+    """durable_set only if key is absent or expired; returns True if this call stored it, None if unavailable"""
+    now = time.time()
+    try:
+        conn = _conn()
+        cursor = conn.execute(
+            'INSERT INTO durable (key, value, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at '
+            'WHERE durable.expires_at <= ?',
+            (key, json.dumps(value), now + ttl, now)
+        )
+        if cursor.rowcount != 1:
+            return False
+        _note_set(conn, now)
+        return True
+    except sqlite3.Error:
+        return None
+
+
+def durable_delete(key):
+    try:
+        _conn().execute('DELETE FROM durable WHERE key = ?', (key,))
+    except sqlite3.Error:
+        pass
+
+
+def invalidate_prefix(prefix):
+    """Atomically delete every entry whose key starts with prefix"""
+    try:
+        cursor = _conn().execute(
+            'DELETE FROM cache WHERE key >= ? AND key < ?',
+            (prefix, _prefix_upper_bound(prefix))
+        )
+        return cursor.rowcount
+    except sqlite3.Error:
+        return 0
+
+
+def _generation_key(user_id):
+    return f'generation:{user_id}'
+
+
+def user_generation(user_id):
+    """Counter bumped by every invalidate_user(user_id), or None if the cache is unavailable"""
+    return get_counter(_generation_key(user_id))
+
+
+def invalidate_user(user_id):
+    """Drop everything cached for one user"""
+    # Bump first: a loader that read the old generation can no longer store
+    # its result with cache_set_for_user, and anything it stored before is
+    # deleted below
+    incr_counter(_generation_key(user_id))
+    return invalidate_prefix(user_key(user_id) + ':')
+
+
+def incr_counter(name):
+    """Atomically increment a shared counter and return its new value.
+
+    Counters are never evicted or expired, which makes them safe to use as
+    version numbers for data that workers keep in memory.
+    """
+    try:
+        return _conn().execute(
+            'INSERT INTO cache_counters (name, value) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + 1 RETURNING value',
+            (name,)
+        ).fetchone()[0]
+    except sqlite3.Error:
+        return None
+
+
+def get_counter(name):
+    try:
+        row = _conn().execute('SELECT value FROM cache_counters WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+    except sqlite3.Error:
+        return None
+
+
+def cached(key, loader, ttl=None, user_id=None):
+    """Return the cached value for key, calling loader() and storing its result on a miss.
+
+    With user_id, the result is not stored if invalidate_user(user_id) ran
+    while loader was running (see cache_set_for_user).
+    """
+    value = cache_get(key)
+    if value is None:
+        if user_id is None:
+            value = loader()
+            cache_set(key, value, ttl)
+        else:
+            generation = user_generation(user_id)
+            value = loader()
+            cache_set_for_user(user_id, generation, key, value, ttl)
+    return value
+
+
+def add_stats(amounts):
+    """Add to named counters in the shared stats table, e.g. for metrics kept by other modules"""
+    try:
+        conn = _conn()
+        for name, amount in amounts.items():
+            _add_stat(conn, name, amount)
+    except sqlite3.Error:
+        pass
+
+
+def get_stats(prefix):
+    """Shared stats whose name starts with prefix"""
+    try:
+        rows = _conn().execute(
+            'SELECT name, value FROM cache_stats WHERE name >= ? AND name < ?',
+            (prefix, _prefix_upper_bound(prefix))
+        ).fetchall()
+        return dict(rows)
+    except sqlite3.Error:
+        return {}
+
+
+def cache_stats():
+    """Hit, miss and eviction counts across all workers, plus the current size"""
+    _flush_stats()
+    try:
+        conn = _conn()
+        stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'durable_evictions': 0}
+        for name, value in conn.execute('SELECT name, value FROM cache_stats'):
+            if name in stats:
+                stats[name] = value
+        stats['entries'] = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        stats['durable_entries'] = conn.execute('SELECT COUNT(*) FROM durable').fetchone()[0]
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0
+        return stats
+    except sqlite3.Error:
+        return {}
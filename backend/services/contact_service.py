@@ -0,0 +1,53 @@
+from utils.money import AmountColumn, from_cents
+
+# Loan contact views built from already loaded rows, shared by the sync routes
+# and the async app.
+
+
+def contact_detail(contact):
+    """Detail response for a contact fetched with its loan_activities embedded"""
+    contact = dict(contact)
+    activities = contact.pop('loan_activities', None) or []
+    
+    # Get summary stats (integer cents, see utils.money)
+    totals = AmountColumn(activities, 'activity_type').by_label()
+    
+    # Latest balance comes from the most recently created activity
+    latest_activity = max(activities, key=lambda a: a['created_at'] or '', default=None)
+    current_balance = latest_activity['balance_after'] if latest_activity else 0
+    
+    # Newest first, same order as the activities endpoint
+    activities = sorted(activities, key=lambda a: (a['activity_date'] or '', a['created_at'] or ''), reverse=True)
+    
+    return {
+        'contact': {
+            **contact,
+            'current_balance': current_balance,
+            'total_given': from_cents(totals.get('given', 0)),
+            'total_borrowed': from_cents(totals.get('borrowed', 0)),
+            'total_paid_to_you': from_cents(totals.get('payment_received', 0)),
+            'total_you_paid': from_cents(totals.get('payment_made', 0)),
+            'activity_count': len(activities)
+        },
+        'activities': activities
+    }
+
+
+def contact_summary(contact, balance):
+    """List entry for a contact from its contact_balances row (None if it has no activities)"""
+    return {
+        **contact,
+        'current_balance': balance['balance_after'] if balance else 0,
+        'activity_count': balance['activity_count'] if balance else 0
+    }
+
+
+def with_pending_touches(contacts, touches):
+    """Apply unflushed updated_at touches and restore newest-first order"""
+    if not touches:
+        return contacts
+    contacts = [
+        {**c, 'updated_at': max(str(c.get('updated_at') or ''), touches[c['id']])} if c['id'] in touches else c
+        for c in contacts
+    ]
+    return sorted(contacts, key=lambda c: str(c.get('updated_at') or ''), reverse=True)
@@ -0,0 +1,129 @@
+from datetime import date
+from services.budget_service import status
+from utils.money import from_cents
+
+# Dashboard payload built from already loaded rows, so the sync routes and the
+# async app produce the same response from the same code. Totals come
+# aggregated from the database; only the recent transactions are full rows.
+#
+# The response is made of sections that a client can pick with include=, so
+# a widget that renders one of them does not pay for the others. Routes only
+# fetch what the selected sections need (see needs()).
+
+SECTIONS = ('balance', 'monthly', 'recent', 'categories', 'counts', 'budgets')
+DEFAULT_MONTHS = 6
+MAX_MONTHS = 60
+DEFAULT_RECENT = 10
+MAX_RECENT = 100
+
+
+def parse_options(args):
+    """months, recent and include from the query string; raises ValueError with a message for the client"""
+    months = args.get('months', DEFAULT_MONTHS, type=int)
+    if months is None or not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f'months must be between 1 and {MAX_MONTHS}')
+    recent = args.get('recent', DEFAULT_RECENT, type=int)
+    if recent is None or not 0 <= recent <= MAX_RECENT:
+        raise ValueError(f'recent must be between 0 and {MAX_RECENT}')
+    include = args.get('include')
+    if include:
+        include = {s.strip() for s in include.split(',') if s.strip()}
+        unknown = include - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown include {', '.join(sorted(unknown))}; choose from {', '.join(SECTIONS)}")
+    else:
+        include = set(SECTIONS)
+    return {'months': months, 'recent': recent, 'include': include}
+
+
+def needs(include):
+    """Which inputs build_dashboard needs for the included sections"""
+    return {
+        'balance_data': 'balance' in include,
+        'tx_totals': bool(include & {'categories', 'counts'}),
+        'monthly': 'monthly' in include,
+        'loan_totals': 'counts' in include,
+        'recent_transactions': 'recent' in include,
+        'loan_contacts_count': 'counts' in include,
+        'budgets': 'budgets' in include,
+    }
+
+
+def month_window_start(months, today=None):
+    """First day of the month months - 1 months before today's, so the window holds `months` months"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def build_dashboard(include, balance_data=None, tx_totals=None, monthly=None, loan_totals=None,
+                    recent_transactions=None, loan_contacts_count=None, budgets=None):
+    """Dashboard response with the included sections, from balance totals, aggregated rows (see aggregate_service) and budgets"""
+    result = {}
+
+    if 'balance' in include:
+        result.update({
+            'total_balance': balance_data['total_balance'],
+            'total_income': balance_data['total_income'],
+            'total_expenses': balance_data['total_expenses'],
+            'loan_given': balance_data['outstanding_given'],
+            'loan_borrowed': balance_data['outstanding_borrowed'],
+            'total_loan_given': balance_data['loan_given'],
+            'total_loan_borrowed': balance_data['loan_borrowed'],
+        })
+
+    if 'monthly' in include:
+        # Monthly data for transactions and loan activities, oldest first
+        result['monthly_data'] = [
+            {
+                'month': m['month'],
+                'income': from_cents(m['income_cents']),
+                'expense': from_cents(m['expense_cents']),
+                'loan_given': from_cents(m['loan_given_cents']),
+                'loan_borrowed': from_cents(m['loan_borrowed_cents']),
+            }
+            for m in monthly
+        ]
+
+    if 'recent' in include:
+        result['recent_transactions'] = recent_transactions
+
+    if 'categories' in include:
+        # Category-wise expense breakdown
+        expense_by_category = {}
+        income_by_category = {}
+        for t in tx_totals:
+            by_category = expense_by_category if t['type'] == 'expense' else income_by_category
+            by_category[t['category']] = by_category.get(t['category'], 0) + t['total_cents']
+        result['expense_by_category'] = {k: from_cents(v) for k, v in expense_by_category.items()}
+        result['income_by_category'] = {k: from_cents(v) for k, v in income_by_category.items()}
+
+    if 'counts' in include:
+        # Transaction counts
+        total_income_count = sum(t['count'] for t in tx_totals if t['type'] == 'income')
+        total_expense_count = sum(t['count'] for t in tx_totals if t['type'] == 'expense')
+
+        # Average transaction values
+        total_income = sum(t['total_cents'] for t in tx_totals if t['type'] == 'income')
+        total_expense = sum(t['total_cents'] for t in tx_totals if t['type'] == 'expense')
+
+        # Loan activity counts
+        activity_counts = {a['activity_type']: a['count'] for a in loan_totals}
+
+        result.update({
+            'loan_contacts_count': loan_contacts_count,
+            'total_transactions': sum(t['count'] for t in tx_totals),
+            'total_income_count': total_income_count,
+            'total_expense_count': total_expense_count,
+            'avg_income': from_cents(total_income) / total_income_count if total_income_count > 0 else 0,
+            'avg_expense': from_cents(total_expense) / total_expense_count if total_expense_count > 0 else 0,
+            'total_loan_activities': sum(activity_counts.values()),
+            'total_given_count': activity_counts.get('given', 0),
+            'total_borrowed_count': activity_counts.get('borrowed', 0),
+        })
+
+    if 'budgets' in include:
+        # Budget counters are maintained on write, so this is a single small read
+        result['budgets'] = [status(b) for b in budgets]
+
+    return result
@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+# Per-user change events for the /api/events stream.
+#
+# Write routes publish a small event after they commit. Events are appended to
+# a log in the shared cache database, so a stream served by any gunicorn
+# worker sees writes made through every other worker. Event ids increase
+# monotonically and double as SSE ids, which lets a client resume with
+# Last-Event-ID. The log keeps EVENT_RETENTION seconds of history; a client
+# that was away longer is told to resync instead.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_user ON events(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at);
+"""
+
+PRUNE_EVERY = 256
+
+_local = threading.local()
+_published = 0
+
+
+def _conn():
+    """Return a connection for this thread, reopening after a fork"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid():
+        conn = sqlite3.connect(Config.CACHE_PATH, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def publish(user_id, kind, **data):
+    """Record a change for user_id; returns the event id, or None if the log is unavailable"""
+    global _published
+    now = time.time()
+    try:
+        conn = _conn()
+        cursor = conn.execute(
+            'INSERT INTO events (user_id, kind, data, created_at) VALUES (?, ?, ?, ?)',
+            (str(user_id), kind, json.dumps(data), now)
+        )
+        _published += 1
+        if _published % PRUNE_EVERY == 0:
+            conn.execute('DELETE FROM events WHERE created_at < ?', (now - Config.EVENT_RETENTION,))
+        return cursor.lastrowid
+    except sqlite3.Error:
+        return None
+
+
+def events_after(user_id, last_id, limit=100):
+    """Events for user_id with id > last_id, oldest first: [(id, kind, data)]"""
+    try:
+        rows = _conn().execute(
+            'SELECT id, kind, data FROM events WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?',
+            (str(user_id), last_id, limit)
+        ).fetchall()
+        return [(event_id, kind, json.loads(data)) for event_id, kind, data in rows]
+    except sqlite3.Error:
+        return []
+
+
+def latest_event_id():
+    try:
+        row = _conn().execute('SELECT MAX(id) FROM events').fetchone()
+        return row[0] or 0
+    except sqlite3.Error:
+        return 0
+
+
+def oldest_event_id():
+    """Smallest id still in the log; a client that last saw an earlier id may have missed events"""
+    try:
+        row = _conn().execute('SELECT MIN(id) FROM events').fetchone()
+        return row[0] or 0
+    except sqlite3.Error:
+        return 0
@@ -0,0 +1,432 @@
+import asyncio
+import copy
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from config import Config
+
+# In-memory stand-in for the Supabase client, selected with DATA_BACKEND=local.
+#
+# It implements the subset of the supabase-py / postgrest-py query builder the
+# routes use (select/insert/update/upsert/delete, the usual filters, order,
+# limit, range, count, or_ filters, one level of embedding) plus email/password auth, so
+# the API can run with no network access for load tests and benchmarks. Data
+# lives in one process; LOCAL_BACKEND_LATENCY_MS adds a fixed delay to every
+# call to mimic the round-trip to a hosted database.
+
+
+# (parent table, child table) -> child column referencing parent.id, for embedding
+FOREIGN_KEYS = {
+    ('loan_contacts', 'loan_activities'): 'contact_id',
+}
+
+
+class LocalBackendError(Exception):
+    pass
+
+
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _coerce(stored, value):
+    """Convert a filter value to the type of the stored column value"""
+    if stored is None or value is None or isinstance(value, type(stored)):
+        return value
+    if isinstance(stored, bool):
+        return str(value).lower() == 'true'
+    if isinstance(stored, (int, float)):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+    return str(value)
+
+
+def _compare(op, stored, value):
+    value = _coerce(stored, value)
+    if op == 'eq':
+        return stored == value
+    if op == 'neq':
+        return stored != value
+    if stored is None or value is None:
+        return False
+    if op == 'gt':
+        return stored > value
+    if op == 'gte':
+        return stored >= value
+    if op == 'lt':
+        return stored < value
+    if op == 'lte':
+        return stored <= value
+    raise LocalBackendError(f'Unsupported operator: {op}')
+
+
+def _like(pattern, case_sensitive):
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in pattern)
+    return re.compile(f'^{regex}$', 0 if case_sensitive else re.IGNORECASE | re.DOTALL)
+
+
+class LocalStore:
+    def __init__(self):
+        self.tables = {}
+        self.users = {}
+        self.lock = threading.RLock()
+
+    def rows(self, name):
+        return self.tables.setdefault(name, [])
+
+    def reset(self):
+        with self.lock:
+            self.tables.clear()
+            self.users.clear()
+
+
+def _split_terms(text):
+    """Split a PostgREST logic tree on top-level commas, respecting parentheses and quotes"""
+    terms, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            terms.append(text[start:i])
+            start = i + 1
+    terms.append(text[start:])
+    return [t.strip() for t in terms if t.strip()]
+
+
+def _logic_predicate(text, combine):
+    """Predicate for an or=/and= filter such as 'a.gt.1,and(a.eq.1,b.gt.2)'"""
+    predicates = []
+    for term in _split_terms(text):
+        negate = term.startswith('not.')
+        if negate:
+            term = term[4:]
+        if term.startswith(('and(', 'or(')) and term.endswith(')'):
+            name, _, inner = term.partition('(')
+            predicate = _logic_predicate(inner[:-1], all if name == 'and' else any)
+        else:
+            column, op, value = term.split('.', 2)
+            if len(value) >= 2 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            predicate = (lambda column, op, value: lambda row: _compare(op, row.get(column), value))(column, op, value)
+        predicates.append((lambda p: lambda row: not p(row))(predicate) if negate else predicate)
+    return lambda row: combine(p(row) for p in predicates)
+
+
+class _Negation:
+    def __init__(self, query):
+        self.query = query
+
+    def __getattr__(self, name):
+        method = getattr(self.query, name)
+
+        def negated(*args, **kwargs):
+            self.query._negate_next = True
+            return method(*args, **kwargs)
+        return negated
+
+
+class LocalQuery:
+    def __init__(self, store, table):
+        self.store = store
+        self.table = table
+        self.method = 'select'
+        self.columns = None
+        self.count = None
+        self.payload = None
+        self.ignore_duplicates = False
+        self.on_conflict = 'id'
+        self.filters = []
+        self.orders = []
+        self.limit_count = None
+        self.offset = 0
+        self.embeds = []
+        self._negate_next = False
+
+    # Query kind
+
+    def select(self, *columns, count=None):
+        names = []
+        for c in columns:
+            names.extend(part.strip() for part in c.split(','))
+        # Embedded resources look like child_table(*)
+        self.embeds = [n.split('(')[0] for n in names if n.endswith(')')]
+        names = [n for n in names if not n.endswith(')')]
+        self.columns = None if not names or '*' in names else names
+        self.count = count
+        return self
+
+    def insert(self, json, **kwargs):
+        self.method, self.payload = 'insert', json
+        return self
+
+    def upsert(self, json, ignore_duplicates=False, on_conflict='id', **kwargs):
+        self.method, self.payload = 'upsert', json
+        self.ignore_duplicates = ignore_duplicates
+        self.on_conflict = on_conflict or 'id'
+        return self
+
+    def update(self, json, **kwargs):
+        self.method, self.payload = 'update', json
+        return self
+
+    def delete(self, **kwargs):
+        self.method = 'delete'
+        return self
+
+    # Filters
+
+    def _filter(self, predicate):
+        if self._negate_next:
+            self._negate_next = False
+            self.filters.append(lambda row: not predicate(row))
+        else:
+            self.filters.append(predicate)
+        return self
+
+    @property
+    def not_(self):
+        return _Negation(self)
+
+    def eq(self, column, value):
+        return self._filter(lambda row: _compare('eq', row.get(column), value))
+
+    def neq(self, column, value):
+        return self._filter(lambda row: _compare('neq', row.get(column), value))
+
+    def gt(self, column, value):
+        return self._filter(lambda row: _compare('gt', row.get(column), value))
+
+    def gte(self, column, value):
+        return self._filter(lambda row: _compare('gte', row.get(column), value))
+
+    def lt(self, column, value):
+        return self._filter(lambda row: _compare('lt', row.get(column), value))
+
+    def lte(self, column, value):
+        return self._filter(lambda row: _compare('lte', row.get(column), value))
+
+    def like(self, column, pattern):
+        regex = _like(pattern, True)
+        return self._filter(lambda row: row.get(column) is not None and bool(regex.match(str(row[column]))))
+
+    def ilike(self, column, pattern):
+        regex = _like(pattern, False)
+        return self._filter(lambda row: row.get(column) is not None and bool(regex.match(str(row[column]))))
+
+    def is_(self, column, value):
+        expected = {'null': None, 'true': True, 'false': False}.get(str(value).lower(), value)
+        return self._filter(lambda row: row.get(column) is expected)
+
+    def or_(self, filters, reference_table=None):
+        return self._filter(_logic_predicate(filters, any))
+
+    def in_(self, column, values):
+        values = list(values)
+        return self._filter(lambda row: any(_compare('eq', row.get(column), v) for v in values))
+
+    # Modifiers
+
+    def order(self, column, desc=False, nullsfirst=None, **kwargs):
+        self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size, **kwargs):
+        self.limit_count = size
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset = start
+        self.limit_count = end - start + 1
+        return self
+
+    # Execution
+
+    def _matches(self, row):
+        return all(f(row) for f in self.filters)
+
+    def _sorted(self, rows):
+        for column, desc, nullsfirst in reversed(self.orders):
+            # Postgres puts NULLs last ascending and first descending
+            nulls_first = desc if nullsfirst is None else nullsfirst
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: r[column], reverse=desc)
+            rows = missing + present if nulls_first else present + missing
+        return rows
+
+    def _project(self, row):
+        if self.columns is None:
+            result = copy.deepcopy(row)
+        else:
+            result = {c: copy.deepcopy(row.get(c)) for c in self.columns}
+        for child in self.embeds:
+            fk = FOREIGN_KEYS[(self.table, child)]
+            result[child] = [copy.deepcopy(r) for r in self.store.rows(child) if r.get(fk) == row['id']]
+        return result
+
+    def _prepare(self, values):
+        row = {k: (_now() if v == 'now()' else v) for k, v in values.items()}
+        row.setdefault('id', str(uuid.uuid4()))
+        if row.get('created_at') is None:
+            row['created_at'] = _now()
+        if row.get('updated_at') is None:
+            row['updated_at'] = row['created_at']
+        return row
+
+    def execute(self):
+        if Config.LOCAL_BACKEND_LATENCY_MS:
+            time.sleep(Config.LOCAL_BACKEND_LATENCY_MS / 1000)
+        return self._run()
+
+    def _run(self):
+        with self.store.lock:
+            rows = self.store.rows(self.table)
+            if self.method == 'select':
+                matched = self._sorted([r for r in rows if self._matches(r)])
+                total = len(matched)
+                end = None if self.limit_count is None else self.offset + self.limit_count
+                data = [self._project(r) for r in matched[self.offset:end]]
+                return LocalResponse(data, total if self.count else None)
+
+            if self.method in ('insert', 'upsert'):
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                keys = [k.strip() for k in self.on_conflict.split(',')]
+                ids = {r['id'] for r in rows}
+                data = []
+                for values in payload:
+                    existing = None
+                    if self.method == 'upsert':
+                        existing = next((r for r in rows if all(r.get(k) == values.get(k) for k in keys)), None)
+                    if existing is not None:
+                        if self.ignore_duplicates:
+                            continue
+                        existing.update({k: (_now() if v == 'now()' else v) for k, v in values.items()})
+                        data.append(copy.deepcopy(existing))
+                        continue
+                    row = self._prepare(values)
+                    if row['id'] in ids:
+                        raise LocalBackendError(f'duplicate key value violates unique constraint "{self.table}_pkey"')
+                    ids.add(row['id'])
+                    rows.append(row)
+                    data.append(copy.deepcopy(row))
+                return LocalResponse(data)
+
+            matched = [r for r in rows if self._matches(r)]
+            if self.method == 'update':
+                for r in matched:
+                    r.update({k: (_now() if v == 'now()' else v) for k, v in self.payload.items()})
+                return LocalResponse([copy.deepcopy(r) for r in matched])
+
+            if self.method == 'delete':
+                ids = {id(r) for r in matched}
+                self.store.tables[self.table] = [r for r in rows if id(r) not in ids]
+                return LocalResponse([copy.deepcopy(r) for r in matched])
+
+        raise LocalBackendError(f'Unsupported method: {self.method}')
+
+
+class AsyncLocalQuery(LocalQuery):
+    """Same query builder with an awaitable execute, like the async PostgREST client"""
+
+    async def execute(self):
+        if Config.LOCAL_BACKEND_LATENCY_MS:
+            await asyncio.sleep(Config.LOCAL_BACKEND_LATENCY_MS / 1000)
+        return self._run()
+
+
+class _User:
+    def __init__(self, id, email):
+        self.id = id
+        self.email = email
+        self.email_confirmed_at = _now()
+
+
+class _AuthResponse:
+    def __init__(self, user):
+        self.user = user
+
+
+class LocalAuth:
+    def __init__(self, store):
+        self.store = store
+
+    def sign_up(self, credentials):
+        with self.store.lock:
+            email = credentials['email'].lower()
+            if email in self.store.users:
+                raise LocalBackendError('User already registered')
+            user = _User(str(uuid.uuid4()), email)
+            self.store.users[email] = (user, credentials['password'])
+            # Mirrors the on_auth_user_created trigger
+            self.store.rows('profiles').append({'id': user.id, 'email': email, 'name': None, 'created_at': _now(), 'updated_at': _now()})
+            return _AuthResponse(user)
+
+    def sign_in_with_password(self, credentials):
+        with self.store.lock:
+            entry = self.store.users.get(credentials['email'].lower())
+            if not entry or entry[1] != credentials['password']:
+                raise LocalBackendError('Invalid login credentials')
+            return _AuthResponse(entry[0])
+
+
+class _LocalRPC:
+    def __init__(self, name):
+        self.name = name
+
+    def execute(self):
+        raise LocalBackendError(f'Function {self.name} is not available in the local backend')
+
+
+class LocalClient:
+    def __init__(self, store=None):
+        self.store = store or LocalStore()
+        self.auth = LocalAuth(self.store)
+
+    def table(self, name):
+        return LocalQuery(self.store, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None, **kwargs):
+        return _LocalRPC(name)
+
+
+class AsyncLocalClient(LocalClient):
+    def table(self, name):
+        return AsyncLocalQuery(self.store, name)
+
+
+_client = None
+_async_client = None
+
+
+def get_local_client():
+    global _client
+    if _client is None:
+        _client = LocalClient()
+    return _client
+
+
+def get_async_local_client():
+    """Async view of the same store, so both app modes see the same data"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncLocalClient(get_local_client().store)
+    return _async_client
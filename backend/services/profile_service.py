@@ -0,0 +1,26 @@
+from config import Config
+from services.supabase_service import get_client
+from services.cache_service import cache_delete, cached
+
+# Profile lookups for the auth routes. /api/auth/validate runs on every app
+# launch and resume, so the name is served from the shared cache and only
+# read from the profiles table on a miss. The entry lives outside the
+# user's cache namespace, so ledger writes (invalidate_user) leave it alone;
+# anything that changes a profile must call invalidate_profile.
+
+
+def _profile_key(user_id):
+    return f'profile:{user_id}'
+
+
+def get_profile_name(user_id):
+    """The user's display name, or None if it is not set"""
+    def load():
+        response = get_client().table('profiles').select('name').eq('id', user_id).execute()
+        # Stored as a dict so that a missing name is cached too
+        return {'name': response.data[0].get('name') if response.data else None}
+    return cached(_profile_key(user_id), load, Config.PROFILE_CACHE_TTL)['name']
+
+
+def invalidate_profile(user_id):
+    cache_delete(_profile_key(user_id))
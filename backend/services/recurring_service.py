@@ -0,0 +1,181 @@
+import calendar
+import uuid
+from datetime import date, timedelta
+from services.supabase_service import get_service_client
+from services.cache_service import invalidate_user
+from services.analytics_service import invalidate_index
+from services.anomaly_service import invalidate_spending_stats
+from services.budget_service import apply_transaction_changes, recompute_budgets
+from services.event_service import publish
+
+# Recurring rules and the scheduler that materializes their occurrences.
+#
+# A rule's next_run is the first occurrence not yet turned into a transaction.
+# The scheduler pages through due rules, creates every occurrence up to today
+# (so it catches up after downtime), inserts them in chunks and advances
+# next_run. Transaction ids are derived from (rule, date), so a run that dies
+# half way can simply be repeated without creating duplicates.
+#
+# Derived state (balance cache, analytics, anomalies, budgets, events) is
+# refreshed once per user per page, before that page's rules are advanced.
+# Occurrences that already existed come from a run that died before it
+# advanced their rules, so whether their budget deltas were applied is
+# unknown; those users' budgets are recounted instead of patched.
+
+FREQUENCIES = ['daily', 'weekly', 'monthly', 'yearly']
+NAMESPACE = uuid.UUID('0d6c8a4e-1f25-4c59-8a0b-3e7d9b2f6a41')
+RULE_BATCH_SIZE = 200
+INSERT_CHUNK_SIZE = 500
+# Upper bound on occurrences created for one rule in one run
+MAX_CATCH_UP = 400
+
+
+def _clamp(year, month, day):
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def _add_months(day, months, day_of_month):
+    index = day.year * 12 + day.month - 1 + months
+    return _clamp(index // 12, index % 12 + 1, day_of_month)
+
+
+def first_occurrence(rule):
+    """First occurrence on or after the rule's start date"""
+    start = date.fromisoformat(str(rule['start_date']))
+    frequency = rule['frequency']
+    if frequency == 'weekly' and rule.get('weekday') is not None:
+        return start + timedelta(days=(rule['weekday'] - start.weekday()) % 7)
+    if frequency in ('monthly', 'yearly'):
+        day_of_month = rule.get('day_of_month') or start.day
+        candidate = _clamp(start.year, start.month, day_of_month)
+        if candidate < start:
+            candidate = _add_months(candidate, 1 if frequency == 'monthly' else 12, day_of_month)
+        return candidate
+    return start
+
+
+def next_occurrence(rule, current):
+    """Occurrence that follows current"""
+    interval = rule.get('interval') or 1
+    frequency = rule['frequency']
+    if frequency == 'daily':
+        return current + timedelta(days=interval)
+    if frequency == 'weekly':
+        return current + timedelta(weeks=interval)
+    day_of_month = rule.get('day_of_month') or date.fromisoformat(str(rule['start_date'])).day
+    months = interval if frequency == 'monthly' else interval * 12
+    return _add_months(current, months, day_of_month)
+
+
+def due_occurrences(rule, today):
+    """Dates from next_run up to today (and end_date), plus the next_run that follows them"""
+    current = date.fromisoformat(str(rule['next_run']))
+    end_date = date.fromisoformat(str(rule['end_date'])) if rule.get('end_date') else None
+    dates = []
+    while current <= today and (end_date is None or current <= end_date) and len(dates) < MAX_CATCH_UP:
+        dates.append(current)
+        current = next_occurrence(rule, current)
+    return dates, current
+
+
+def occurrence_id(rule_id, day):
+    return str(uuid.uuid5(NAMESPACE, f'{rule_id}:{day.isoformat()}'))
+
+
+def _occurrence(rule, day):
+    return {
+        'id': occurrence_id(rule['id'], day),
+        'user_id': rule['user_id'],
+        'type': rule['type'],
+        'amount': rule['amount'],
+        'category': rule['category'],
+        'description': rule.get('description') or '',
+        'date': day.isoformat(),
+        'recurring_rule_id': rule['id'],
+    }
+
+
+def _due_rules(supabase, today):
+    """Yield pages of due rules using keyset pagination on id"""
+    last_id = None
+    while True:
+        query = supabase.table('recurring_rules').select('*').eq('is_active', True).lte('next_run', today.isoformat()).order('id').limit(RULE_BATCH_SIZE)
+        if last_id:
+            query = query.gt('id', last_id)
+        rules = query.execute().data
+        if not rules:
+            return
+        yield rules
+        last_id = rules[-1]['id']
+
+
+def _refresh_derived(user_id, rows, recount, supabase):
+    invalidate_user(user_id)
+    invalidate_index(user_id)
+    invalidate_spending_stats(user_id)
+    if recount:
+        recompute_budgets(user_id, supabase)
+    else:
+        apply_transaction_changes(user_id, [(None, row) for row in rows], supabase)
+    if rows:
+        publish(user_id, 'transaction', op='created', ids=[row['id'] for row in rows])
+
+
+def _advance(supabase, rule, dates, next_run):
+    """Move the rule past the created occurrences, unless it was edited since it was read"""
+    changes = {
+        'next_run': next_run.isoformat(),
+        'last_run': dates[-1].isoformat() if dates else rule.get('last_run'),
+        'updated_at': 'now()',
+    }
+    end_date = rule.get('end_date')
+    if end_date is not None and next_run > date.fromisoformat(str(end_date)):
+        changes['is_active'] = False
+    # An edit re-anchors next_run; the scheduler then leaves the rule to the next run
+    supabase.table('recurring_rules').update(changes).eq('id', rule['id']).eq('next_run', rule['next_run']).execute()
+
+
+def run_due(today=None, supabase=None):
+    """Materialize every due occurrence for every user; returns counts for logging"""
+    today = today or date.today()
+    supabase = supabase or get_service_client()
+    users = set()
+    transactions = 0
+    rules_run = 0
+
+    for rules in _due_rules(supabase, today):
+        occurrences = []
+        schedule = []
+        for rule in rules:
+            dates, next_run = due_occurrences(rule, today)
+            occurrences.extend(_occurrence(rule, day) for day in dates)
+            schedule.append((rule, dates, next_run))
+
+        # Rows that already exist (from an interrupted run) are skipped and not returned
+        inserted = {}
+        for i in range(0, len(occurrences), INSERT_CHUNK_SIZE):
+            chunk = occurrences[i:i + INSERT_CHUNK_SIZE]
+            response = supabase.table('transactions').upsert(chunk, ignore_duplicates=True).execute()
+            for row in response.data or []:
+                inserted[row['id']] = row
+        existing = {o['user_id'] for o in occurrences if o['id'] not in inserted}
+
+        # One refresh of derived state per user in this page, however many occurrences they got
+        by_user = {}
+        for row in inserted.values():
+            by_user.setdefault(row['user_id'], []).append(row)
+        for user_id in set(by_user) | existing:
+            _refresh_derived(user_id, by_user.get(user_id, []), user_id in existing, supabase)
+
+        # Advance the rules only after their transactions and derived state are stored
+        for rule, dates, next_run in schedule:
+            _advance(supabase, rule, dates, next_run)
+        users.update(by_user)
+        transactions += len(inserted)
+        rules_run += len(rules)
+
+    return {
+        'rules': rules_run,
+        'users': len(users),
+        'transactions': transactions,
+    }
@@ -0,0 +1,387 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from flask import g, has_request_context, jsonify, request
+from config import Config
+from services import single_flight
+
+# Resilience layer around the data client.
+#
+# Every query's execute() goes through here:
+#   - Deadlines: each request gets a time budget (REQUEST_DEADLINE, or less if
+#     the client sends X-Request-Timeout-Ms) and every read only waits for
+#     what is left of it, so a slow database fails the request instead of
+#     holding the worker for the full HTTP timeout. A write that has started
+#     is waited for until it finishes (bounded by the HTTP timeout), since it
+#     may still commit and a 503 would invite a retry that applies it twice.
+#   - Circuit breakers per (table, operation): when too many recent calls
+#     failed, calls fail fast for BREAKER_COOLDOWN seconds, then one trial
+#     call decides whether to close again.
+#   - Hedged reads: a select that has not answered after HEDGE_DELAY_MS is
+#     sent a second time and the first answer wins. Off unless configured.
+#   - Single-flight: identical selects share one call (services.single_flight).
+# Failures surface as DependencyUnavailable, which the app turns into a 503.
+#
+# The async client used by asgi.py gets deadlines, circuit breakers and the
+# 503 mapping too (AsyncResilientClient, init_async_resilience); its reads are
+# neither hedged nor single-flighted.
+
+READ_OPERATIONS = {'select'}
+# Database functions that only read (aggregates_schema.sql), with the tables
+# they read; their calls are treated like selects on those tables
+READ_ONLY_FUNCTIONS = {
+    'get_transaction_totals': ('transactions',),
+    'get_loan_activity_totals': ('loan_activities',),
+    'get_contact_balances': ('loan_activities',),
+    'get_monthly_totals': ('transactions', 'loan_activities'),
+}
+OPERATIONS = {'select', 'insert', 'upsert', 'update', 'delete'}
+POOL_SIZE = 64
+
+_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='data-call')
+# Deadline of the async request being served (the sync app keeps it in g)
+_async_deadline = ContextVar('async_deadline', default=None)
+
+
+class DependencyUnavailable(Exception):
+    pass
+
+
+class DeadlineExceeded(DependencyUnavailable):
+    pass
+
+
+class CircuitOpen(DependencyUnavailable):
+    pass
+
+
+def _is_failure(exc):
+    """Errors that say the dependency is unhealthy, as opposed to a bad query"""
+    if isinstance(exc, (DependencyUnavailable, TimeoutError, ConnectionError)):
+        return True
+    # httpx transport errors, without importing httpx here
+    return any(cls.__name__ in ('TransportError', 'TimeoutException') for cls in type(exc).__mro__)
+
+
+class CircuitBreaker:
+    def __init__(self, name):
+        self.name = name
+        self.calls = deque()
+        self.opened_at = None
+        # Tickets handed out by allow(). A new epoch starts whenever the
+        # breaker opens or closes, so calls that were admitted before that
+        # do not count towards the new state.
+        self.epoch = object()
+        self.trial = None
+        self.lock = threading.Lock()
+
+    def _prune(self, now):
+        while self.calls and self.calls[0][0] < now - Config.BREAKER_WINDOW:
+            self.calls.popleft()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < Config.BREAKER_COOLDOWN:
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        """A ticket to pass to record() with the call's result, or None if the call must fail fast"""
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return self.epoch
+            if state == 'half_open' and self.trial is None:
+                self.trial = object()
+                return self.trial
+            return None
+
+    def record(self, ticket, ok):
+        now = time.monotonic()
+        with self.lock:
+            if ticket is self.trial:
+                # Result of the half-open trial call
+                self.trial = None
+                self.opened_at = None if ok else now
+                self.epoch = object()
+                self.calls.clear()
+                return
+            if ticket is not self.epoch or self.opened_at is not None:
+                # Admitted before the breaker last opened or closed
+                return
+            self.calls.append((now, ok))
+            self._prune(now)
+            failures = sum(1 for _, succeeded in self.calls if not succeeded)
+            if len(self.calls) >= Config.BREAKER_MIN_CALLS and failures / len(self.calls) >= Config.BREAKER_ERROR_RATE:
+                self.opened_at = now
+                self.epoch = object()
+
+    def cancel(self, ticket):
+        """The call was abandoned before it had a result; another trial may run"""
+        with self.lock:
+            if ticket is self.trial:
+                self.trial = None
+
+    def snapshot(self):
+        with self.lock:
+            self._prune(time.monotonic())
+            failures = sum(1 for _, ok in self.calls if not ok)
+            return {'state': self.state, 'calls': len(self.calls), 'failures': failures}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(table, operation):
+    key = f'{table}:{operation}'
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(key)
+        return _breakers[key]
+
+
+def breaker_states():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def remaining_time():
+    """Seconds left in the current request's budget, or None outside a request"""
+    if not has_request_context() or 'deadline' not in g:
+        return None
+    return g.deadline - time.monotonic()
+
+
+def extend_deadline():
+    """Start a fresh budget for the current request, for responses streamed in batches"""
+    if has_request_context():
+        g.deadline = time.monotonic() + g.get('deadline_budget', Config.REQUEST_DEADLINE)
+
+
+def _hedged(call, remaining):
+    """Run call, sending a second copy if the first is slower than HEDGE_DELAY_MS"""
+    deadline = time.monotonic() + remaining
+    first = _pool.submit(call)
+    try:
+        return first.result(timeout=min(Config.HEDGE_DELAY_MS / 1000, remaining))
+    except FutureTimeout:
+        pass
+
+    pending = {first, _pool.submit(call)}
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = error or future.exception()
+    if error is not None and not pending:
+        raise error
+    raise DeadlineExceeded('Deadline exceeded waiting for the database')
+
+
+def _execute(query, table, operation):
+    breaker = get_breaker(table, operation)
+    ticket = breaker.allow()
+    if ticket is None:
+        raise CircuitOpen(f'Circuit open for {table} {operation}')
+
+    remaining = remaining_time()
+    try:
+        if remaining is None:
+            result = query.execute()
+        elif remaining <= 0:
+            raise DeadlineExceeded('Request deadline already passed')
+        elif operation not in READ_OPERATIONS:
+            # Writes are not abandoned at the deadline (see above)
+            result = query.execute()
+        elif Config.HEDGE_DELAY_MS > 0:
+            result = _hedged(query.execute, remaining)
+        else:
+            # The call keeps running in the pool if we stop waiting; the
+            # client's own HTTP timeout bounds how long that can be
+            try:
+                result = _pool.submit(query.execute).result(timeout=remaining)
+            except FutureTimeout:
+                raise DeadlineExceeded('Deadline exceeded waiting for the database')
+    except Exception as e:
+        breaker.record(ticket, not _is_failure(e))
+        raise
+    breaker.record(ticket, True)
+    return result
+
+
+async def _execute_async(query, table, operation):
+    """_execute for the async client, which is awaited on the event loop instead of a pool thread"""
+    breaker = get_breaker(table, operation)
+    ticket = breaker.allow()
+    if ticket is None:
+        raise CircuitOpen(f'Circuit open for {table} {operation}')
+
+    deadline = _async_deadline.get()
+    remaining = None if deadline is None else deadline - time.monotonic()
+    try:
+        if remaining is None:
+            result = await query.execute()
+        elif remaining <= 0:
+            raise DeadlineExceeded('Request deadline already passed')
+        elif operation not in READ_OPERATIONS:
+            # Writes are not abandoned at the deadline (see above)
+            result = await query.execute()
+        else:
+            try:
+                result = await asyncio.wait_for(query.execute(), remaining)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded('Deadline exceeded waiting for the database')
+    except asyncio.CancelledError:
+        # The request went away; this says nothing about the database
+        breaker.cancel(ticket)
+        raise
+    except Exception as e:
+        breaker.record(ticket, not _is_failure(e))
+        raise
+    breaker.record(ticket, True)
+    return result
+
+
+class ResilientQuery:
+    """Proxy for a query builder that routes execute() through _execute.
+
+    It records the builder calls made on it, which identify the query for
+    single-flight, and the tables whose writes make its result stale.
+    """
+
+    def __init__(self, query, table, operation='select', client_key=None, calls=(), sources=None):
+        self._query = query
+        self._table = table
+        self._operation = operation
+        self._client_key = client_key
+        self._calls = calls
+        self._sources = sources or (table,)
+
+    def execute(self):
+        if self._operation not in READ_OPERATIONS:
+            single_flight.note_write(self._table)
+            try:
+                return _execute(self._query, self._table, self._operation)
+            finally:
+                # Reads that started while the write ran may not have seen it
+                single_flight.note_write(self._table)
+        if not Config.SINGLE_FLIGHT_ENABLED:
+            return _execute(self._query, self._table, self._operation)
+
+        key = (self._client_key, self._table, repr(self._calls))
+        remaining = remaining_time()
+        try:
+            return single_flight.read(key, lambda: _execute(self._query, self._table, self._operation), remaining, self._sources)
+        except TimeoutError:
+            raise DeadlineExceeded('Deadline exceeded waiting for a shared read')
+
+    def _wrap(self, result, name, operation, args=(), kwargs=None):
+        calls = self._calls + ((name, args, tuple(sorted((kwargs or {}).items()))),)
+        return type(self)(result, self._table, operation, self._client_key, calls, self._sources)
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        operation = name if name in OPERATIONS else self._operation
+        if not callable(attr):
+            # Properties such as not_ return the builder (or a helper around it)
+            return self._wrap(attr, name, operation) if name == 'not_' else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self._wrap(result, name, operation, args, kwargs) if hasattr(result, 'execute') else result
+        return call
+
+
+class AsyncResilientQuery(ResilientQuery):
+    """ResilientQuery for the async client; execute() is awaited"""
+
+    async def execute(self):
+        if self._operation not in READ_OPERATIONS:
+            # Sync requests must not share reads from before the write either
+            single_flight.note_write(self._table)
+            try:
+                return await _execute_async(self._query, self._table, self._operation)
+            finally:
+                single_flight.note_write(self._table)
+        return await _execute_async(self._query, self._table, self._operation)
+
+
+class ResilientClient:
+    query_class = ResilientQuery
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return self.query_class(self._client.table(name), name, client_key=id(self._client))
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None, **kwargs):
+        operation = 'select' if name in READ_ONLY_FUNCTIONS else 'rpc'
+        calls = (('rpc', (name, params), tuple(sorted(kwargs.items()))),)
+        return self.query_class(
+            self._client.rpc(name, params, **kwargs), f'rpc:{name}', operation, id(self._client), calls,
+            READ_ONLY_FUNCTIONS.get(name)
+        )
+
+    def __getattr__(self, name):
+        # auth, storage and anything else pass straight through
+        return getattr(self._client, name)
+
+
+class AsyncResilientClient(ResilientClient):
+    query_class = AsyncResilientQuery
+
+
+def _budget(headers):
+    """Seconds the request may spend on the database, at most REQUEST_DEADLINE"""
+    budget = Config.REQUEST_DEADLINE
+    requested = headers.get('X-Request-Timeout-Ms')
+    if requested and requested.isdigit():
+        budget = min(budget, int(requested) / 1000)
+    return budget
+
+
+def init_resilience(flask_app):
+    """Give every request a deadline and answer dependency failures with 503"""
+
+    @flask_app.before_request
+    def set_deadline():
+        budget = _budget(request.headers)
+        g.deadline_budget = budget
+        g.deadline = time.monotonic() + budget
+
+    @flask_app.errorhandler(DependencyUnavailable)
+    def dependency_unavailable(e):
+        response = jsonify({'message': 'Service temporarily unavailable', 'reason': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(Config.BREAKER_COOLDOWN))
+        return response
+
+
+def init_async_resilience(quart_app):
+    """init_resilience for the Quart app in asgi.py"""
+    # Only the ASGI entry point needs Quart
+    from quart import request as async_request
+
+    @quart_app.before_request
+    async def set_deadline():
+        _async_deadline.set(time.monotonic() + _budget(async_request.headers))
+
+    @quart_app.errorhandler(DependencyUnavailable)
+    async def dependency_unavailable(e):
+        body = {'message': 'Service temporarily unavailable', 'reason': str(e)}
+        return body, 503, {'Retry-After': str(int(Config.BREAKER_COOLDOWN))}
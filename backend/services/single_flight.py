@@ -0,0 +1,140 @@
+import threading
+from flask import g, has_request_context
+from services.cache_service import add_stats, get_counter, get_stats, incr_counter
+
+# Single-flight for identical reads.
+#
+# Two layers, both keyed by the full query (client, table, and every builder
+# call with its arguments, so a different filter is a different key):
+#   - Request scope: a query repeated within one request reuses the first
+#     result.
+#   - Process scope: concurrent requests in this worker that run the same
+#     query while it is in flight wait for that one call and share its result.
+# Every write bumps a generation counter for its table in the shared cache
+# database, before it runs and again after it finishes, in whichever worker
+# handles it. A result is only reused while the generations of the tables it
+# reads are what they were when its call started, so no reader is handed a
+# result from before a write that finished before the reader arrived, in any
+# worker. When the counters can't be read nothing is shared.
+# Results are shared between callers and must be treated as read-only.
+#
+# Counts are flushed to the shared cache database so /metrics can report the
+# coalescing ratio across all workers.
+
+STATS_PREFIX = 'single_flight.'
+STATS_FLUSH_EVERY = 200
+
+_inflight = {}
+_lock = threading.Lock()
+_pending = {'reads': 0, 'backend_calls': 0, 'coalesced': 0, 'request_hits': 0}
+_stats_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self, generation):
+        self.generation = generation
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+def _count(name):
+    with _stats_lock:
+        _pending[name] += 1
+        flush = _pending['reads'] >= STATS_FLUSH_EVERY
+    if flush:
+        flush_stats()
+
+
+def flush_stats():
+    with _stats_lock:
+        pending = {STATS_PREFIX + name: value for name, value in _pending.items() if value}
+        for name in _pending:
+            _pending[name] = 0
+    if pending:
+        add_stats(pending)
+
+
+def _memo():
+    if not has_request_context():
+        return None
+    if '_query_memo' not in g:
+        g._query_memo = {}
+    return g._query_memo
+
+
+def forget_request_reads():
+    """Drop the request's memo, e.g. between batches of a streamed response so it does not grow"""
+    if has_request_context():
+        g.pop('_query_memo', None)
+
+
+def _generation_key(table):
+    return f'single_flight:{table}'
+
+
+def _generation(tables):
+    """Write generations of tables across all workers, or None if they can't be read"""
+    generation = tuple(get_counter(_generation_key(table)) for table in tables)
+    return None if None in generation else generation
+
+
+def note_write(table):
+    """Called before and after a write: later reads must not reuse results from before it"""
+    incr_counter(_generation_key(table))
+    forget_request_reads()
+
+
+def read(key, load, wait_timeout=None, tables=()):
+    """Return load(), sharing it with identical reads in this request or in flight in this worker.
+
+    tables are the tables the read depends on. wait_timeout bounds how long
+    a follower waits for the call it joined; on timeout TimeoutError is raised.
+    """
+    _count('reads')
+    generation = _generation(tables)
+    memo = _memo()
+    if generation is not None and memo is not None and memo.get(key, (None,))[0] == generation:
+        _count('request_hits')
+        return memo[key][1]
+
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None or generation is None or call.generation != generation
+        if leader:
+            call = _inflight[key] = _Call(generation)
+        else:
+            call.followers += 1
+
+    if leader:
+        _count('backend_calls')
+        try:
+            call.result = load()
+        except Exception as e:
+            call.error = e
+        finally:
+            with _lock:
+                if _inflight.get(key) is call:
+                    del _inflight[key]
+            call.done.set()
+    else:
+        _count('coalesced')
+        if not call.done.wait(wait_timeout):
+            raise TimeoutError('Timed out waiting for a shared read')
+
+    if call.error is not None:
+        raise call.error
+    if memo is not None:
+        memo[key] = (call.generation, call.result)
+    return call.result
+
+
+def stats():
+    """Read counts across all workers, with the share answered without a backend call"""
+    flush_stats()
+    values = get_stats(STATS_PREFIX)
+    result = {name: values.get(STATS_PREFIX + name, 0) for name in _pending}
+    saved = result['coalesced'] + result['request_hits']
+    result['coalescing_ratio'] = saved / result['reads'] if result['reads'] else 0
+    return result
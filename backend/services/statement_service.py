@@ -0,0 +1,113 @@
+import base64
+import hashlib
+import hmac
+import json
+from config import Config
+from services.resilience import extend_deadline
+from services.single_flight import forget_request_reads
+from services.supabase_service import get_client
+from utils.money import from_cents, to_cents
+
+# Loan contact statements.
+#
+# Activities are listed in a stable (activity_date, created_at, id) order and
+# paged by seeking past the last row of the previous page instead of with an
+# offset, so every page costs one indexed range read however long the ledger
+# is. The cursor carries that row's sort key and the running balance after it,
+# which is the next page's opening balance; no page ever reads the rows before
+# it. Balances are computed in this order rather than taken from the stored
+# balance_after, which follows insertion order and so disagrees with the
+# statement once an activity is backdated.
+#
+# Cursors are signed, so a client can't start a page from a made-up balance,
+# and bound to their contact.
+
+ACTIVITY_SIGNS = {'given': 1, 'borrowed': -1, 'payment_received': -1, 'payment_made': 1}
+COLUMNS = 'id, activity_type, amount, description, activity_date, created_at'
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def _sign(payload):
+    return hmac.new(Config.JWT_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def encode_cursor(contact_id, activity, balance_cents):
+    """Opaque cursor for the page after activity, whose running balance is balance_cents"""
+    payload = base64.urlsafe_b64encode(json.dumps({
+        'contact_id': contact_id,
+        'activity_date': activity['activity_date'],
+        'created_at': activity['created_at'],
+        'id': activity['id'],
+        'balance': balance_cents,
+    }, separators=(',', ':')).encode()).decode().rstrip('=')
+    return f'{payload}.{_sign(payload)}'
+
+
+def decode_cursor(contact_id, cursor):
+    """(position, opening balance in cents) from a cursor; raises ValueError if it is not valid for this contact"""
+    payload, _, signature = cursor.partition('.')
+    if not signature or not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError('Invalid cursor')
+    try:
+        data = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    if not isinstance(data, dict):
+        raise ValueError('Invalid cursor')
+    if data.get('contact_id') != contact_id:
+        raise ValueError('Cursor belongs to another contact')
+    if not all(data.get(k) for k in ('activity_date', 'created_at', 'id')) or not isinstance(data.get('balance'), int):
+        raise ValueError('Invalid cursor')
+    return data, data['balance']
+
+
+def parse_limit(args):
+    """Page (or streaming batch) size from the query string; raises ValueError with a message for the client"""
+    limit = args.get('limit', DEFAULT_LIMIT, type=int)
+    if limit is None or not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit
+
+
+def _page_query(supabase, user_id, contact_id, position, limit):
+    query = supabase.table('loan_activities').select(COLUMNS).eq('contact_id', contact_id).eq('user_id', user_id)
+    if position:
+        # Rows after (activity_date, created_at, id) of the cursor row
+        d, c, i = (json.dumps(position[k]) for k in ('activity_date', 'created_at', 'id'))
+        query = query.or_(
+            f'activity_date.gt.{d},'
+            f'and(activity_date.eq.{d},created_at.gt.{c}),'
+            f'and(activity_date.eq.{d},created_at.eq.{c},id.gt.{i})'
+        )
+    # One extra row tells whether another page follows
+    return query.order('activity_date').order('created_at').order('id').limit(limit + 1)
+
+
+def statement_page(user_id, contact_id, position=None, opening_cents=0, limit=DEFAULT_LIMIT):
+    """One page of the statement from position on.
+
+    Returns (activities with their running balance, closing balance in cents,
+    position of the last row or None, whether more rows follow).
+    """
+    rows = _page_query(get_client(), user_id, contact_id, position, limit).execute().data
+    has_more = len(rows) > limit
+    activities = []
+    balance = opening_cents
+    for row in rows[:limit]:
+        balance += ACTIVITY_SIGNS.get(row['activity_type'], 0) * to_cents(row['amount'])
+        activities.append({**row, 'balance': from_cents(balance)})
+    return activities, balance, (activities[-1] if activities else position), has_more
+
+
+def iter_statement(user_id, contact_id, position=None, opening_cents=0, batch=DEFAULT_LIMIT):
+    """Yield activities with their running balance from position to the end, holding one batch at a time"""
+    balance = opening_cents
+    has_more = True
+    while has_more:
+        # Each batch is a fresh query with its own time budget, and is not
+        # kept in the request's read memo once consumed
+        extend_deadline()
+        activities, balance, position, has_more = statement_page(user_id, contact_id, position, balance, batch)
+        forget_request_reads()
+        yield from activities
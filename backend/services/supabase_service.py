@@ -1,18 +1,48 @@
-from supabase import create_client, Client
+from supabase import create_client, acreate_client, AsyncClientOptions, Client, ClientOptions
 from config import Config
+from services.local_backend import get_local_client, get_async_local_client
+from services.resilience import AsyncResilientClient, ResilientClient
 
 _client = None
+_async_client = None
+
+def _resilient(client):
+    return ResilientClient(client) if Config.RESILIENCE_ENABLED else client
+
+def _async_resilient(client):
+    return AsyncResilientClient(client) if Config.RESILIENCE_ENABLED else client
+
+def _options(options_class=ClientOptions):
+    # Bounds calls the resilience layer has stopped waiting for
+    return options_class(postgrest_client_timeout=Config.DEPENDENCY_TIMEOUT)
 
 def get_client():
     global _client
     if _client is None:
-        if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
-            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env")
-        _client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+        if Config.DATA_BACKEND == 'local':
+            _client = _resilient(get_local_client())
+        else:
+            if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
+                raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env")
+            _client = _resilient(create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY, options=_options()))
     return _client
 
 def get_service_client():
+    if Config.DATA_BACKEND == 'local':
+        return _resilient(get_local_client())
     if not Config.SUPABASE_URL or not Config.SUPABASE_SERVICE_KEY:
         raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in .env")
-    return create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+    return _resilient(create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY, options=_options()))
+
 
+async def get_async_client():
+    """Async client for the ASGI app; queries are awaited with `await query.execute()`"""
+    global _async_client
+    if Config.DATA_BACKEND == 'local':
+        return _async_resilient(get_async_local_client())
+    if _async_client is None:
+        if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env")
+        client = await acreate_client(Config.SUPABASE_URL, Config.SUPABASE_KEY, options=_options(AsyncClientOptions))
+        _async_client = _async_resilient(client)
+    return _async_client
@@ -0,0 +1,157 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from config import Config
+from services.supabase_service import get_client
+
+logger = logging.getLogger(__name__)
+
+# Write-behind buffer for `updated_at` touches.
+#
+# Routes that only need to bump a row's updated_at record the touch here
+# instead of sending an update right away. Touches live in the shared cache
+# database, so one pending touch per row is kept across all workers and the
+# latest one wins. A background thread in each worker flushes the buffer every
+# TOUCH_FLUSH_INTERVAL seconds with one `update ... where id in (...)` per
+# table and timestamp; timestamps are kept to the second so a flush sends a
+# handful of statements however many rows were touched. Readers that sort by
+# updated_at overlay pending() so their order is right before the flush.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_touches (
+    table_name TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    touched_at TEXT NOT NULL,
+    PRIMARY KEY (table_name, row_id)
+);
+CREATE INDEX IF NOT EXISTS idx_pending_touches_user ON pending_touches(table_name, user_id);
+"""
+
+_local = threading.local()
+_flusher_lock = threading.Lock()
+_flusher_pid = None
+
+
+def _conn():
+    """Return a connection for this thread, reopening after a fork"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid():
+        conn = sqlite3.connect(Config.CACHE_PATH, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+
+
+def _store(conn, rows):
+    # Keep the later timestamp if the row was touched again in the meantime
+    conn.executemany(
+        'INSERT INTO pending_touches (table_name, row_id, user_id, touched_at) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT(table_name, row_id) DO UPDATE SET touched_at = excluded.touched_at '
+        'WHERE excluded.touched_at > pending_touches.touched_at',
+        rows
+    )
+
+
+def touch(table, row_id, user_id):
+    """Set table.updated_at for row_id to now on the next flush"""
+    _start_flusher()
+    try:
+        _store(_conn(), [(table, row_id, user_id, _now())])
+    except sqlite3.Error:
+        # No buffer available; fall back to writing through
+        get_client().table(table).update({'updated_at': 'now()'}).eq('id', row_id).execute()
+
+
+def pending(table, user_id):
+    """Unflushed touches for one user's rows: {row_id: touched_at}"""
+    try:
+        rows = _conn().execute(
+            'SELECT row_id, touched_at FROM pending_touches WHERE table_name = ? AND user_id = ?',
+            (table, user_id)
+        ).fetchall()
+        return dict(rows)
+    except sqlite3.Error:
+        return {}
+
+
+def _take():
+    """Atomically remove and return every pending touch"""
+    conn = _conn()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows = conn.execute('SELECT table_name, row_id, user_id, touched_at FROM pending_touches').fetchall()
+        conn.execute('DELETE FROM pending_touches')
+        conn.execute('COMMIT')
+        return rows
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def flush(supabase=None):
+    """Write all pending touches; returns how many rows were updated"""
+    try:
+        rows = _take()
+    except sqlite3.Error:
+        return 0
+    if not rows:
+        return 0
+
+    batches = {}
+    for table, row_id, _, touched_at in rows:
+        batches.setdefault((table, touched_at), []).append(row_id)
+
+    try:
+        supabase = supabase or get_client()
+    except Exception:
+        # No client to write with; keep everything for the next flush
+        _store(_conn(), rows)
+        raise
+    for (table, touched_at), ids in batches.items():
+        try:
+            supabase.table(table).update({'updated_at': touched_at}).in_('id', ids).execute()
+        except Exception:
+            # Put the batch back so the next flush retries it
+            failed = [r for r in rows if r[0] == table and r[3] == touched_at]
+            try:
+                _store(_conn(), failed)
+            except sqlite3.Error:
+                pass
+    return len(rows)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(Config.TOUCH_FLUSH_INTERVAL)
+        # The thread must outlive any one failed flush, or touches would pile
+        # up unflushed until the worker restarts
+        try:
+            flush()
+        except Exception:
+            logger.exception('write-behind flush failed')
+
+
+def _start_flusher():
+    """Start this worker's flush thread on first use"""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            threading.Thread(target=_flush_loop, name='write-behind-flusher', daemon=True).start()
+            _flusher_pid = os.getpid()
+
+
+# Do not leave touches behind on a clean shutdown
+atexit.register(flush)
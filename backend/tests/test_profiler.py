@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its settings at import time
+_tmp = tempfile.mkdtemp()
+os.environ.update({
+    'DATA_BACKEND': 'local',
+    'CACHE_PATH': os.path.join(_tmp, 'cache.sqlite3'),
+    'JWT_SECRET': 'profiler-test-secret-of-at-least-32-bytes',
+    'PROFILING_ENABLED': '1',
+    'PROFILE_SAMPLE_RATE': '1',
+    'PROFILE_DIR': os.path.join(_tmp, 'profiles'),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from config import Config  # noqa: E402
+from services import supabase_service  # noqa: E402
+
+
+@pytest.fixture(params=[1, 0], ids=['resilience', 'no_resilience'])
+def client(request, monkeypatch):
+    monkeypatch.setattr(Config, 'RESILIENCE_ENABLED', request.param)
+    monkeypatch.setattr(supabase_service, '_client', None)
+    return app.test_client()
+
+
+def _profile(response):
+    with open(os.path.join(Config.PROFILE_DIR, response.headers['X-Profile-Id'] + '.json')) as f:
+        return json.load(f)
+
+
+def test_insert_counts_one_backend_call(client):
+    email = f'profiler-{Config.RESILIENCE_ENABLED}@example.com'
+    token = client.post('/api/auth/signup', json={'email': email, 'password': 'secret123', 'name': 'P'}).get_json()['token']
+
+    response = client.post(
+        '/api/transactions',
+        json={'type': 'income', 'amount': 5, 'category': 'Salary', 'description': '', 'date': '2026-01-01'},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == 201
+
+    summary = _profile(response)
+    assert summary['backend_calls'] == 1
+    assert summary['backend_ms'] <= summary['total_ms']
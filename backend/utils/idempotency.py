@@ -0,0 +1,104 @@
+import functools
+import hashlib
+import time
+from flask import request, jsonify, make_response, Response
+from config import Config
+from services.cache_service import durable_add, durable_delete, durable_get, durable_set
+from utils.jwt_handler import decode_token
+
+# Idempotency-Key support for create routes.
+#
+# The first request with a given key claims it in the shared cache and runs;
+# its response is stored for IDEMPOTENCY_TTL seconds and replayed to any retry
+# with the same key. A retry that arrives while the first request is still
+# running waits for its result instead of running again. Keys are scoped to
+# the user and route, and are kept in the cache's durable table, so neither
+# invalidation after a write nor LRU eviction forgets them before they expire.
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+# A claim outlives the worker timeout, so a slow first request is never run twice
+PENDING_TTL = 60
+
+
+def _user_id():
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None
+    try:
+        payload = decode_token(auth_header.split(' ')[1])
+        return payload.get('user_id') if payload else None
+    except:
+        return None
+
+
+def _replay(entry):
+    response = Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _wait_for(key, fingerprint):
+    """Wait for the request holding key to finish; returns its entry or None on timeout"""
+    deadline = time.monotonic() + Config.IDEMPOTENCY_WAIT
+    while time.monotonic() < deadline:
+        entry = durable_get(key)
+        if entry is None or entry['fingerprint'] != fingerprint or entry['state'] == 'done':
+            return entry
+        time.sleep(POLL_INTERVAL)
+    return durable_get(key)
+
+
+def idempotent(view):
+    """Deduplicate retries of a create route that send the same Idempotency-Key"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        idempotency_key = request.headers.get(HEADER)
+        user_id = _user_id()
+        if not idempotency_key or not user_id:
+            return view(*args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return jsonify({'message': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        key = f'idem:{user_id}:{request.method}:{request.path}:{idempotency_key}'
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+        while True:
+            claimed = durable_add(key, {'state': 'pending', 'fingerprint': fingerprint}, PENDING_TTL)
+            if claimed is None:
+                # Cache unavailable; better to run than to refuse the write
+                return view(*args, **kwargs)
+            if claimed:
+                break
+
+            entry = _wait_for(key, fingerprint)
+            if entry is None:
+                # The first request failed and released the key; try to claim it
+                continue
+            if entry['fingerprint'] != fingerprint:
+                return jsonify({'message': f'{HEADER} was already used with a different request'}), 422
+            if entry['state'] != 'done':
+                return jsonify({'message': f'A request with this {HEADER} is still in progress'}), 409
+            return _replay(entry)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            durable_delete(key)
+            raise
+
+        # Server errors are not final; let the client retry them
+        if response.status_code >= 500:
+            durable_delete(key)
+            return response
+
+        durable_set(key, {
+            'state': 'done',
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'body': response.get_data(as_text=True),
+            'mimetype': response.mimetype,
+        }, Config.IDEMPOTENCY_TTL)
+        return response
+    return wrapper
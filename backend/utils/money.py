@@ -0,0 +1,89 @@
+from array import array
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from itertools import compress
+
+# Money as integer cents.
+#
+# Amount columns are DECIMAL(15,2), but reach Python as floats, so summing them
+# directly drifts (0.1 + 0.2 != 0.3). Amounts are converted to int64 cents once,
+# kept in compact array('q') columns, and summed as integers, which is exact
+# and runs in C. Totals go back to the API as floats with from_cents, the
+# closest float to the exact decimal value.
+
+CENT = Decimal('0.01')
+# Largest DECIMAL(15,2) value, in cents
+MAX_CENTS = 10 ** 15 - 1
+
+
+def to_cents(value):
+    """Convert a stored or user-supplied amount to integer cents"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid amount: {value!r}')
+    if isinstance(value, int):
+        cents = value * 100
+    elif isinstance(value, float):
+        # Exact for every two-decimal amount below 2**53 / 100 (covers DECIMAL(15,2))
+        if value != value or value in (float('inf'), float('-inf')):
+            raise ValueError(f'Invalid amount: {value!r}')
+        cents = round(value * 100)
+    else:
+        try:
+            cents = int((Decimal(str(value).strip()) / CENT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+        except (InvalidOperation, ValueError):
+            raise ValueError(f'Invalid amount: {value!r}')
+    if abs(cents) > MAX_CENTS:
+        raise ValueError(f'Amount out of range: {value!r}')
+    return cents
+
+
+def from_cents(cents):
+    return cents / 100
+
+
+def parse_amount(value, default=0):
+    """Parse an amount from a request body, rounded to whole cents; raises ValueError"""
+    return from_cents(to_cents(default if value is None else value))
+
+
+def add_amounts(*values):
+    """Exact sum of a few amounts, e.g. a running balance plus an activity"""
+    return from_cents(sum(to_cents(v) for v in values))
+
+
+class AmountColumn:
+    """The amount field of a list of rows as int64 cents, with per-row labels for grouping"""
+
+    def __init__(self, rows, label=None, field='amount'):
+        values = [r.get(field) for r in rows]
+        try:
+            # Columns of plain numbers convert in one pass; anything else goes through to_cents
+            self.cents = array('q', [round(v * 100) for v in values if type(v) is float or type(v) is int])
+        except (ValueError, OverflowError):
+            self.cents = None
+        if self.cents is None or len(self.cents) != len(values):
+            self.cents = array('q', [to_cents(v) for v in values])
+        self.labels = [r.get(label) for r in rows] if label else None
+
+    def __len__(self):
+        return len(self.cents)
+
+    def total(self, *labels):
+        """Sum of all rows, or only the rows whose label is one of labels (cents)"""
+        if not labels:
+            return sum(self.cents)
+        wanted = set(labels)
+        return sum(compress(self.cents, [label in wanted for label in self.labels]))
+
+    def count(self, *labels):
+        wanted = set(labels)
+        return sum(1 for label in self.labels if label in wanted)
+
+    def by_label(self, keys=None):
+        """Totals per label (cents); keys optionally gives a second label per row to group by pairs"""
+        totals = {}
+        labels = self.labels if keys is None else zip(self.labels, keys)
+        for label, cents in zip(labels, self.cents):
+            totals[label] = totals.get(label, 0) + cents
+        return totals
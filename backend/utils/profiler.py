@@ -0,0 +1,144 @@
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from config import Config
+
+# Opt-in per-request profiling.
+#
+# Nothing is installed unless PROFILING_ENABLED is set, so the normal request
+# path is untouched. When enabled, a request is profiled if it carries a valid
+# X-Profile-Token header (signed with PROFILE_SECRET, see scripts.profile_token)
+# or if it falls in the PROFILE_SAMPLE_RATE fraction of traffic. Each profile is
+# saved as a .prof file (load it with pstats, snakeviz or flameprof) next to a
+# .json summary with time split by blueprint, backend calls and hot spots.
+
+TOKEN_HEADER = 'HTTP_X_PROFILE_TOKEN'
+TOKEN_MAX_AGE = 300
+HOT_SPOTS = 15
+
+# Code that talks to the database: real client, local stand-in, and the
+# resilience proxy. The proxy runs reads on a pool thread cProfile cannot see
+# and writes through the client on the same thread, so when it is in use only
+# its execute() is counted; the client's is counted when it is not.
+PROXY_MODULE = 'resilience'
+CLIENT_MODULES = ('postgrest', 'local_backend')
+
+# One profile at a time; cProfile cannot nest
+_active = threading.Lock()
+
+
+def sign_token(secret, timestamp=None):
+    timestamp = str(int(timestamp or time.time()))
+    signature = hmac.new(secret.encode(), timestamp.encode(), hashlib.sha256).hexdigest()
+    return f'{timestamp}:{signature}'
+
+
+def _valid_token(token):
+    if not Config.PROFILE_SECRET or not token or ':' not in token:
+        return False
+    timestamp, _ = token.split(':', 1)
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > TOKEN_MAX_AGE:
+        return False
+    return hmac.compare_digest(token, sign_token(Config.PROFILE_SECRET, timestamp))
+
+
+def _backend_entries(stats):
+    """Stats of the outermost execute() of each database call, so none is counted twice"""
+    executes = [(filename, value) for (filename, _, name), value in stats.stats.items() if name == 'execute']
+    proxy = [value for filename, value in executes if PROXY_MODULE in filename]
+    return proxy or [value for filename, value in executes if any(m in filename for m in CLIENT_MODULES)]
+
+
+def _summarize(stats, endpoint, elapsed):
+    backend_time = 0
+    backend_calls = 0
+    for _, calls, _, cumtime, _ in _backend_entries(stats):
+        backend_time += cumtime
+        backend_calls += calls
+    hot_spots = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        hot_spots.append((tottime, cumtime, calls, f'{filename}:{line}({name})'))
+    hot_spots.sort(reverse=True)
+
+    return {
+        'endpoint': endpoint,
+        'blueprint': endpoint.split('.')[0] if endpoint and '.' in endpoint else None,
+        'total_ms': elapsed * 1000,
+        'backend_ms': backend_time * 1000,
+        'backend_calls': backend_calls,
+        'python_ms': max(0, elapsed - backend_time) * 1000,
+        'hot_spots': [
+            {'function': where, 'self_ms': tottime * 1000, 'cumulative_ms': cumtime * 1000, 'calls': calls}
+            for tottime, cumtime, calls, where in hot_spots[:HOT_SPOTS]
+        ],
+    }
+
+
+def _rotate(directory):
+    """Keep at most PROFILE_MAX_FILES profiles, dropping the oldest"""
+    profiles = sorted(f for f in os.listdir(directory) if f.endswith('.prof'))
+    for name in profiles[:max(0, len(profiles) - Config.PROFILE_MAX_FILES)]:
+        for path in (name, name[:-5] + '.json'):
+            try:
+                os.remove(os.path.join(directory, path))
+            except OSError:
+                pass
+
+
+class ProfilingMiddleware:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi_app = flask_app.wsgi_app
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+
+    def _endpoint(self, environ):
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+            return endpoint
+        except Exception:
+            return None
+
+    def __call__(self, environ, start_response):
+        wanted = _valid_token(environ.get(TOKEN_HEADER)) or random.random() < Config.PROFILE_SAMPLE_RATE
+        if not wanted or not _active.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+
+        endpoint = self._endpoint(environ) or 'unknown'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{random.randrange(16 ** 6):06x}-{endpoint.replace('.', '_')}"
+
+        def start_with_id(status, headers, exc_info=None):
+            headers.append(('X-Profile-Id', name))
+            return start_response(status, headers, exc_info)
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                return self.wsgi_app(environ, start_with_id)
+            finally:
+                profile.disable()
+        finally:
+            elapsed = time.perf_counter() - started
+            _active.release()
+            try:
+                path = os.path.join(Config.PROFILE_DIR, name)
+                stats = pstats.Stats(profile)
+                stats.dump_stats(path + '.prof')
+                with open(path + '.json', 'w') as f:
+                    json.dump(_summarize(stats, endpoint, elapsed), f, indent=2)
+                _rotate(Config.PROFILE_DIR)
+            except OSError:
+                pass
+
+
+def init_profiling(flask_app):
+    """Wrap the app in the profiling middleware, only if profiling is enabled"""
+    if Config.PROFILING_ENABLED:
+        flask_app.wsgi_app = ProfilingMiddleware(flask_app)